@@ -2,24 +2,35 @@ import os
 import tempfile
 import subprocess
 from typing import Optional, Dict, Callable
-from elevenlabs import ElevenLabs, VoiceSettings
-from google import genai
+from elevenlabs import VoiceSettings
+from upstream_limiter import UpstreamBusy
+from tts_cache import TTSCache, shared_tts_cache
+from generation_cache import GenerationCache, shared_generation_cache
+from tracing import traced, current_span
+from client_registry import shared_clients
 
 class ArticleToPodcast:
     """Handles conversion of articles to multi-speaker podcast audio"""
     
-    def __init__(self, gemini_api_key: str, elevenlabs_api_key: str):
+    def __init__(self, gemini_api_key: str, elevenlabs_api_key: str, tts_cache: Optional[TTSCache] = None,
+                 generation_cache: Optional[GenerationCache] = None):
         """Initialize article to podcast service with Gemini and ElevenLabs APIs"""
-        self.gemini_client = genai.Client(api_key=gemini_api_key)
-        self.elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_key)
+        self.gemini_client = shared_clients.gemini(gemini_api_key)
+        self.elevenlabs_client = shared_clients.elevenlabs(elevenlabs_api_key)
+        self.gemini_api_key = gemini_api_key
+        self.elevenlabs_api_key = elevenlabs_api_key
+        self.tts_cache = tts_cache or shared_tts_cache
+        self.generation_cache = generation_cache or shared_generation_cache
         
         # Voice mapping for different speakers
         self.host_voice_id = "pNInz6obpgDQGcFmaJgB"    # Adam - Host voice
         self.expert_voice_id = "XB0fDUnXU5powFXDhCwa"  
     
-    def generate_podcast_script(self, article_text: str, word_count: int = 300) -> Optional[str]:
+    @traced()
+    def generate_podcast_script(self, article_text: str, word_count: int = 300, fresh: bool = False) -> Optional[str]:
         """
         Generate a podcast script from article text using Gemini
+        fresh=True bypasses the generation cache
         Returns: Formatted script with Host: and Expert: labels
         """
         try:
@@ -40,17 +51,21 @@ Article:
 Generate the podcast script:
 """
             
-            response = self.gemini_client.models.generate_content(
+            script = self.generation_cache.generate(
+                self.gemini_client, self.gemini_api_key,
                 model="gemini-2.0-flash-exp",
-                contents=prompt
+                prompt=prompt,
+                fresh=fresh
             )
             
-            if response and response.text:
-                return response.text.strip()
+            if script:
+                return script
             else:
                 # Fallback script
                 return self._generate_fallback_script(article_text)
                 
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error generating podcast script: {e}")
             return self._generate_fallback_script(article_text)
@@ -67,13 +82,16 @@ Expert: Certainly. This article highlights several key points that deserve atten
 Host: Thank you for sharing these insights with us today.
 Expert: My pleasure. It's important to stay informed about these developments."""
     
+    @traced()
     def generate_speaker_audio(self, text: str, voice_id: str, output_file: str) -> bool:
         """
         Generate audio for a single speaker line using ElevenLabs
         Returns: True if successful, False otherwise
         """
         try:
-            audio_generator = self.elevenlabs_client.text_to_speech.convert(
+            # Recurring lines (intros, sign-offs) are served from the TTS cache
+            self.tts_cache.synthesize_to_file(
+                self.elevenlabs_client, self.elevenlabs_api_key,
                 text=text,
                 voice_id=voice_id,
                 model_id="eleven_multilingual_v2",
@@ -81,19 +99,21 @@ Expert: My pleasure. It's important to stay informed about these developments.""
                 voice_settings=VoiceSettings(
                     stability=0.5,
                     similarity_boost=0.75
-                )
+                ),
+                output_path=output_file
             )
             
-            with open(output_file, 'wb') as f:
-                for chunk in audio_generator:
-                    f.write(chunk)
+            current_span().add_bytes(os.path.getsize(output_file))
             
             return True
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error generating audio: {e}")
             return False
     
+    @traced()
     def merge_audio_files(self, audio_files: list, output_file: str) -> bool:
         """
         Merge multiple audio files into a single file using FFmpeg
@@ -120,8 +140,10 @@ Expert: My pleasure. It's important to stay informed about these developments.""
             print(f"Error merging audio files: {e}")
             return False
     
+    @traced(result_bytes=True)
     def create_podcast_from_article(self, article_text: str, script_word_count: int = 300, 
-                                   progress_callback: Optional[Callable] = None) -> Optional[bytes]:
+                                   progress_callback: Optional[Callable] = None,
+                                   fresh: bool = False) -> Optional[bytes]:
         """
         Complete workflow to convert article to podcast audio
         Returns: Audio bytes if successful, None otherwise
@@ -131,7 +153,7 @@ Expert: My pleasure. It's important to stay informed about these developments.""
             if progress_callback:
                 progress_callback("Generating podcast script...", 20)
             
-            script = self.generate_podcast_script(article_text, script_word_count)
+            script = self.generate_podcast_script(article_text, script_word_count, fresh=fresh)
             if not script:
                 return None
             
@@ -205,6 +227,8 @@ Expert: My pleasure. It's important to stay informed about these developments.""
             
             return audio_bytes
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error creating podcast: {e}")
             return None
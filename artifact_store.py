@@ -0,0 +1,244 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Optional, Dict
+
+
+class ArtifactWriter:
+    """Streams bytes into a staging file that becomes an artifact on commit"""
+
+    def __init__(self, store: 'ArtifactStore', artifact_id: str):
+        self.store = store
+        self.artifact_id = artifact_id
+        fd, self.staging_path = tempfile.mkstemp(dir=store.root_dir, prefix='.staging_')
+        self.file = os.fdopen(fd, 'wb')
+        self.bytes_written = 0
+
+    def write(self, chunk: bytes):
+        self.file.write(chunk)
+        self.bytes_written += len(chunk)
+
+    def commit(self) -> str:
+        self.file.close()
+        return self.store._commit(self.artifact_id, self.staging_path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.unlink(self.staging_path)
+        except OSError:
+            pass
+
+
+class ArtifactStore:
+    """On-disk store for generated audio/video files with LRU eviction and a TTL
+
+    put_bytes/put_file name artifacts by content hash; open_writer lets the
+    caller choose the id (e.g. a cache key) and stream the content in.
+    The index lives in process memory; when several workers share root_dir,
+    lookups fall back to the file on disk (its mtime drives the TTL), and each
+    worker enforces max_bytes over the artifacts it has seen
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int = 1024 * 1024 * 1024, ttl_seconds: int = 24 * 3600):
+        """Initialize artifact store and index any files already on disk"""
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+
+        # artifact_id -> {'path', 'size', 'created_at', 'last_access'}
+        self.index = {}
+        self.total_bytes = 0
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            self.index[name] = {
+                'path': path,
+                'size': stat.st_size,
+                'created_at': stat.st_mtime,
+                'last_access': stat.st_mtime
+            }
+            self.total_bytes += stat.st_size
+
+    def _artifact_id(self, digest: str, suffix: str) -> str:
+        return f"{digest}{suffix}" if suffix.startswith('.') else f"{digest}.{suffix}"
+
+    def put_bytes(self, data: bytes, suffix: str = '.mp3') -> str:
+        """
+        Store bytes and return their artifact id (sha256 + suffix)
+        Identical content is stored only once
+        """
+        artifact_id = self._artifact_id(hashlib.sha256(data).hexdigest(), suffix)
+
+        with self.lock:
+            if self._touch(artifact_id, stored=True):
+                return artifact_id
+
+        fd, staging_path = tempfile.mkstemp(dir=self.root_dir, prefix='.staging_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        return self._commit(artifact_id, staging_path)
+
+    def put_file(self, file_path: str, suffix: Optional[str] = None, move: bool = False) -> str:
+        """
+        Store an existing file and return its artifact id
+        With move=True the source file is consumed instead of copied
+        """
+        suffix = suffix or os.path.splitext(file_path)[1] or '.bin'
+
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(block)
+        artifact_id = self._artifact_id(hasher.hexdigest(), suffix)
+
+        with self.lock:
+            if self._touch(artifact_id, stored=True):
+                if move:
+                    os.unlink(file_path)
+                return artifact_id
+
+        fd, staging_path = tempfile.mkstemp(dir=self.root_dir, prefix='.staging_')
+        os.close(fd)
+        if move:
+            shutil.move(file_path, staging_path)
+        else:
+            shutil.copyfile(file_path, staging_path)
+
+        return self._commit(artifact_id, staging_path)
+
+    def open_writer(self, artifact_id: str) -> ArtifactWriter:
+        """Start streaming a new artifact stored under artifact_id"""
+        return ArtifactWriter(self, artifact_id)
+
+    def _commit(self, artifact_id: str, staging_path: str) -> str:
+        path = os.path.join(self.root_dir, artifact_id)
+        size = os.path.getsize(staging_path)
+
+        with self.lock:
+            # An entry that expired meanwhile is removed by _touch, so store ours in its place
+            if self._touch(artifact_id, stored=True):
+                os.unlink(staging_path)
+                return artifact_id
+
+            os.replace(staging_path, path)
+            now = time.time()
+            self.index[artifact_id] = {
+                'path': path,
+                'size': size,
+                'created_at': now,
+                'last_access': now
+            }
+            self.total_bytes += size
+            self._evict(keep=artifact_id)
+
+        return artifact_id
+
+    def _adopt(self, artifact_id: str) -> Optional[Dict]:
+        """Index an artifact another worker wrote to the shared directory (caller holds the lock)"""
+        if not artifact_id or artifact_id.startswith('.') or os.sep in artifact_id or '/' in artifact_id:
+            return None
+        path = os.path.join(self.root_dir, artifact_id)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self.index[artifact_id] = {
+            'path': path,
+            'size': stat.st_size,
+            'created_at': stat.st_mtime,
+            'last_access': stat.st_mtime
+        }
+        self.total_bytes += stat.st_size
+        return entry
+
+    def _touch(self, artifact_id: str, stored: bool = False) -> bool:
+        """
+        Mark an artifact as recently used (caller holds the lock)
+        stored=True means its content was just stored again, which restarts its TTL
+        """
+        entry = self.index.get(artifact_id) or self._adopt(artifact_id)
+        if not entry:
+            return False
+        if not os.path.exists(entry['path']):
+            # Evicted by another worker
+            self.index.pop(artifact_id)
+            self.total_bytes -= entry['size']
+            return False
+        if self._is_expired(entry):
+            self._remove(artifact_id)
+            return False
+        now = time.time()
+        entry['last_access'] = now
+        if stored:
+            entry['created_at'] = now
+            try:
+                os.utime(entry['path'], (now, now))
+            except OSError:
+                pass
+        return True
+
+    def _is_expired(self, entry: Dict) -> bool:
+        return time.time() - entry['created_at'] > self.ttl_seconds
+
+    def _remove(self, artifact_id: str):
+        entry = self.index.pop(artifact_id, None)
+        if not entry:
+            return
+        self.total_bytes -= entry['size']
+        try:
+            os.unlink(entry['path'])
+        except OSError:
+            pass
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop expired artifacts, then least recently used ones until under max_bytes"""
+        for artifact_id in [a for a, e in self.index.items() if self._is_expired(e)]:
+            if artifact_id != keep:
+                self._remove(artifact_id)
+
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        by_last_access = sorted(self.index.items(), key=lambda item: item[1]['last_access'])
+        for artifact_id, _ in by_last_access:
+            if self.total_bytes <= self.max_bytes:
+                break
+            if artifact_id != keep:
+                self._remove(artifact_id)
+
+    def get_path(self, artifact_id: str) -> Optional[str]:
+        """Get the on-disk path of an artifact, or None if missing/expired"""
+        with self.lock:
+            if not self._touch(artifact_id):
+                return None
+            return self.index[artifact_id]['path']
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'artifacts': len(self.index),
+                'total_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+def create_artifact_store_from_env() -> ArtifactStore:
+    """Build an artifact store from ARTIFACT_DIR / ARTIFACT_MAX_MB / ARTIFACT_TTL_SECONDS"""
+    return ArtifactStore(
+        root_dir=os.environ.get('ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'anuvaad_artifacts')),
+        max_bytes=int(os.environ.get('ARTIFACT_MAX_MB', 1024)) * 1024 * 1024,
+        ttl_seconds=int(os.environ.get('ARTIFACT_TTL_SECONDS', 24 * 3600))
+    )
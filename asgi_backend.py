@@ -0,0 +1,331 @@
+"""
+ASGI serving mode for the backend: uvicorn asgi_backend:app --port 5001
+
+Upstream-bound hot routes (text-to-speech, text-translation) run as
+coroutines on the event loop with the async Gemini/ElevenLabs clients, so
+one process can hold thousands of in-flight upstream calls. Every other
+route is served by the Flask app on a bounded WSGI thread pool, and blocking
+disk/SQLite work from the async routes goes to a separate executor
+"""
+import os
+import json
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, AsyncIterator
+from a2wsgi import WSGIMiddleware
+import backend
+from single_flight import AsyncSingleFlight
+from upstream_limiter import UpstreamBusy
+from upstream_retry import acall_upstream
+from lazy_service import LazyService
+from client_registry import shared_clients
+from tracing import start_trace, span
+from metrics import http_request_duration, http_requests_in_flight, http_request_bytes, http_response_bytes
+
+
+MAX_JSON_BODY = int(os.environ.get('ASYNC_MAX_JSON_BODY', 1024 * 1024))
+FILE_CHUNK_SIZE = 64 * 1024
+
+blocking_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASYNC_BLOCKING_WORKERS', 8)),
+    thread_name_prefix='asgi-blocking'
+)
+
+def make_elevenlabs_async_client():
+    if not backend.elevenlabs_api_key:
+        return None
+    return shared_clients.elevenlabs_async(backend.elevenlabs_api_key)
+
+
+def make_gemini_async_client():
+    client = backend.gemini_client.get()
+    return client.aio if client else None
+
+
+elevenlabs_async_client = LazyService('elevenlabs_async_client', make_elevenlabs_async_client)
+gemini_async_client = LazyService('gemini_async_client', make_gemini_async_client)
+
+translation_flight = AsyncSingleFlight()
+tts_flight = AsyncSingleFlight()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call (disk, SQLite, pydub) off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+
+class RequestError(Exception):
+    """Client error answered with a JSON body"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncRequest:
+    """Minimal request wrapper over an ASGI scope/receive pair"""
+
+    def __init__(self, scope: Dict, receive):
+        self.scope = scope
+        self.receive = receive
+
+    async def body(self) -> bytes:
+        chunks = []
+        size = 0
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                raise RequestError('Client disconnected')
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            http_request_bytes.inc(len(chunk), route=self.scope['path'])
+            if size > MAX_JSON_BODY:
+                raise RequestError('Request body too large', 413)
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def json(self) -> Dict:
+        try:
+            data = json.loads(await self.body() or b'null')
+        except ValueError:
+            raise RequestError('Request body must be JSON')
+        if not isinstance(data, dict):
+            raise RequestError('Request body must be a JSON object')
+        return data
+
+
+class AsyncResponse:
+    """Status, headers and either a fixed body or an async chunk iterator"""
+
+    def __init__(self, status: int, body: bytes = b'', content_type: str = 'application/json',
+                 headers: Optional[Dict[str, str]] = None, chunks: Optional[AsyncIterator[bytes]] = None):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.chunks = chunks
+
+    async def send(self, send, route: str):
+        headers = [
+            (b'content-type', self.content_type.encode()),
+            # Match flask_cors' default for the routes served by Flask
+            (b'access-control-allow-origin', b'*')
+        ]
+        if self.chunks is None:
+            headers.append((b'content-length', str(len(self.body)).encode()))
+        headers.extend((k.lower().encode(), str(v).encode()) for k, v in self.headers.items())
+
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+
+        if self.chunks is None:
+            http_response_bytes.inc(len(self.body), route=route)
+            await send({'type': 'http.response.body', 'body': self.body})
+            return
+
+        try:
+            async for chunk in self.chunks:
+                http_response_bytes.inc(len(chunk), route=route)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # On a client disconnect, detach from the (possibly shared) upstream stream right away
+            aclose = getattr(self.chunks, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+
+def json_response(payload: Dict, status: int = 200, headers: Optional[Dict[str, str]] = None) -> AsyncResponse:
+    return AsyncResponse(status, json.dumps(payload).encode(), headers=headers)
+
+
+async def file_chunks(path: str) -> AsyncIterator[bytes]:
+    f = await run_blocking(open, path, 'rb')
+    try:
+        while True:
+            chunk = await run_blocking(f.read, FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        f.close()
+
+
+async def prepend(first_chunk: bytes, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    try:
+        if first_chunk:
+            yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+async def text_to_speech(request: AsyncRequest) -> AsyncResponse:
+    data = await request.json()
+    text = data.get('text')
+    voice = data.get('voice', 'Rachel')
+    stream = data.get('stream', False)
+
+    if not text:
+        return json_response({'error': 'Text is required'}, 400)
+
+    voice_id = backend.TTS_VOICE_MAP.get(voice, backend.TTS_VOICE_MAP['Rachel'])
+    model_id = "eleven_multilingual_v2"
+    output_format = "mp3_44100_128"
+
+    filename = f'tts_{int(time.time())}.mp3'
+    tts_cache = backend.tts_cache
+    cached_path = await run_blocking(tts_cache.lookup, text, voice_id, model_id, output_format)
+
+    if stream:
+        if cached_path:
+            chunks = file_chunks(cached_path)
+        else:
+            # Concurrent requests for the same audio share one upstream stream
+            flight_key = (backend.normalize_text(text), voice_id, model_id, output_format)
+            chunks, _ = tts_flight.stream(flight_key, lambda: tts_cache.astream_and_store(
+                elevenlabs_async_client.get(), backend.elevenlabs_api_key, text, voice_id, model_id, output_format
+            ))
+
+        # Pull the first chunk here so upstream errors still get a JSON error
+        with span('first_chunk', cached=bool(cached_path)) as s:
+            first_chunk = await anext(chunks, b'')
+            s.add_bytes(len(first_chunk))
+
+        return AsyncResponse(
+            200,
+            content_type='audio/mpeg',
+            headers={
+                'Content-Disposition': f'inline; filename="{filename}"',
+                'Cache-Control': 'no-store',
+                'X-Accel-Buffering': 'no'
+            },
+            chunks=prepend(first_chunk, chunks)
+        )
+
+    if not cached_path:
+        with span('tts_cache.asynthesize'):
+            cached_path = await tts_cache.asynthesize(elevenlabs_async_client.get(), backend.elevenlabs_api_key,
+                                                      text, voice_id, model_id, output_format, record=False)
+    artifact_id = await run_blocking(backend.artifact_store.put_file, cached_path, suffix='.mp3')
+
+    return json_response({
+        'success': True,
+        'audio_url': backend.artifact_url(artifact_id),
+        'filename': filename
+    })
+
+
+async def text_translation(request: AsyncRequest) -> AsyncResponse:
+    data = await request.json()
+    text = data.get('text')
+    from_lang = data.get('from_lang')
+    to_lang = data.get('to_lang')
+
+    if not text or not from_lang or not to_lang:
+        return json_response({'error': 'Text, from_lang, and to_lang are required'}, 400)
+
+    if from_lang == to_lang:
+        return json_response({'error': 'Source and target languages must be different'}, 400)
+
+    model = "gemini-2.0-flash-exp"
+    prompt = backend.text_translation_prompt(text, from_lang, to_lang)
+
+    async def translate():
+        response = await acall_upstream(
+            'gemini', 'generate_content',
+            lambda: gemini_async_client.get().models.generate_content(model=model, contents=prompt),
+            model, backend.gemini_api_key
+        )
+        return response.text
+
+    translation_cache = backend.translation_cache
+    cache_key = translation_cache.make_key('text_translation', backend.TEXT_TRANSLATION_PROMPT_VERSION,
+                                           model, from_lang, to_lang, text)
+    translated_text = await run_blocking(translation_cache.get, cache_key)
+
+    if translated_text is None:
+        with span('translate', model=model) as s:
+            translated_text, shared = await translation_flight.do(cache_key, translate)
+            s.set(shared=shared)
+        if not shared and translated_text:
+            await run_blocking(translation_cache.set, cache_key, translated_text, 'text_translation',
+                               backend.TEXT_TRANSLATION_PROMPT_VERSION, model)
+
+    return json_response({
+        'success': True,
+        'translated_text': translated_text,
+        'from_lang': from_lang,
+        'to_lang': to_lang
+    })
+
+
+class AsyncBackend:
+    """ASGI app dispatching hot routes to coroutines and everything else to Flask"""
+
+    def __init__(self, flask_app, wsgi_workers: int = 32):
+        """Initialize with the Flask app served on a WSGI thread pool"""
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_workers)
+        self.routes = {
+            ('POST', '/api/text-to-speech'): text_to_speech,
+            ('POST', '/api/text-translation'): text_translation
+        }
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                backend.warm_up_clients()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await run_blocking(backend.history_writer.close)
+                blocking_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        handler = None
+        if scope['type'] == 'http':
+            handler = self.routes.get((scope['method'], scope['path']))
+
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        route = scope['path']
+        started = time.perf_counter()
+        http_requests_in_flight.inc(route=route)
+        try:
+            # The trace covers the handler only, like a Flask view; streaming the body isn't upstream time
+            with start_trace(f"{scope['method']} {route}") as trace:
+                try:
+                    response = await handler(AsyncRequest(scope, receive))
+                except UpstreamBusy as e:
+                    trace.root.error = type(e).__name__
+                    response = json_response({'error': str(e), 'retry_after': e.retry_after}, 429,
+                                             headers={'Retry-After': str(e.retry_after)})
+                except RequestError as e:
+                    response = json_response({'error': str(e)}, e.status_code)
+                except Exception as e:
+                    trace.root.error = type(e).__name__
+                    response = json_response({'error': str(e)}, 500)
+
+            if dict(scope.get('headers') or []).get(b'x-trace'):
+                response.headers['X-Trace'] = trace.header_value()
+                response.headers['X-Trace-Id'] = trace.trace_id
+
+            http_request_duration.observe(time.perf_counter() - started, method=scope['method'],
+                                          route=route, status=str(response.status))
+            await response.send(send, route)
+        finally:
+            http_requests_in_flight.dec(route=route)
+
+
+app = AsyncBackend(backend.app, wsgi_workers=int(os.environ.get('ASYNC_WSGI_WORKERS', 32)))
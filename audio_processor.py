@@ -11,6 +11,8 @@ try:
 except ImportError:
     LIBROSA_AVAILABLE = False
 from typing import Tuple, Optional, List, Dict
+from metrics import track_upstream
+from tracing import traced
 
 class AudioProcessor:
     """Handles audio processing, separation, and speech recognition"""
@@ -19,6 +21,7 @@ class AudioProcessor:
         """Initialize audio processor with speech recognizer"""
         self.recognizer = sr.Recognizer()
         
+    @traced()
     def separate_audio_components(self, audio_path: str, preserve_background: bool = True) -> Tuple[str, Optional[str], List]:
         """
         Separate speech from background audio using advanced techniques
@@ -88,6 +91,7 @@ class AudioProcessor:
             # Fallback: return original audio as speech
             return audio_path, None, []
     
+    @traced()
     def speech_to_text(self, audio_path: str, language: str) -> Optional[Dict]:
         """
         Convert speech to text with detailed timing information using Google Speech Recognition
@@ -109,7 +113,8 @@ class AudioProcessor:
                 
                 try:
                     # Use Google Speech Recognition (free tier)
-                    text = self.recognizer.recognize_google(audio_data, language=lang_code)
+                    with track_upstream('google', 'recognize_google'):
+                        text = self.recognizer.recognize_google(audio_data, language=lang_code)
                     
                     # Create basic segments (Google API doesn't provide word-level timestamps in free tier)
                     duration = len(audio) / 1000.0  # Convert to seconds
@@ -141,6 +146,7 @@ class AudioProcessor:
             print(f"Error in speech recognition: {e}")
             return None
     
+    @traced(result_bytes=True)
     def enhance_audio_quality(self, audio_path: str) -> str:
         """
         Enhance audio quality through noise reduction and normalization
@@ -172,6 +178,7 @@ class AudioProcessor:
             print(f"Error in audio enhancement: {e}")
             return audio_path
     
+    @traced(result_bytes=True)
     def mix_audio_tracks(self, speech_path: str, background_path: str, 
                         speech_volume: float = 1.0, background_volume: float = 0.3) -> str:
         """
@@ -208,6 +215,7 @@ class AudioProcessor:
             print(f"Error in audio mixing: {e}")
             return speech_path
     
+    @traced()
     def analyze_audio_gaps(self, audio_path: str) -> List[Dict]:
         """
         Analyze gaps and pauses in audio for better synchronization
@@ -246,6 +254,7 @@ class AudioProcessor:
             print(f"Error in gap analysis: {e}")
             return []
     
+    @traced(result_bytes=True)
     def adjust_speech_timing(self, audio_path: str, target_duration: float, 
                            preserve_pitch: bool = True) -> str:
         """
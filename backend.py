@@ -1,8 +1,14 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request, get_current_user as current_jwt_user
 import tempfile
 import os
+import json
+import base64
+import binascii
+import queue
+import atexit
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
 
 # Load environment variables from .env file
@@ -12,54 +18,246 @@ try:
 except ImportError:
     print("Warning: python-dotenv not installed. Install it with: pip install python-dotenv")
 import time
-from video_processor import VideoProcessor
-from elevenlabs_dubbing import ElevenLabsDubbing
-from utils import format_time, validate_video_file
-import speech_recognition as sr
-from elevenlabs import ElevenLabs
-from google import genai
-from pydub import AudioSegment
-from youtube_summarizer import YouTubeSummarizer
-from story_generator import StoryGenerator
-from article_to_podcast import ArticleToPodcast
-import base64
+from job_queue import JobQueueFull, create_job_queue_from_env
+from history_writer import HistoryWriterFull, create_history_writer_from_env
+from password_hasher import PasswordHasherBusy, password_hasher
+from user_cache import create_user_cache_from_env
+from artifact_store import ArtifactStore, create_artifact_store_from_env
+from dubbing_events import DubbingEventBroker
+from upload_sessions import UploadSessionManager, UploadError
+from upstream_limiter import UpstreamBusy, upstream_limiters
+from upstream_retry import call_upstream
+from chunked_transcriber import create_chunked_transcriber_from_env
+from metrics import registry as metrics_registry, instrument_flask
+from tracing import instrument_flask as instrument_tracing
+from single_flight import SingleFlight
+from translation_cache import TranslationCache, DEFAULT_DB_PATH as TRANSLATION_CACHE_DB
+from tts_cache import shared_tts_cache as tts_cache
+from generation_cache import shared_generation_cache as generation_cache
+from lazy_service import LazyService
+from client_registry import shared_clients
 from werkzeug.utils import secure_filename
 import io
-from models import db, bcrypt, User, UserHistory
-from datetime import timedelta
+from models import db, bcrypt, User, UserHistory, DubbingProject
+from db_config import init_database
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import load_only
 
 app = Flask(__name__)
 CORS(app)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///anuvaad_ai.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
 
-db.init_app(app)
+init_database(app, db)
 bcrypt.init_app(app)
 jwt = JWTManager(app)
+user_cache = create_user_cache_from_env()
+user_cache.watch(User)
+
+@jwt.user_lookup_loader
+def load_current_user(jwt_header, jwt_data):
+    """Serialized user for current_user on JWT routes, from a short-TTL cache"""
+    def load(user_id):
+        user = db.session.get(User, user_id)
+        return user.to_dict() if user else None
+    return user_cache.get(int(jwt_data['sub']), load)
+
+@jwt.user_lookup_error_loader
+def current_user_not_found(jwt_header, jwt_data):
+    return jsonify({'error': 'User not found'}), 404
+instrument_flask(app)
+instrument_tracing(app)
 
 with app.app_context():
     db.create_all()
+    # create_all() skips tables that already exist, so add indexes introduced since
+    for index in UserHistory.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
 elevenlabs_api_key = os.environ.get('ELEVENLABS_API_KEY')
 gemini_api_key = os.environ.get('GEMINI_API_KEY')
 
-video_processor = VideoProcessor()
-dubbing_service = ElevenLabsDubbing(api_key=elevenlabs_api_key) if elevenlabs_api_key else None
-elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_key) if elevenlabs_api_key else None
-gemini_client = genai.Client(api_key=gemini_api_key) if gemini_api_key else None
-youtube_summarizer = YouTubeSummarizer(gemini_api_key=gemini_api_key) if gemini_api_key else None
-story_generator = StoryGenerator(gemini_api_key=gemini_api_key, elevenlabs_api_key=elevenlabs_api_key) if gemini_api_key and elevenlabs_api_key else None
-article_podcast = ArticleToPodcast(gemini_api_key=gemini_api_key, elevenlabs_api_key=elevenlabs_api_key) if gemini_api_key and elevenlabs_api_key else None
+def warm_up_clients():
+    """Open the pooled Gemini/ElevenLabs connections in the background (CLIENT_WARMUP=0 to skip)"""
+    if os.environ.get('CLIENT_WARMUP', '1') != '0':
+        shared_clients.start_warm_up(gemini_api_key=gemini_api_key, elevenlabs_api_key=elevenlabs_api_key)
+
+# Services (and their moviepy/yt_dlp/genai/elevenlabs imports) are built on first use
+def make_video_processor():
+    from video_processor import VideoProcessor
+    return VideoProcessor()
+
+def make_dubbing_service():
+    if not elevenlabs_api_key:
+        return None
+    from elevenlabs_dubbing import ElevenLabsDubbing
+    return ElevenLabsDubbing(api_key=elevenlabs_api_key, status_ttl=float(os.environ.get('DUBBING_STATUS_TTL', 2)))
+
+def make_elevenlabs_client():
+    if not elevenlabs_api_key:
+        return None
+    return shared_clients.elevenlabs(elevenlabs_api_key)
+
+def make_gemini_client():
+    if not gemini_api_key:
+        return None
+    return shared_clients.gemini(gemini_api_key)
+
+def make_translation_service():
+    if not gemini_api_key:
+        return None
+    from translation_service import TranslationService
+    return TranslationService(
+        api_key=gemini_api_key,
+        cache=translation_cache,
+        batch_token_budget=int(os.environ.get('BATCH_TRANSLATION_TOKEN_BUDGET', 4000)),
+        batch_max_segments=int(os.environ.get('BATCH_TRANSLATION_MAX_SEGMENTS_PER_CALL', 100))
+    )
+
+def make_youtube_summarizer():
+    if not gemini_api_key:
+        return None
+    from youtube_summarizer import YouTubeSummarizer
+    return YouTubeSummarizer(gemini_api_key=gemini_api_key)
+
+def make_story_generator():
+    if not (gemini_api_key and elevenlabs_api_key):
+        return None
+    from story_generator import StoryGenerator
+    return StoryGenerator(gemini_api_key=gemini_api_key, elevenlabs_api_key=elevenlabs_api_key)
+
+def make_article_podcast():
+    if not (gemini_api_key and elevenlabs_api_key):
+        return None
+    from article_to_podcast import ArticleToPodcast
+    return ArticleToPodcast(gemini_api_key=gemini_api_key, elevenlabs_api_key=elevenlabs_api_key)
+
+video_processor = LazyService('video_processor', make_video_processor)
+dubbing_service = LazyService('dubbing_service', make_dubbing_service)
+elevenlabs_client = LazyService('elevenlabs_client', make_elevenlabs_client)
+gemini_client = LazyService('gemini_client', make_gemini_client)
+translation_service = LazyService('translation_service', make_translation_service)
+youtube_summarizer = LazyService('youtube_summarizer', make_youtube_summarizer)
+story_generator = LazyService('story_generator', make_story_generator)
+article_podcast = LazyService('article_podcast', make_article_podcast)
+
+lazy_services = [video_processor, dubbing_service, elevenlabs_client, gemini_client, translation_service,
+                 youtube_summarizer, story_generator, article_podcast]
+
+job_queue = create_job_queue_from_env()
+history_writer = create_history_writer_from_env(app)
+atexit.register(history_writer.close)
+artifact_store = create_artifact_store_from_env()
+
+# Dubbed videos keyed by (dubbing_id, language) so repeat downloads skip ElevenLabs
+download_cache = ArtifactStore(
+    root_dir=os.environ.get('DOWNLOAD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'anuvaad_downloads')),
+    max_bytes=int(os.environ.get('DOWNLOAD_CACHE_MAX_MB', 2048)) * 1024 * 1024,
+    ttl_seconds=int(os.environ.get('DOWNLOAD_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+)
+
+upload_sessions = UploadSessionManager(
+    upload_dir=os.environ.get('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'anuvaad_uploads')),
+    max_size=int(os.environ.get('UPLOAD_MAX_MB', 2048)) * 1024 * 1024
+)
+
+def download_cache_key(dubbing_id, target_lang):
+    return secure_filename(f'{dubbing_id}_{target_lang}.mp4')
+
+ARTIFACT_MIMETYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.mp4': 'video/mp4'
+}
+
+# Identical concurrent TTS/translation requests share one upstream call
+tts_flight = SingleFlight()
+translation_flight = SingleFlight()
+
+TEXT_TRANSLATION_PROMPT_VERSION = 1
+
+translation_cache = TranslationCache(
+    db_path=os.environ.get('TRANSLATION_CACHE_DB', TRANSLATION_CACHE_DB),
+    memory_size=int(os.environ.get('TRANSLATION_CACHE_MEMORY_SIZE', 2048))
+)
+translation_cache.purge_stale('text_translation', TEXT_TRANSLATION_PROMPT_VERSION)
+
+speech_transcriber = create_chunked_transcriber_from_env()
+
+def normalize_text(text):
+    return ' '.join(text.split())
+
+def text_translation_prompt(text, from_lang, to_lang):
+    return f"Translate the following text from {from_lang} to {to_lang}. Only provide the translation, no explanations:\n\n{text}"
 
-dubbing_projects = {}
+def artifact_url(artifact_id):
+    return f'/api/artifacts/{artifact_id}'
+
+def submit_job(job_type, func, *args, **kwargs):
+    """Queue a pipeline on the worker pool and answer 202 with its job id"""
+    try:
+        job_id = job_queue.submit(job_type, func, *args, **kwargs)
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.errorhandler(HistoryWriterFull)
+def history_writer_full(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.errorhandler(UpstreamBusy)
+def upstream_busy(e):
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'ok', 'message': 'Backend is running'})
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'success': True,
+        'single_flight': {
+            'text_to_speech': tts_flight.get_stats(),
+            'text_translation': translation_flight.get_stats()
+        },
+        'translation_cache': translation_cache.get_stats(),
+        'tts_cache': tts_cache.get_stats(),
+        'generation_cache': generation_cache.get_stats(),
+        'dubbing_status_cache': dubbing_service.instance.get_status_cache_stats() if dubbing_service.instance else None,
+        'services': {service.name: service.get_stats() for service in lazy_services},
+        'clients': shared_clients.get_stats(),
+        'database': {'dialect': db.engine.dialect.name, 'pool': db.engine.pool.status()},
+        'history_writer': history_writer.get_stats(),
+        'password_hasher': password_hasher.get_stats(),
+        'user_cache': user_cache.get_stats(),
+        'upstream_limiters': upstream_limiters.get_stats(),
+        'artifacts': artifact_store.get_stats(),
+        'download_cache': download_cache.get_stats()
+    })
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/auth/signup', methods=['POST'])
 def signup():
     try:
@@ -89,6 +287,9 @@ def signup():
             'user': user.to_dict()
         }), 201
         
+    except PasswordHasherBusy:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -108,6 +309,18 @@ def login():
         if not user or not user.check_password(password):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Upgrade hashes made with an old BCRYPT_ROUNDS while we have the plaintext
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+                password_hasher.record_rehash()
+            except PasswordHasherBusy:
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error rehashing password for user {user.id}: {e}")
+        
         access_token = create_access_token(identity=str(user.id))
         
         return jsonify({
@@ -116,6 +329,8 @@ def login():
             'user': user.to_dict()
         })
         
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -123,20 +338,31 @@ def login():
 @jwt_required()
 def get_current_user():
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
         return jsonify({
             'success': True,
-            'user': user.to_dict()
+            'user': current_jwt_user()
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+HISTORY_PAGE_SIZE = 50
+HISTORY_ASYNC_WRITES = os.environ.get('HISTORY_ASYNC_WRITES', '0')
+HISTORY_WRITE_TIMEOUT = float(os.environ.get('HISTORY_WRITE_TIMEOUT', 10))
+HISTORY_MAX_PAGE_SIZE = 200
+
+def encode_history_cursor(entry):
+    payload = json.dumps([entry.created_at.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    """Returns (created_at, id); raises ValueError for a malformed cursor"""
+    try:
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (TypeError, binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+
 @app.route('/api/history', methods=['GET', 'POST'])
 @jwt_required()
 def user_history():
@@ -148,115 +374,240 @@ def user_history():
             feature_type = data.get('feature_type')
             feature_data = data.get('feature_data')
             
-            history_entry = UserHistory(
-                user_id=user_id,
-                feature_type=feature_type,
-                feature_data=feature_data
-            )
+            if not feature_type:
+                return jsonify({'error': 'feature_type is required'}), 400
             
-            db.session.add(history_entry)
-            db.session.commit()
+            # Rows are inserted in batches by the write-behind buffer
+            saved = history_writer.submit(user_id, feature_type, feature_data)
+            
+            write_async = request.args.get('async', HISTORY_ASYNC_WRITES)
+            if str(write_async).lower() not in ('1', 'true'):
+                try:
+                    return jsonify({
+                        'success': True,
+                        'message': 'History saved',
+                        'history': saved.result(timeout=HISTORY_WRITE_TIMEOUT)
+                    }), 201
+                except FutureTimeoutError:
+                    pass
             
             return jsonify({
                 'success': True,
-                'message': 'History saved',
-                'history': history_entry.to_dict()
-            }), 201
+                'message': 'History queued'
+            }), 202
         
         else:
-            history = UserHistory.query.filter_by(user_id=user_id).order_by(UserHistory.created_at.desc()).limit(50).all()
+            limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+            
+            query = UserHistory.query.options(
+                load_only(UserHistory.id, UserHistory.feature_type, UserHistory.created_at)
+            ).filter(UserHistory.user_id == user_id)
+            
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    cursor_created_at, cursor_id = decode_history_cursor(cursor)
+                except ValueError:
+                    return jsonify({'error': 'Invalid cursor'}), 400
+                # Keyset pagination: resume strictly after the last row of the previous page
+                query = query.filter(or_(
+                    UserHistory.created_at < cursor_created_at,
+                    and_(UserHistory.created_at == cursor_created_at, UserHistory.id < cursor_id)
+                ))
+            
+            history = query.order_by(UserHistory.created_at.desc(), UserHistory.id.desc()).limit(limit + 1).all()
+            
+            next_cursor = None
+            if len(history) > limit:
+                history = history[:limit]
+                next_cursor = encode_history_cursor(history[-1])
             
             return jsonify({
                 'success': True,
-                'history': [h.to_dict() for h in history]
+                'history': [h.to_summary_dict() for h in history],
+                'next_cursor': next_cursor
             })
             
+    except HistoryWriterFull:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history/<int:history_id>', methods=['GET'])
+@jwt_required()
+def user_history_detail(history_id):
+    try:
+        user_id = int(get_jwt_identity())
+        entry = UserHistory.query.filter_by(id=history_id, user_id=user_id).first()
+        
+        if not entry:
+            return jsonify({'error': 'History entry not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'history': entry.to_dict()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+TTS_VOICE_MAP = {
+    "Rachel": "21m00Tcm4TlvDq8ikWAM",
+    "Adam": "pNInz6obpgDQGcFmaJgB",
+    "Antoni": "ErXwobaYiN019PkySvjV",
+    "Arnold": "VR6AewLTigWG4xSOukaG",
+    "Bella": "EXAVITQu4vr4xnSDxMaL",
+    "Domi": "AZnzlk1XvdvUeBnXmlld",
+    "Elli": "MF3mGyEYCl7XYWbV9V6O",
+    "Josh": "TxGEqnHWrfWFTfGW9XjX",
+    "Sam": "yoZ06aMxZJJ28mfd3POQ"
+}
+
 @app.route('/api/text-to-speech', methods=['POST'])
 def text_to_speech():
     try:
         data = request.json
         text = data.get('text')
         voice = data.get('voice', 'Rachel')
+        stream = data.get('stream', False)
         
         if not text:
             return jsonify({'error': 'Text is required'}), 400
         
-        voice_map = {
-            "Rachel": "21m00Tcm4TlvDq8ikWAM",
-            "Adam": "pNInz6obpgDQGcFmaJgB",
-            "Antoni": "ErXwobaYiN019PkySvjV",
-            "Arnold": "VR6AewLTigWG4xSOukaG",
-            "Bella": "EXAVITQu4vr4xnSDxMaL",
-            "Domi": "AZnzlk1XvdvUeBnXmlld",
-            "Elli": "MF3mGyEYCl7XYWbV9V6O",
-            "Josh": "TxGEqnHWrfWFTfGW9XjX",
-            "Sam": "yoZ06aMxZJJ28mfd3POQ"
-        }
-        
-        audio_generator = elevenlabs_client.text_to_speech.convert(
-            text=text,
-            voice_id=voice_map.get(voice, voice_map['Rachel']),
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128"
-        )
+        voice_id = TTS_VOICE_MAP.get(voice, TTS_VOICE_MAP['Rachel'])
+        model_id = "eleven_multilingual_v2"
+        output_format = "mp3_44100_128"
+        flight_key = (normalize_text(text), voice_id, model_id, output_format)
         
-        audio_bytes = b''.join(audio_generator)
-        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        filename = f'tts_{int(time.time())}.mp3'
+        cached_path = tts_cache.lookup(text, voice_id, model_id, output_format)
+        
+        if stream:
+            if cached_path:
+                return send_file(cached_path, mimetype='audio/mpeg', conditional=True,
+                                 download_name=filename, as_attachment=False)
+            
+            audio_iter, _ = tts_flight.stream(flight_key, lambda: tts_cache.stream_and_store(
+                elevenlabs_client.get(), elevenlabs_api_key, text, voice_id, model_id, output_format
+            ))
+            
+            # Pull the first chunk here so upstream errors still get a JSON error
+            first_chunk = next(audio_iter, b'')
+            
+            def generate():
+                try:
+                    if first_chunk:
+                        yield first_chunk
+                    for chunk in audio_iter:
+                        yield chunk
+                finally:
+                    # Detach from the shared stream so an abandoned upstream can stop
+                    audio_iter.close()
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='audio/mpeg',
+                headers={
+                    'Content-Disposition': f'inline; filename="{filename}"',
+                    'Cache-Control': 'no-store',
+                    'X-Accel-Buffering': 'no'
+                }
+            )
+        
+        if not cached_path:
+            cached_path, _ = tts_flight.do(flight_key, lambda: tts_cache.synthesize(
+                elevenlabs_client.get(), elevenlabs_api_key, text, voice_id, model_id, output_format,
+                record=False
+            ))
+        artifact_id = artifact_store.put_file(cached_path, suffix='.mp3')
         
         return jsonify({
             'success': True,
-            'audio': audio_base64,
-            'filename': f'tts_{int(time.time())}.mp3'
+            'audio_url': artifact_url(artifact_id),
+            'filename': filename
         })
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/speech-to-text', methods=['POST'])
 def speech_to_text():
+    """
+    Transcribe an uploaded recording; long audio is split on silence and the
+    chunks are recognized concurrently. With stream=1 the response is an SSE
+    stream of "partial" events as chunks finish, then a final "done" event
+    (or an "error" event when recognition failed)
+    """
+    from pydub import AudioSegment
+    
     try:
         if 'audio' not in request.files:
             return jsonify({'error': 'Audio file is required'}), 400
         
         audio_file = request.files['audio']
         file_extension = audio_file.filename.split('.')[-1].lower()
+        language = request.form.get('language')
+        stream = (request.form.get('stream') or request.args.get('stream', '')).lower() in ('1', 'true')
         
         with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as tmp_input:
             audio_file.save(tmp_input.name)
             input_path = tmp_input.name
         
-        wav_path = tempfile.mktemp(suffix='.wav')
-        
         try:
             audio = AudioSegment.from_file(input_path, format=file_extension)
-            audio.export(wav_path, format='wav')
         except Exception as e:
-            os.unlink(input_path)
             return jsonify({'error': f'Failed to convert audio: {str(e)}'}), 500
-        
-        recognizer = sr.Recognizer()
-        
-        try:
-            with sr.AudioFile(wav_path) as source:
-                audio_data = recognizer.record(source)
-                text = recognizer.recognize_google(audio_data)
         finally:
             os.unlink(input_path)
-            if os.path.exists(wav_path):
-                os.unlink(wav_path)
         
-        return jsonify({
-            'success': True,
-            'text': text
-        })
-    except sr.UnknownValueError:
-        return jsonify({'error': 'Could not understand audio'}), 400
+        chunks = speech_transcriber.plan_chunks(audio)
+        
+        if stream:
+            def generate():
+                # Headers are already sent, so failures have to arrive as an "error" event
+                try:
+                    results = []
+                    for result in speech_transcriber.iter_chunks(audio, chunks, language):
+                        results.append(result)
+                        yield format_sse({**result, 'completed': len(results), 'total': len(chunks)}, 'partial')
+                    
+                    response_data, status_code = speech_to_text_result(speech_transcriber.stitch(results))
+                    yield format_sse(response_data, 'done' if status_code == 200 else 'error')
+                except UpstreamBusy as e:
+                    yield format_sse({'error': str(e), 'retry_after': e.retry_after}, 'error')
+                except Exception as e:
+                    yield format_sse({'error': str(e)}, 'error')
+            
+            return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+        response_data, status_code = speech_to_text_result(speech_transcriber.transcribe(audio, language, chunks))
+        return jsonify(response_data), status_code
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def speech_to_text_result(transcript):
+    """
+    Response body and status for a stitched transcript: a 500 when recognition
+    failed outright, a 400 when no speech was found, otherwise the transcript
+    with any failed_chunks listed
+    """
+    if not transcript['text']:
+        if transcript['failed_chunks']:
+            failed = transcript['chunks'][transcript['failed_chunks'][0]]
+            return {'error': failed['error'], 'failed_chunks': transcript['failed_chunks']}, 500
+        return {'error': 'Could not understand audio'}, 400
+    
+    return {
+        'success': True,
+        'text': transcript['text'],
+        'chunks': transcript['chunks'],
+        'failed_chunks': transcript['failed_chunks']
+    }, 200
+
 @app.route('/api/text-translation', methods=['POST'])
 def text_translation():
     try:
@@ -271,13 +622,25 @@ def text_translation():
         if from_lang == to_lang:
             return jsonify({'error': 'Source and target languages must be different'}), 400
         
-        prompt = f"Translate the following text from {from_lang} to {to_lang}. Only provide the translation, no explanations:\n\n{text}"
+        prompt = text_translation_prompt(text, from_lang, to_lang)
         
-        response = gemini_client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt
-        )
-        translated_text = response.text
+        def translate():
+            response = call_upstream(
+                'gemini', 'generate_content',
+                lambda: gemini_client.get().models.generate_content(model="gemini-2.0-flash-exp", contents=prompt),
+                "gemini-2.0-flash-exp", gemini_api_key
+            )
+            return response.text
+        
+        cache_key = translation_cache.make_key('text_translation', TEXT_TRANSLATION_PROMPT_VERSION,
+                                               "gemini-2.0-flash-exp", from_lang, to_lang, text)
+        translated_text = translation_cache.get(cache_key)
+        
+        if translated_text is None:
+            translated_text, shared = translation_flight.do(cache_key, translate)
+            if not shared and translated_text:
+                translation_cache.set(cache_key, translated_text, 'text_translation',
+                                      TEXT_TRANSLATION_PROMPT_VERSION, "gemini-2.0-flash-exp")
         
         return jsonify({
             'success': True,
@@ -285,32 +648,123 @@ def text_translation():
             'from_lang': from_lang,
             'to_lang': to_lang
         })
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+BATCH_TRANSLATION_MAX_SEGMENTS = int(os.environ.get('BATCH_TRANSLATION_MAX_SEGMENTS', 1000))
+
+@app.route('/api/text-translation/batch', methods=['POST'])
+def text_translation_batch():
+    """
+    Translate many segments in a few Gemini calls
+    Body: {"segments": [{"id": ..., "text": ...}, ...] or ["text", ...], "from_lang": ..., "to_lang": ...}
+    """
+    try:
+        data = request.json
+        segments = data.get('segments')
+        from_lang = data.get('from_lang')
+        to_lang = data.get('to_lang')
+        
+        if not isinstance(segments, list) or not segments or not from_lang or not to_lang:
+            return jsonify({'error': 'segments (a non-empty list), from_lang, and to_lang are required'}), 400
+        
+        if from_lang == to_lang:
+            return jsonify({'error': 'Source and target languages must be different'}), 400
+        
+        if len(segments) > BATCH_TRANSLATION_MAX_SEGMENTS:
+            return jsonify({'error': f'At most {BATCH_TRANSLATION_MAX_SEGMENTS} segments per request'}), 400
+        
+        texts = {}
+        for i, segment in enumerate(segments):
+            if isinstance(segment, str):
+                segment = {'id': i, 'text': segment}
+            if not isinstance(segment, dict) or not isinstance(segment.get('text'), str):
+                return jsonify({'error': f'Segment {i} must be a string or an object with "text"'}), 400
+            segment_id = str(segment.get('id', i))
+            if segment_id in texts:
+                return jsonify({'error': f'Duplicate segment id: {segment_id}'}), 400
+            texts[segment_id] = segment['text']
+        
+        service = translation_service.get()
+        if not service:
+            return jsonify({'error': 'Gemini API key not configured'}), 500
+        
+        non_empty = {segment_id: text for segment_id, text in texts.items() if text.strip()}
+        translations = service.translate_batch(non_empty, from_lang, to_lang)
+        
+        return jsonify({
+            'success': True,
+            'translations': {segment_id: translations.get(segment_id, text if not text.strip() else None)
+                             for segment_id, text in texts.items()},
+            'missing': [segment_id for segment_id in non_empty if segment_id not in translations],
+            'from_lang': from_lang,
+            'to_lang': to_lang
+        })
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def run_youtube_summary(youtube_url, word_count, fresh=False, progress_callback=None):
+    result = youtube_summarizer.get().process_youtube_video(youtube_url, word_count, progress_callback=progress_callback,
+                                                      fresh=fresh)
+    
+    if not result:
+        raise RuntimeError('Failed to process video')
+    
+    return {
+        'success': True,
+        'title': result['title'],
+        'summary': result['summary']
+    }
+
 @app.route('/api/youtube-summary', methods=['POST'])
 def youtube_summary():
     try:
         data = request.json
         youtube_url = data.get('url')
         word_count = data.get('word_count', 200)
+        fresh = bool(data.get('fresh', False))
         
         if not youtube_url:
             return jsonify({'error': 'YouTube URL is required'}), 400
         
-        result = youtube_summarizer.process_youtube_video(youtube_url, word_count)
+        if data.get('async'):
+            return submit_job('youtube-summary', run_youtube_summary, youtube_url, word_count, fresh)
         
-        if result:
-            return jsonify({
-                'success': True,
-                'title': result['title'],
-                'summary': result['summary']
-            })
-        else:
-            return jsonify({'error': 'Failed to process video'}), 500
+        return jsonify(run_youtube_summary(youtube_url, word_count, fresh))
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def run_word_to_story(words_list, theme, word_count, language, fresh=False, progress_callback=None):
+    result = story_generator.get().create_story_with_audio(
+        words=words_list,
+        theme=theme,
+        word_count=word_count,
+        language=language,
+        progress_callback=progress_callback,
+        fresh=fresh
+    )
+    
+    if not result or not result['story']:
+        raise RuntimeError('Failed to generate story')
+    
+    response_data = {
+        'success': True,
+        'story': result['story']
+    }
+    
+    if result['audio_path']:
+        artifact_id = artifact_store.put_file(result['audio_path'], suffix='.mp3', move=True)
+        response_data['audio_url'] = artifact_url(artifact_id)
+        response_data['filename'] = f'story_{int(time.time())}.mp3'
+    
+    return response_data
+
 @app.route('/api/word-to-story', methods=['POST'])
 def word_to_story():
     try:
@@ -319,64 +773,117 @@ def word_to_story():
         theme = data.get('theme')
         word_count = data.get('word_count', 300)
         language = data.get('language', 'english')
+        fresh = bool(data.get('fresh', False))
         
         if not words or not theme:
             return jsonify({'error': 'Words and theme are required'}), 400
         
         words_list = [word.strip() for word in words.split(',')]
         
-        result = story_generator.create_story_with_audio(
-            words=words_list,
-            theme=theme,
-            word_count=word_count,
-            language=language.lower()
-        )
+        if data.get('async'):
+            return submit_job('word-to-story', run_word_to_story, words_list, theme, word_count, language.lower(), fresh)
         
-        if result and result['story']:
-            response_data = {
-                'success': True,
-                'story': result['story']
-            }
-            
-            if result['audio_bytes']:
-                audio_base64 = base64.b64encode(result['audio_bytes']).decode('utf-8')
-                response_data['audio'] = audio_base64
-                response_data['filename'] = f'story_{int(time.time())}.mp3'
-            
-            return jsonify(response_data)
-        else:
-            return jsonify({'error': 'Failed to generate story'}), 500
+        return jsonify(run_word_to_story(words_list, theme, word_count, language.lower(), fresh))
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def run_article_to_podcast(article_text, script_word_count, fresh=False, progress_callback=None):
+    audio_bytes = article_podcast.get().create_podcast_from_article(
+        article_text=article_text,
+        script_word_count=script_word_count,
+        progress_callback=progress_callback,
+        fresh=fresh
+    )
+    
+    if not audio_bytes:
+        raise RuntimeError('Failed to generate podcast')
+    
+    artifact_id = artifact_store.put_bytes(audio_bytes, suffix='.mp3')
+    return {
+        'success': True,
+        'audio_url': artifact_url(artifact_id),
+        'filename': f'podcast_{int(time.time())}.mp3'
+    }
+
 @app.route('/api/article-to-podcast', methods=['POST'])
 def article_to_podcast():
     try:
         data = request.json
         article_text = data.get('article_text')
         script_word_count = data.get('script_word_count', 300)
+        fresh = bool(data.get('fresh', False))
         
         if not article_text:
             return jsonify({'error': 'Article text is required'}), 400
         
-        audio_bytes = article_podcast.create_podcast_from_article(
-            article_text=article_text,
-            script_word_count=script_word_count,
-            progress_callback=None
-        )
+        if data.get('async'):
+            return submit_job('article-to-podcast', run_article_to_podcast, article_text, script_word_count, fresh)
         
-        if audio_bytes:
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-            return jsonify({
-                'success': True,
-                'audio': audio_base64,
-                'filename': f'podcast_{int(time.time())}.mp3'
-            })
-        else:
-            return jsonify({'error': 'Failed to generate podcast'}), 500
+        return jsonify(run_article_to_podcast(article_text, script_word_count, fresh))
+    except UpstreamBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = job_queue.get(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response_data = {
+        'success': True,
+        'job_id': job_id,
+        'type': job['type'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress']
+    }
+    
+    if job['status'] == 'completed':
+        response_data['result'] = job['result']
+    elif job['status'] == 'failed':
+        response_data['error'] = job['error']
+    
+    if job['trace'] and request.headers.get('X-Trace'):
+        response_data['trace'] = job['trace']
+    
+    return jsonify(response_data)
+
+def current_user_id_optional():
+    """Return the JWT user id if the request carries a valid token, else None"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        return int(identity) if identity else None
+    except Exception:
+        return None
+
+def start_dubbing_from_path(input_video_path, source_lang, target_lang):
+    """Create the ElevenLabs project for a video on disk and register it"""
+    dubbing_id = dubbing_service.get().create_dubbing_project(
+        video_path=input_video_path,
+        source_lang=source_lang,
+        target_lang=target_lang,
+        project_name=f"Dubbing_{int(time.time())}"
+    )
+    
+    if dubbing_id:
+        project = DubbingProject(
+            dubbing_id=dubbing_id,
+            user_id=current_user_id_optional(),
+            source_lang=source_lang,
+            target_lang=target_lang,
+            status='dubbing'
+        )
+        db.session.add(project)
+        db.session.commit()
+    
+    return dubbing_id
+
 @app.route('/api/video-dubbing/start', methods=['POST'])
 def start_video_dubbing():
     try:
@@ -391,20 +898,9 @@ def start_video_dubbing():
             video_file.save(tmp_file.name)
             input_video_path = tmp_file.name
         
-        dubbing_id = dubbing_service.create_dubbing_project(
-            video_path=input_video_path,
-            source_lang=source_lang,
-            target_lang=target_lang,
-            project_name=f"Dubbing_{int(time.time())}"
-        )
+        dubbing_id = start_dubbing_from_path(input_video_path, source_lang, target_lang)
         
         if dubbing_id:
-            dubbing_projects[dubbing_id] = {
-                'source_lang': source_lang,
-                'target_lang': target_lang,
-                'status': 'processing'
-            }
-            
             return jsonify({
                 'success': True,
                 'dubbing_id': dubbing_id
@@ -412,41 +908,272 @@ def start_video_dubbing():
         else:
             os.unlink(input_video_path)
             return jsonify({'error': 'Failed to start dubbing'}), 500
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def upload_error_response(e):
+    response_data = {'error': str(e)}
+    if e.offset is not None:
+        response_data['offset'] = e.offset
+    return jsonify(response_data), e.status_code
+
+@app.route('/api/video-dubbing/uploads', methods=['POST'])
+def create_upload():
+    try:
+        data = request.json
+        total_size = data.get('size')
+        
+        if not isinstance(total_size, int):
+            return jsonify({'error': 'Upload size is required'}), 400
+        
+        session = upload_sessions.create(
+            total_size=total_size,
+            sha256=data.get('sha256'),
+            metadata={
+                'source_lang': data.get('source_lang', 'en'),
+                'target_lang': data.get('target_lang', 'hi')
+            }
+        )
+        
+        return jsonify({'success': True, **session}), 201
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/video-dubbing/uploads/<upload_id>', methods=['GET', 'PUT'])
+def upload_chunk(upload_id):
+    """GET reports the resume offset; PUT appends a Content-Range chunk, checked against X-Chunk-SHA256 if sent"""
+    try:
+        if request.method == 'GET':
+            return jsonify({'success': True, **upload_sessions.get_status(upload_id)})
+        
+        content_range = request.headers.get('Content-Range', '')
+        try:
+            # Content-Range: bytes <start>-<end>/<total>
+            byte_range = content_range.split(' ', 1)[1].split('/', 1)[0]
+            start, end = (int(part) for part in byte_range.split('-', 1))
+        except (IndexError, ValueError):
+            return jsonify({'error': 'Content-Range header is required (bytes start-end/total)'}), 400
+        
+        length = end - start + 1
+        if length <= 0 or (request.content_length is not None and request.content_length != length):
+            return jsonify({'error': 'Content-Range does not match the request body'}), 400
+        
+        status = upload_sessions.append(upload_id, start, request.stream, length,
+                                        sha256=request.headers.get('X-Chunk-SHA256'))
+        return jsonify({'success': True, **status})
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/video-dubbing/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    try:
+        # The upload is only consumed once dubbing has started; on failure the
+        # client can retry finalize without sending the video again
+        with upload_sessions.finalizing(upload_id, suffix='.mp4') as upload:
+            metadata = upload['metadata']
+            dubbing_id = start_dubbing_from_path(upload['path'], metadata['source_lang'], metadata['target_lang'])
+            if not dubbing_id:
+                raise UploadError('Failed to start dubbing; retry finalize', 502)
+        
+        return jsonify({
+            'success': True,
+            'dubbing_id': dubbing_id
+        })
+    except UploadError as e:
+        return upload_error_response(e)
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/video-dubbing/projects', methods=['GET'])
+@jwt_required()
+def list_dubbing_projects():
+    try:
+        user_id = int(get_jwt_identity())
+        projects = DubbingProject.query.filter_by(user_id=user_id).order_by(DubbingProject.created_at.desc()).limit(50).all()
+        
+        return jsonify({
+            'success': True,
+            'projects': [p.to_dict() for p in projects]
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/video-dubbing/status/<dubbing_id>', methods=['GET'])
 def get_dubbing_status(dubbing_id):
     try:
-        status_result = dubbing_service.get_dubbing_status(dubbing_id)
+        project = db.session.get(DubbingProject, dubbing_id)
+        
+        # Terminal projects never change again, so skip the upstream call
+        if project and project.is_terminal:
+            status = project.status
+        else:
+            status = dubbing_service.get().get_dubbing_status(dubbing_id)['status']
+            
+            if project and status != 'error' and status != project.status:
+                project.status = status
+                db.session.commit()
         
         return jsonify({
             'success': True,
-            'status': status_result['status'],
+            'status': status,
             'dubbing_id': dubbing_id
         })
+    except UpstreamBusy:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def record_dubbing_status(dubbing_id, status):
+    """Persist a status transition seen by the event poller"""
+    with app.app_context():
+        project = db.session.get(DubbingProject, dubbing_id)
+        if project and project.status != status:
+            project.status = status
+            db.session.commit()
+
+dubbing_event_broker = DubbingEventBroker(
+    status_fn=lambda dubbing_id: dubbing_service.get().get_dubbing_status(dubbing_id),
+    poll_interval=float(os.environ.get('DUBBING_POLL_INTERVAL', 5)),
+    on_status=record_dubbing_status
+)
+
+def format_sse(event, event_name='status'):
+    return f"event: {event_name}\ndata: {json.dumps(event)}\n\n"
+
+@app.route('/api/video-dubbing/events/<dubbing_id>', methods=['GET'])
+def dubbing_events(dubbing_id):
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    project = db.session.get(DubbingProject, dubbing_id)
+    
+    if project and project.is_terminal:
+        event = {'dubbing_id': dubbing_id, 'status': project.status}
+        return Response(format_sse(event), mimetype='text/event-stream', headers=headers)
+    
+    subscriber = dubbing_event_broker.subscribe(dubbing_id)
+    
+    def generate():
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                if event is None:
+                    break
+                
+                yield format_sse(event)
+        finally:
+            dubbing_event_broker.unsubscribe(dubbing_id, subscriber)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
 @app.route('/api/video-dubbing/download/<dubbing_id>', methods=['GET'])
 def download_dubbed_video(dubbing_id):
     try:
-        target_lang = request.args.get('target_lang', 'hi')
+        project = db.session.get(DubbingProject, dubbing_id)
+        default_lang = project.target_lang if project else 'hi'
+        target_lang = request.args.get('target_lang', default_lang)
+        is_project_result = project is not None and target_lang == project.target_lang
         
-        dubbed_video_path = dubbing_service.download_dubbed_video(dubbing_id, target_lang)
+        cache_key = download_cache_key(dubbing_id, target_lang)
+        download_name = f'dubbed_video_{int(time.time())}.mp4'
+        cached_path = download_cache.get_path(cache_key)
         
-        if dubbed_video_path and os.path.exists(dubbed_video_path):
-            return send_file(
-                dubbed_video_path,
+        if cached_path:
+            response = send_file(
+                cached_path,
                 as_attachment=True,
-                download_name=f'dubbed_video_{int(time.time())}.mp4',
-                mimetype='video/mp4'
+                download_name=download_name,
+                mimetype='video/mp4',
+                conditional=True,
+                etag=cache_key
             )
-        else:
+            response.headers['Accept-Ranges'] = 'bytes'
+            return response
+        
+        # First download: pass the upstream stream through to the client while
+        # teeing it into the cache; pull the first chunk so failures return JSON
+        upstream = iter(dubbing_service.get().stream_dubbed_video(dubbing_id, target_lang))
+        first_chunk = next(upstream, b'')
+        
+        if not first_chunk:
             return jsonify({'error': 'Failed to download dubbed video'}), 500
+        
+        def generate():
+            # Opened here rather than in the view so a response that is never
+            # iterated (client gone before the first byte, HEAD) leaves no part file
+            writer = download_cache.open_writer(cache_key)
+            try:
+                writer.write(first_chunk)
+                yield first_chunk
+                for chunk in upstream:
+                    writer.write(chunk)
+                    yield chunk
+            except BaseException:
+                # Client went away or upstream broke; never cache a partial file
+                writer.abort()
+                raise
+            
+            writer.commit()
+            if is_project_result:
+                # Reload: the view's session is torn down before streaming ends
+                finished_project = db.session.get(DubbingProject, dubbing_id)
+                finished_project.result_location = cache_key
+                finished_project.status = 'dubbed'
+                db.session.commit()
+        
+        response = Response(
+            stream_with_context(generate()),
+            mimetype='video/mp4',
+            headers={'Content-Disposition': f'attachment; filename={download_name}'}
+        )
+        # Release the upstream connection even if the body is never read
+        if hasattr(upstream, 'close'):
+            response.call_on_close(upstream.close)
+        return response
+    except UpstreamBusy:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/artifacts/<artifact_id>', methods=['GET'])
+def get_artifact(artifact_id):
+    artifact_path = artifact_store.get_path(secure_filename(artifact_id))
+    
+    if not artifact_path:
+        return jsonify({'error': 'Artifact not found or expired'}), 404
+    
+    extension = os.path.splitext(artifact_id)[1]
+    download_name = request.args.get('filename')
+    
+    # Artifacts are content-addressed, so the id doubles as a strong ETag and
+    # the response never changes; conditional=True adds Range/If-None-Match
+    response = send_file(
+        artifact_path,
+        mimetype=ARTIFACT_MIMETYPES.get(extension, 'application/octet-stream'),
+        as_attachment=bool(download_name),
+        download_name=secure_filename(download_name) if download_name else None,
+        conditional=True,
+        etag=artifact_id,
+        max_age=artifact_store.ttl_seconds
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
 @app.route('/attached_assets/<path:filename>')
 def serve_attached_assets(filename):
     try:
@@ -455,4 +1182,5 @@ def serve_attached_assets(filename):
         return jsonify({'error': str(e)}), 404
 
 if __name__ == '__main__':
+    warm_up_clients()
     app.run(host='0.0.0.0', port=5001, debug=False, use_reloader=False)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the backend
+
+Times `import backend` and the first /api/health request in fresh
+interpreters, and fails if the median exceeds the budget or if importing
+pulled in a feature's heavy dependencies
+
+    python bench_cold_start.py --runs 5 --budget-ms 1000 --top 15
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HEAVY_MODULES = [
+    'moviepy', 'librosa', 'yt_dlp', 'speech_recognition', 'google.genai',
+    'elevenlabs', 'pydub', 'ffmpeg', 'whisper', 'streamlit'
+]
+
+CHILD_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+import backend
+imported = time.perf_counter()
+backend.app.test_client().get('/api/health')
+ready = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'ready_ms': (ready - started) * 1000,
+    'heavy': [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(import_time: bool = False):
+    """Run one cold start in a subprocess; returns (result dict, stderr)"""
+    command = [sys.executable]
+    if import_time:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD_SCRIPT]
+
+    completed = subprocess.run(
+        command,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        print(completed.stderr)
+        raise RuntimeError('Backend failed to start')
+
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def slowest_imports(importtime_output: str, top: int):
+    """Parse `-X importtime` output into the slowest (cumulative_us, module) pairs"""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            rows.append((int(cumulative), name.strip()))
+        except ValueError:
+            continue
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backend cold start benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('COLD_START_BUDGET_MS', 1000)))
+    parser.add_argument('--top', type=int, default=0, help='show the N slowest imports')
+    args = parser.parse_args()
+
+    results = [run_once()[0] for _ in range(args.runs)]
+    import_ms = statistics.median(r['import_ms'] for r in results)
+    ready_ms = statistics.median(r['ready_ms'] for r in results)
+    heavy = sorted({name for r in results for name in r['heavy']})
+
+    print(f"import backend:       {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"ready (first health): {ready_ms:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if args.top:
+        _, stderr = run_once(import_time=True)
+        print("\nSlowest imports (cumulative):")
+        for cumulative, name in slowest_imports(stderr, args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"\nFAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if ready_ms > args.budget_ms:
+        print(f"\nFAIL: cold start {ready_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+
+    if not failed:
+        print("\nOK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import io
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Tuple, Iterator
+from upstream_limiter import UpstreamBusy
+from upstream_retry import call_upstream
+from tracing import traced, span
+
+
+class ChunkedTranscriber:
+    """Transcribes long audio by splitting it on silence and recognizing chunks concurrently
+
+    Non-silent regions are merged into chunks of at most max_chunk_ms, and a
+    region longer than that is cut at fixed intervals. Each chunk keeps its
+    offset so the results can be stitched back in order with timestamps.
+    pydub and speech_recognition are imported on first use
+    """
+
+    def __init__(self, max_workers: int = 4, max_chunk_ms: int = 30000, min_silence_ms: int = 500,
+                 silence_thresh_db: float = 16, padding_ms: int = 200):
+        """Initialize with the thread pool that runs the recognition calls"""
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stt')
+        self.max_chunk_ms = max_chunk_ms
+        self.min_silence_ms = min_silence_ms
+        self.silence_thresh_db = silence_thresh_db
+        self.padding_ms = padding_ms
+
+    def plan_chunks(self, audio) -> List[Tuple[int, int]]:
+        """Split a pydub AudioSegment into (start_ms, end_ms) chunks at silences"""
+        from pydub.silence import detect_nonsilent
+
+        mono = audio.set_channels(1)
+        regions = detect_nonsilent(
+            mono,
+            min_silence_len=self.min_silence_ms,
+            silence_thresh=mono.dBFS - self.silence_thresh_db,
+            seek_step=10
+        )
+
+        chunks = []
+        for start, end in regions:
+            start = max(0, start - self.padding_ms)
+            end = min(len(audio), end + self.padding_ms)
+
+            if chunks and end - chunks[-1][0] <= self.max_chunk_ms:
+                chunks[-1] = (chunks[-1][0], end)
+                continue
+
+            while end - start > self.max_chunk_ms:
+                chunks.append((start, start + self.max_chunk_ms))
+                start += self.max_chunk_ms
+            chunks.append((start, end))
+
+        return chunks
+
+    def _recognize_chunk(self, audio, index: int, start_ms: int, end_ms: int, language: Optional[str]) -> Dict:
+        import speech_recognition as sr
+
+        result = {'index': index, 'start': start_ms / 1000.0, 'end': end_ms / 1000.0, 'text': ''}
+
+        with span('stt_chunk', start_ms=start_ms) as s:
+            wav = io.BytesIO()
+            audio[start_ms:end_ms].export(wav, format='wav')
+            s.add_bytes(wav.tell())
+            wav.seek(0)
+
+            recognizer = sr.Recognizer()
+            with sr.AudioFile(wav) as source:
+                audio_data = recognizer.record(source)
+
+            kwargs = {'language': language} if language else {}
+            try:
+                result['text'] = call_upstream('google', 'recognize_google',
+                                               lambda: recognizer.recognize_google(audio_data, **kwargs))
+            except sr.UnknownValueError:
+                pass
+            except UpstreamBusy:
+                raise
+            except Exception as e:
+                print(f"Error recognizing chunk {index} at {start_ms}ms: {e}")
+                result['error'] = str(e)
+
+        return result
+
+    def iter_chunks(self, audio, chunks: List[Tuple[int, int]], language: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Recognize the planned chunks on the thread pool, yielding each result as it completes
+        Closing the iterator early cancels the chunks that haven't started
+        """
+        futures = [
+            self.executor.submit(contextvars.copy_context().run, self._recognize_chunk,
+                                 audio, index, start_ms, end_ms, language)
+            for index, (start_ms, end_ms) in enumerate(chunks)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def stitch(results: List[Dict]) -> Dict:
+        """
+        Order chunk results by position and join their text
+        failed_chunks lists the indexes of chunks whose recognition call failed
+        (as opposed to chunks that were recognized but held no speech)
+        """
+        ordered = sorted(results, key=lambda result: result['index'])
+        return {
+            'text': ' '.join(result['text'] for result in ordered if result['text']),
+            'chunks': ordered,
+            'failed_chunks': [result['index'] for result in ordered if 'error' in result]
+        }
+
+    @traced()
+    def transcribe(self, audio, language: Optional[str] = None,
+                   chunks: Optional[List[Tuple[int, int]]] = None) -> Dict:
+        """
+        Transcribe a pydub AudioSegment, planning its chunks unless given
+        Returns: stitch() of every chunk result
+        """
+        if chunks is None:
+            chunks = self.plan_chunks(audio)
+        return self.stitch(list(self.iter_chunks(audio, chunks, language)))
+
+
+def create_chunked_transcriber_from_env() -> ChunkedTranscriber:
+    """Build a transcriber from STT_WORKERS / STT_MAX_CHUNK_MS / STT_MIN_SILENCE_MS"""
+    return ChunkedTranscriber(
+        max_workers=int(os.environ.get('STT_WORKERS', 4)),
+        max_chunk_ms=int(os.environ.get('STT_MAX_CHUNK_MS', 30000)),
+        min_silence_ms=int(os.environ.get('STT_MIN_SILENCE_MS', 500))
+    )
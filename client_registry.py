@@ -0,0 +1,152 @@
+import os
+import threading
+from typing import Dict, Optional
+
+
+class ClientRegistry:
+    """Hands every service the same keep-alive pooled Gemini/ElevenLabs client per API key
+
+    Pool size and timeouts come from {PROVIDER}_{SETTING} env vars, falling
+    back to CLIENT_{SETTING}, e.g. GEMINI_POOL_SIZE or CLIENT_READ_TIMEOUT.
+    SDK imports happen on first use so the registry adds nothing to cold start
+    """
+
+    DEFAULTS = {
+        'POOL_SIZE': 20,
+        'KEEPALIVE': 10,
+        'CONNECT_TIMEOUT': 5.0,
+        'READ_TIMEOUT': 120.0
+    }
+
+    BASE_URLS = {
+        'gemini': 'https://generativelanguage.googleapis.com/',
+        'elevenlabs': 'https://api.elevenlabs.io/'
+    }
+
+    def __init__(self):
+        """Initialize with no clients built"""
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.http_clients = {}
+
+    def setting(self, provider: str, name: str) -> float:
+        value = os.environ.get(f'{provider.upper()}_{name}') or os.environ.get(f'CLIENT_{name}')
+        return type(self.DEFAULTS[name])(value) if value else self.DEFAULTS[name]
+
+    def _limits(self, provider: str):
+        import httpx
+        return httpx.Limits(
+            max_connections=self.setting(provider, 'POOL_SIZE'),
+            max_keepalive_connections=self.setting(provider, 'KEEPALIVE')
+        )
+
+    def _timeout(self, provider: str):
+        import httpx
+        return httpx.Timeout(self.setting(provider, 'READ_TIMEOUT'), connect=self.setting(provider, 'CONNECT_TIMEOUT'))
+
+    def _get(self, kind: str, api_key: str, build):
+        key = (kind, api_key)
+        client = self.clients.get(key)
+        if client is not None:
+            return client
+
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                client = self.clients[key] = build()
+            return client
+
+    def gemini(self, api_key: str):
+        """Shared google-genai client; its .aio side shares the same settings"""
+        def build():
+            from google import genai
+            from google.genai import types
+
+            options = {'timeout': int(self.setting('gemini', 'READ_TIMEOUT') * 1000)}
+            # Older google-genai releases (e.g. the 1.0.0 pin) have no client_args
+            # and reject unknown fields, so pool limits are only passed when supported
+            fields = getattr(types.HttpOptions, 'model_fields', {})
+            if 'client_args' in fields and 'async_client_args' in fields:
+                options['client_args'] = {'limits': self._limits('gemini')}
+                options['async_client_args'] = {'limits': self._limits('gemini')}
+
+            return genai.Client(api_key=api_key, http_options=types.HttpOptions(**options))
+
+        return self._get('gemini', api_key, build)
+
+    def elevenlabs(self, api_key: str):
+        """Shared ElevenLabs client backed by one pooled httpx.Client"""
+        def build():
+            import httpx
+            from elevenlabs.client import ElevenLabs
+
+            http_client = httpx.Client(limits=self._limits('elevenlabs'), timeout=self._timeout('elevenlabs'))
+            self.http_clients[('elevenlabs', api_key)] = http_client
+            return ElevenLabs(api_key=api_key, httpx_client=http_client,
+                              timeout=self.setting('elevenlabs', 'READ_TIMEOUT'))
+
+        return self._get('elevenlabs', api_key, build)
+
+    def elevenlabs_async(self, api_key: str):
+        """Shared AsyncElevenLabs client backed by one pooled httpx.AsyncClient"""
+        def build():
+            import httpx
+            from elevenlabs.client import AsyncElevenLabs
+
+            http_client = httpx.AsyncClient(limits=self._limits('elevenlabs'), timeout=self._timeout('elevenlabs'))
+            return AsyncElevenLabs(api_key=api_key, httpx_client=http_client,
+                                   timeout=self.setting('elevenlabs', 'READ_TIMEOUT'))
+
+        return self._get('elevenlabs_async', api_key, build)
+
+    def warm_up(self, gemini_api_key: Optional[str] = None, elevenlabs_api_key: Optional[str] = None) -> Dict:
+        """
+        Build the clients and open a TLS connection to each provider
+        Returns: provider -> 'ok' or the error message
+        """
+        results = {}
+
+        if elevenlabs_api_key:
+            try:
+                self.elevenlabs(elevenlabs_api_key)
+                self.http_clients[('elevenlabs', elevenlabs_api_key)].head(self.BASE_URLS['elevenlabs'])
+                results['elevenlabs'] = 'ok'
+            except Exception as e:
+                results['elevenlabs'] = str(e)
+
+        if gemini_api_key:
+            try:
+                # A metadata lookup is free and leaves a live connection in the SDK's pool
+                self.gemini(gemini_api_key).models.get(model='gemini-2.5-flash')
+                results['gemini'] = 'ok'
+            except Exception as e:
+                results['gemini'] = str(e)
+
+        for provider, result in results.items():
+            if result != 'ok':
+                print(f"Warning: could not warm up {provider} connection: {result}")
+
+        return results
+
+    def start_warm_up(self, gemini_api_key: Optional[str] = None, elevenlabs_api_key: Optional[str] = None):
+        """Run warm_up() on a background thread so it doesn't delay serving"""
+        threading.Thread(
+            target=self.warm_up, args=(gemini_api_key, elevenlabs_api_key),
+            name='client-warm-up', daemon=True
+        ).start()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            clients = {}
+            for kind, _ in self.clients:
+                clients[kind] = clients.get(kind, 0) + 1
+            return {
+                'clients': clients,
+                'settings': {
+                    provider: {name.lower(): self.setting(provider, name) for name in self.DEFAULTS}
+                    for provider in self.BASE_URLS
+                }
+            }
+
+
+shared_clients = ClientRegistry()
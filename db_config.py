@@ -0,0 +1,69 @@
+import os
+from typing import Optional, Dict
+
+
+DEFAULT_DATABASE_URL = 'sqlite:///anuvaad_ai.db'
+
+
+def database_url_from_env() -> str:
+    """DATABASE_URL, defaulting to the SQLite file in the instance folder"""
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Hosted Postgres often hands out postgres://, which SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url: str) -> Dict:
+    """
+    SQLAlchemy engine options for the URL's backend
+    Postgres gets a sized pool from DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT / DB_POOL_RECYCLE
+    """
+    options = {'pool_pre_ping': True}
+
+    if url.startswith('sqlite'):
+        options['connect_args'] = {'timeout': int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000)) / 1000.0}
+    else:
+        options.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800))
+        )
+
+    return options
+
+
+def install_sqlite_pragmas(engine):
+    """
+    Put every new SQLite connection in WAL mode with synchronous=NORMAL and a
+    busy timeout, so readers don't block the writer and concurrent writers
+    wait for the lock instead of failing with "database is locked"
+    """
+    from sqlalchemy import event
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    busy_timeout_ms = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+    synchronous = os.environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL')
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout_ms}')
+        cursor.close()
+
+
+def init_database(app, db, url: Optional[str] = None, tune_sqlite: bool = True):
+    """Configure the app's engine for DATABASE_URL (or url) and bind Flask-SQLAlchemy to it"""
+    url = url or database_url_from_env()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    db.init_app(app)
+
+    if tune_sqlite:
+        with app.app_context():
+            install_sqlite_pragmas(db.engine)
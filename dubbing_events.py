@@ -0,0 +1,106 @@
+import time
+import queue
+import threading
+from typing import Optional, Dict, Callable
+
+
+TERMINAL_STATUSES = ('dubbed', 'failed')
+
+
+class DubbingEventBroker:
+    """Polls each dubbing project once and fans status changes out to all subscribers"""
+
+    def __init__(self, status_fn: Callable[[str], Dict], poll_interval: float = 5.0,
+                 on_status: Optional[Callable[[str, str], None]] = None):
+        """
+        status_fn: function(dubbing_id) -> {'status': ...}, called by the poller
+        on_status: function(dubbing_id, status) called once per observed transition
+        """
+        self.status_fn = status_fn
+        self.poll_interval = poll_interval
+        self.on_status = on_status
+        self.lock = threading.Lock()
+
+        # dubbing_id -> {'subscribers': set of queues, 'last_event': dict or None}
+        self.channels = {}
+
+    def subscribe(self, dubbing_id: str) -> queue.Queue:
+        """
+        Register a subscriber and start the project's poller if it isn't running
+        The queue receives event dicts, then None once the project is terminal
+        """
+        subscriber = queue.Queue()
+
+        with self.lock:
+            channel = self.channels.get(dubbing_id)
+            if channel is None:
+                channel = {'subscribers': set(), 'last_event': None}
+                self.channels[dubbing_id] = channel
+                threading.Thread(
+                    target=self._poll, args=(dubbing_id,),
+                    name=f'dubbing-poller-{dubbing_id}', daemon=True
+                ).start()
+            elif channel['last_event']:
+                subscriber.put(channel['last_event'])
+
+            channel['subscribers'].add(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, dubbing_id: str, subscriber: queue.Queue):
+        with self.lock:
+            channel = self.channels.get(dubbing_id)
+            if channel:
+                channel['subscribers'].discard(subscriber)
+
+    def get_subscriber_count(self, dubbing_id: str) -> int:
+        with self.lock:
+            channel = self.channels.get(dubbing_id)
+            return len(channel['subscribers']) if channel else 0
+
+    def _poll(self, dubbing_id: str):
+        start_time = time.time()
+        last_status = None
+
+        while True:
+            with self.lock:
+                channel = self.channels[dubbing_id]
+                if not channel['subscribers']:
+                    # Everyone left; the next subscriber starts a fresh poller
+                    del self.channels[dubbing_id]
+                    return
+
+            try:
+                status = self.status_fn(dubbing_id)['status']
+            except Exception as e:
+                print(f"Error polling dubbing status: {e}")
+                status = 'error'
+
+            # 'error' means the lookup itself failed, not the job; keep polling
+            if status != 'error' and status != last_status:
+                last_status = status
+                event = {
+                    'dubbing_id': dubbing_id,
+                    'status': status,
+                    'elapsed': int(time.time() - start_time)
+                }
+
+                if self.on_status:
+                    try:
+                        self.on_status(dubbing_id, status)
+                    except Exception as e:
+                        print(f"Error recording dubbing status: {e}")
+
+                with self.lock:
+                    channel['last_event'] = event
+                    for subscriber in channel['subscribers']:
+                        subscriber.put(event)
+
+            if last_status in TERMINAL_STATUSES:
+                with self.lock:
+                    for subscriber in channel['subscribers']:
+                        subscriber.put(None)
+                    del self.channels[dubbing_id]
+                return
+
+            time.sleep(self.poll_interval)
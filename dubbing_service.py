@@ -1,16 +1,21 @@
 import os
 import tempfile
 import requests
-from elevenlabs.client import ElevenLabs
 from elevenlabs.types.voice_settings import VoiceSettings
 from typing import Optional
+from upstream_limiter import UpstreamBusy
+from upstream_retry import call_upstream
+from tts_cache import TTSCache, shared_tts_cache
+from client_registry import shared_clients
 
 class DubbingService:
     """Handles AI voice generation using ElevenLabs"""
     
-    def __init__(self, api_key: str):
-        """Initialize dubbing service with ElevenLabs API"""
-        self.client = ElevenLabs(api_key=api_key)
+    def __init__(self, api_key: str, tts_cache: Optional[TTSCache] = None):
+        """Initialize dubbing service with ElevenLabs API and the shared TTS cache"""
+        self.client = shared_clients.elevenlabs(api_key)
+        self.api_key = api_key
+        self.tts_cache = tts_cache or shared_tts_cache
         
         # Default voice IDs for different languages
         self.default_voices = {
@@ -29,7 +34,7 @@ class DubbingService:
     def get_available_voices(self) -> list:
         """Get list of available voices"""
         try:
-            voices = self.client.voices.get_all()
+            voices = call_upstream('elevenlabs', 'voices.get_all', self.client.voices.get_all, api_key=self.api_key)
             return [
                 {
                     'voice_id': voice.voice_id,
@@ -39,6 +44,8 @@ class DubbingService:
                 }
                 for voice in voices.voices
             ]
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error fetching voices: {e}")
             return []
@@ -83,23 +90,23 @@ class DubbingService:
             # Use appropriate model based on language
             model = "eleven_multilingual_v2"
             
-            response = self.client.text_to_speech.convert(
-                voice_id=voice_id,
+            # Save audio to temporary file (served from the TTS cache when possible)
+            output_path = tempfile.mktemp(suffix='.mp3')
+            
+            self.tts_cache.synthesize_to_file(
+                self.client, self.api_key,
                 text=text,
-                output_format="mp3_44100_128",
+                voice_id=voice_id,
                 model_id=model,
-                voice_settings=voice_settings_obj
+                output_format="mp3_44100_128",
+                voice_settings=voice_settings_obj,
+                output_path=output_path
             )
             
-            # Save audio to temporary file
-            output_path = tempfile.mktemp(suffix='.mp3')
-            
-            with open(output_path, 'wb') as f:
-                for chunk in response:
-                    f.write(chunk)
-            
             return output_path
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error generating speech: {e}")
             return None
@@ -152,20 +159,16 @@ class DubbingService:
                     use_speaker_boost=True
                 )
                 
-                response = self.client.text_to_speech.convert(
-                    voice_id=voice_id,
+                # Segment audio comes straight from the TTS cache
+                segment_path = self.tts_cache.synthesize(
+                    self.client, self.api_key,
                     text=text,
-                    output_format="mp3_44100_128",
+                    voice_id=voice_id,
                     model_id="eleven_multilingual_v2",
+                    output_format="mp3_44100_128",
                     voice_settings=voice_settings_obj
                 )
                 
-                # Save segment audio
-                segment_path = tempfile.mktemp(suffix='.mp3')
-                with open(segment_path, 'wb') as f:
-                    for chunk in response:
-                        f.write(chunk)
-                
                 # Load and adjust timing
                 segment_audio = AudioSegment.from_mp3(segment_path)
                 target_duration = int((end_time - start_time) * 1000)
@@ -191,9 +194,6 @@ class DubbingService:
                 
                 complete_audio += segment_audio
                 last_end_time = end_time
-                
-                # Cleanup
-                os.unlink(segment_path)
             
             # Export final audio
             output_path = tempfile.mktemp(suffix='.wav')
@@ -201,6 +201,8 @@ class DubbingService:
             
             return output_path
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error generating timed speech: {e}")
             return None
@@ -238,6 +240,8 @@ class DubbingService:
             
             return self.generate_speech(enhanced_text, language)
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error adjusting emotion: {e}")
             return self.generate_speech(text, language)
@@ -245,7 +249,8 @@ class DubbingService:
     def get_voice_info(self, voice_id: str) -> dict:
         """Get information about a specific voice"""
         try:
-            voice = self.client.voices.get(voice_id)
+            voice = call_upstream('elevenlabs', 'voices.get', lambda: self.client.voices.get(voice_id),
+                                  api_key=self.api_key)
             return {
                 'voice_id': voice.voice_id,
                 'name': voice.name,
@@ -254,6 +259,8 @@ class DubbingService:
                 'labels': voice.labels,
                 'preview_url': voice.preview_url
             }
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error getting voice info: {e}")
             return {}
@@ -1,15 +1,34 @@
 import os
 import time
 import tempfile
-from elevenlabs.client import ElevenLabs
-from typing import Optional, Dict
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Iterator
+from single_flight import SingleFlight
+from upstream_limiter import UpstreamBusy
+from upstream_retry import call_upstream, retrying_iter
+from tracing import traced, current_span
+from client_registry import shared_clients
 
 class ElevenLabsDubbing:
     """Handles video dubbing using ElevenLabs Dubbing API"""
     
-    def __init__(self, api_key: str):
+    TERMINAL_STATUSES = ('dubbed', 'failed')
+    
+    def __init__(self, api_key: str, status_ttl: float = 2.0, status_cache_size: int = 1000):
         """Initialize ElevenLabs dubbing service"""
-        self.client = ElevenLabs(api_key=api_key)
+        self.client = shared_clients.elevenlabs(api_key)
+        self.api_key = api_key
+        
+        # Status cache: in-progress entries expire after status_ttl seconds,
+        # terminal ones stay until pushed out by the LRU size cap
+        self.status_ttl = status_ttl
+        self.status_cache_size = status_cache_size
+        self.status_cache = OrderedDict()
+        self.status_cache_lock = threading.Lock()
+        self.status_flight = SingleFlight()
+        self.status_cache_hits = 0
+        self.status_cache_misses = 0
         
         # Language code mapping
         self.language_codes = {
@@ -25,6 +44,7 @@ class ElevenLabsDubbing:
             'zh': 'zh'
         }
     
+    @traced()
     def create_dubbing_project(self, video_path: str, source_lang: str, 
                               target_lang: str, project_name: str = "Dubbing Project") -> Optional[str]:
         """
@@ -35,35 +55,83 @@ class ElevenLabsDubbing:
             source_code = self.language_codes.get(source_lang, 'en')
             target_code = self.language_codes.get(target_lang, 'hi')
             
+            current_span().add_bytes(os.path.getsize(video_path))
+            
             # Upload video to ElevenLabs for dubbing
-            with open(video_path, 'rb') as video_file:
-                response = self.client.dubbing.create(
-                    target_lang=target_code,
-                    file=video_file,
-                    mode="automatic",
-                    source_lang=source_code,
-                    num_speakers=1,
-                    name=project_name,
-                    watermark=True
-                )
+            def upload():
+                with open(video_path, 'rb') as video_file:
+                    return self.client.dubbing.create(
+                        target_lang=target_code,
+                        file=video_file,
+                        mode="automatic",
+                        source_lang=source_code,
+                        num_speakers=1,
+                        name=project_name,
+                        watermark=True
+                    )
+            
+            response = call_upstream('elevenlabs', 'dubbing.create', upload, 'dubbing', self.api_key)
             
             dubbing_id = response.dubbing_id
             print(f"Created dubbing project: {dubbing_id}")
             return dubbing_id
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error creating dubbing project: {e}")
             return None
     
+    def _fetch_metadata(self, dubbing_id: str):
+        metadata = call_upstream('elevenlabs', 'dubbing.get', lambda: self.client.dubbing.get(dubbing_id=dubbing_id),
+                                 'dubbing', self.api_key)
+        
+        with self.status_cache_lock:
+            self.status_cache[dubbing_id] = (metadata, time.time())
+            self.status_cache.move_to_end(dubbing_id)
+            while len(self.status_cache) > self.status_cache_size:
+                self.status_cache.popitem(last=False)
+        
+        return metadata
+    
+    def get_dubbing_metadata(self, dubbing_id: str):
+        """
+        Get project metadata through the status cache
+        Concurrent misses for the same dubbing_id share one upstream call
+        """
+        with self.status_cache_lock:
+            entry = self.status_cache.get(dubbing_id)
+            if entry:
+                metadata, fetched_at = entry
+                if metadata.status in self.TERMINAL_STATUSES or time.time() - fetched_at < self.status_ttl:
+                    self.status_cache.move_to_end(dubbing_id)
+                    self.status_cache_hits += 1
+                    return metadata
+            self.status_cache_misses += 1
+        
+        metadata, _ = self.status_flight.do(dubbing_id, lambda: self._fetch_metadata(dubbing_id))
+        return metadata
+    
+    def get_status_cache_stats(self) -> Dict:
+        """Get hit/miss counters for the status cache"""
+        flight_stats = self.status_flight.get_stats()
+        with self.status_cache_lock:
+            return {
+                'hits': self.status_cache_hits,
+                'misses': self.status_cache_misses,
+                'upstream_calls': flight_stats['executed'],
+                'coalesced': flight_stats['shared'],
+                'entries': len(self.status_cache)
+            }
+    
+    @traced()
     def get_dubbing_status(self, dubbing_id: str) -> Dict:
         """
         Check the status of a dubbing project
         Returns: {'status': 'dubbing'|'dubbed'|'failed', 'metadata': ...}
         """
         try:
-            metadata = self.client.dubbing.get(
-                dubbing_id=dubbing_id
-            )
+            metadata = self.get_dubbing_metadata(dubbing_id)
             
             return {
                 'status': metadata.status,
@@ -71,10 +139,13 @@ class ElevenLabsDubbing:
                 'name': metadata.name if hasattr(metadata, 'name') else None
             }
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error getting dubbing status: {e}")
             return {'status': 'error', 'metadata': None}
     
+    @traced()
     def wait_for_dubbing_completion(self, dubbing_id: str, 
                                    callback=None, max_wait_seconds: int = 600) -> bool:
         """
@@ -93,10 +164,12 @@ class ElevenLabsDubbing:
                     print(f"Dubbing timed out after {max_wait_seconds} seconds")
                     return False
                 
-                # Get status
-                metadata = self.client.dubbing.get(
-                    dubbing_id=dubbing_id
-                )
+                # Get status, backing off while the upstream is saturated
+                try:
+                    metadata = self.get_dubbing_metadata(dubbing_id)
+                except UpstreamBusy as e:
+                    time.sleep(e.retry_after)
+                    continue
                 
                 status = metadata.status
                 
@@ -119,19 +192,31 @@ class ElevenLabsDubbing:
             print(f"Error waiting for dubbing: {e}")
             return False
     
+    def stream_dubbed_video(self, dubbing_id: str, target_lang: str) -> Iterator[bytes]:
+        """
+        Stream the dubbed video from ElevenLabs
+        Returns: Iterator of byte chunks (raises on failure once iterated)
+        """
+        target_code = self.language_codes.get(target_lang, 'hi')
+        
+        # The slot is held while the caller drains the stream, which can take as
+        # long as the client's download; downloads get their own limiter so slow
+        # clients can't starve status polls and project creation
+        yield from retrying_iter(
+            'elevenlabs', 'dubbing-download', self.api_key,
+            lambda: self.client.dubbing.audio.get(dubbing_id=dubbing_id, language_code=target_code),
+            'dubbing.audio.get'
+        )
+    
+    @traced(result_bytes=True)
     def download_dubbed_video(self, dubbing_id: str, target_lang: str) -> Optional[str]:
         """
         Download the dubbed video from ElevenLabs
         Returns: Path to downloaded video file
         """
         try:
-            target_code = self.language_codes.get(target_lang, 'hi')
-            
             # Get the dubbed file
-            audio_stream = self.client.dubbing.audio.get(
-                dubbing_id=dubbing_id,
-                language_code=target_code
-            )
+            audio_stream = self.stream_dubbed_video(dubbing_id, target_lang)
             
             # Save to temporary file
             output_path = tempfile.mktemp(suffix='.mp4')
@@ -143,10 +228,13 @@ class ElevenLabsDubbing:
             print(f"Downloaded dubbed video to: {output_path}")
             return output_path
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error downloading dubbed video: {e}")
             return None
     
+    @traced()
     def dub_video_complete(self, video_path: str, source_lang: str, 
                           target_lang: str, progress_callback=None) -> Optional[str]:
         """
@@ -1,12 +1,42 @@
 import axios from 'axios';
 
 const API_BASE_URL = '/api';
+const JOB_POLL_INTERVAL_MS = 2000;
+const UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
+// crypto.subtle only exists in secure (https/localhost) contexts; without it
+// chunks are sent unchecked
+const sha256Hex = async (blob) => {
+  if (!globalThis.crypto || !globalThis.crypto.subtle) return null;
+  const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+const waitForJob = async (jobId) => {
+  while (true) {
+    const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`);
+    const job = response.data;
+    if (job.status === 'completed') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Job failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+};
 
 export const api = {
   textToSpeech: async (text, voice) => {
     const response = await axios.post(`${API_BASE_URL}/text-to-speech`, {
       text,
-      voice
+      voice,
+      stream: true
+    }, {
+      responseType: 'blob'
     });
     return response.data;
   },
@@ -32,9 +62,10 @@ export const api = {
   youtubeSummary: async (url, wordCount) => {
     const response = await axios.post(`${API_BASE_URL}/youtube-summary`, {
       url,
-      word_count: wordCount
+      word_count: wordCount,
+      async: true
     });
-    return response.data;
+    return waitForJob(response.data.job_id);
   },
 
   wordToStory: async (words, theme, wordCount, language) => {
@@ -42,28 +73,68 @@ export const api = {
       words,
       theme,
       word_count: wordCount,
-      language
+      language,
+      async: true
     });
-    return response.data;
+    return waitForJob(response.data.job_id);
   },
 
   articleToPodcast: async (articleText, scriptWordCount) => {
     const response = await axios.post(`${API_BASE_URL}/article-to-podcast`, {
       article_text: articleText,
-      script_word_count: scriptWordCount
+      script_word_count: scriptWordCount,
+      async: true
     });
-    return response.data;
+    return waitForJob(response.data.job_id);
   },
 
-  startVideoDubbing: async (videoFile, sourceLang, targetLang) => {
-    const formData = new FormData();
-    formData.append('video', videoFile);
-    formData.append('source_lang', sourceLang);
-    formData.append('target_lang', targetLang);
-    const response = await axios.post(`${API_BASE_URL}/video-dubbing/start`, formData, {
-      headers: { 'Content-Type': 'multipart/form-data' }
+  startVideoDubbing: async (videoFile, sourceLang, targetLang, onProgress) => {
+    const session = await axios.post(`${API_BASE_URL}/video-dubbing/uploads`, {
+      size: videoFile.size,
+      source_lang: sourceLang,
+      target_lang: targetLang
     });
-    return response.data;
+    const uploadId = session.data.upload_id;
+    const uploadUrl = `${API_BASE_URL}/video-dubbing/uploads/${uploadId}`;
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < videoFile.size) {
+      const end = Math.min(offset + UPLOAD_CHUNK_BYTES, videoFile.size);
+      const chunk = videoFile.slice(offset, end);
+      const headers = {
+        'Content-Type': 'application/octet-stream',
+        'Content-Range': `bytes ${offset}-${end - 1}/${videoFile.size}`
+      };
+      const chunkSha256 = await sha256Hex(chunk);
+      if (chunkSha256) headers['X-Chunk-SHA256'] = chunkSha256;
+      try {
+        const response = await axios.put(uploadUrl, chunk, { headers });
+        offset = response.data.offset;
+        retries = 0;
+        if (onProgress) onProgress(offset / videoFile.size);
+      } catch (err) {
+        if (retries >= UPLOAD_MAX_RETRIES) throw err;
+        retries += 1;
+        // Ask the server how much it actually has and resume from there
+        const status = await axios.get(uploadUrl);
+        offset = status.data.offset;
+      }
+    }
+
+    // The server keeps the upload until dubbing starts, so a busy or failing
+    // upstream only costs a finalize retry, not a re-upload
+    for (let attempt = 0; ; attempt += 1) {
+      try {
+        const response = await axios.post(`${uploadUrl}/finalize`);
+        return response.data;
+      } catch (err) {
+        const status = err.response && err.response.status;
+        if (attempt >= UPLOAD_MAX_RETRIES || ![500, 502, 503].includes(status)) throw err;
+        const retryAfter = Number(err.response.data && err.response.data.retry_after) || 2 ** attempt;
+        await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+      }
+    }
   },
 
   getDubbingStatus: async (dubbingId) => {
@@ -71,6 +142,25 @@ export const api = {
     return response.data;
   },
 
+  subscribeDubbingEvents: (dubbingId, onStatus, onError) => {
+    const source = new EventSource(`${API_BASE_URL}/video-dubbing/events/${dubbingId}`);
+    source.addEventListener('status', (e) => {
+      const event = JSON.parse(e.data);
+      onStatus(event);
+      if (event.status === 'dubbed' || event.status === 'failed') {
+        source.close();
+      }
+    });
+    source.onerror = () => {
+      // The server closes the stream after a terminal event; only report
+      // errors that happen while the stream is still expected to be open
+      if (source.readyState === EventSource.CLOSED) {
+        onError();
+      }
+    };
+    return () => source.close();
+  },
+
   downloadDubbedVideo: async (dubbingId, targetLang) => {
     const response = await axios.get(`${API_BASE_URL}/video-dubbing/download/${dubbingId}`, {
       params: { target_lang: targetLang },
@@ -23,13 +23,8 @@ function ArticleToPodcast() {
     try {
       const result = await api.articleToPodcast(articleText, scriptWordCount);
       
-      if (result.audio) {
-        const audioBlob = new Blob(
-          [Uint8Array.from(atob(result.audio), c => c.charCodeAt(0))],
-          { type: 'audio/mpeg' }
-        );
-        const url = URL.createObjectURL(audioBlob);
-        setAudioUrl(url);
+      if (result.audio_url) {
+        setAudioUrl(result.audio_url);
       }
       
       setSuccess(true);
@@ -23,16 +23,16 @@ function TextToSpeech() {
     setAudioUrl(null);
 
     try {
-      const result = await api.textToSpeech(text, voice);
-      const audioBlob = new Blob(
-        [Uint8Array.from(atob(result.audio), c => c.charCodeAt(0))],
-        { type: 'audio/mpeg' }
-      );
+      const audioBlob = await api.textToSpeech(text, voice);
       const url = URL.createObjectURL(audioBlob);
       setAudioUrl(url);
       setSuccess(true);
     } catch (err) {
-      setError(err.response?.data?.error || 'Failed to generate speech');
+      const data = err.response?.data;
+      const message = data instanceof Blob
+        ? (await data.text().then(JSON.parse).catch(() => ({}))).error
+        : data?.error;
+      setError(message || 'Failed to generate speech');
     } finally {
       setLoading(false);
     }
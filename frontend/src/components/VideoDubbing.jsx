@@ -41,32 +41,36 @@ function VideoDubbing() {
     setDubbedPreview(null);
   };
 
-  const checkStatus = async (id) => {
-    try {
-      const result = await api.getDubbingStatus(id);
-      setStatus(result.status);
-
-      if (result.status === 'dubbing') {
-        setProgress(50);
-        setTimeout(() => checkStatus(id), 3000);
-      } else if (result.status === 'dubbed') {
-        setProgress(100);
-        setLoading(false);
+  const handleStatus = async (id, newStatus) => {
+    setStatus(newStatus);
 
-        // 👇 Auto-fetch preview after dubbing
-        const blob = await api.downloadDubbedVideo(id, targetLang);
-        const url = URL.createObjectURL(blob);
-        setDubbedPreview(url);
-      } else if (result.status === 'error' || result.status === 'failed') {
-        setError('Dubbing failed. Please try again.');
-        setLoading(false);
-      }
-    } catch (err) {
-      setError('Failed to check status');
+    if (newStatus === 'dubbing') {
+      setProgress(50);
+    } else if (newStatus === 'dubbed') {
+      setProgress(100);
+      setLoading(false);
+
+      // 👇 Auto-fetch preview after dubbing
+      const blob = await api.downloadDubbedVideo(id, targetLang);
+      const url = URL.createObjectURL(blob);
+      setDubbedPreview(url);
+    } else if (newStatus === 'failed') {
+      setError('Dubbing failed. Please try again.');
       setLoading(false);
     }
   };
 
+  const watchStatus = (id) => {
+    api.subscribeDubbingEvents(
+      id,
+      (event) => handleStatus(id, event.status).catch(() => setError('Failed to load dubbed video')),
+      () => {
+        setError('Failed to check status');
+        setLoading(false);
+      }
+    );
+  };
+
   const handleDub = async () => {
     if (!videoFile) {
       setError('Please upload a video file first');
@@ -84,7 +88,7 @@ function VideoDubbing() {
       setProgress(30);
       setStatus('Processing...');
 
-      checkStatus(result.dubbing_id);
+      watchStatus(result.dubbing_id);
     } catch (err) {
       setError(err.response?.data?.error || 'Failed to start dubbing');
       setLoading(false);
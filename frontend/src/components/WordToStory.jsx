@@ -32,13 +32,8 @@ function WordToStory() {
       const result = await api.wordToStory(words, theme, wordCount, language);
       setStory(result.story);
       
-      if (result.audio) {
-        const audioBlob = new Blob(
-          [Uint8Array.from(atob(result.audio), c => c.charCodeAt(0))],
-          { type: 'audio/mpeg' }
-        );
-        const url = URL.createObjectURL(audioBlob);
-        setAudioUrl(url);
+      if (result.audio_url) {
+        setAudioUrl(result.audio_url);
       }
       
       setSuccess(true);
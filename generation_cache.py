@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from upstream_retry import call_upstream
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'generation_cache.db')
+
+
+def _config_dict(config: Any) -> Optional[Dict]:
+    if config is None:
+        return None
+    if hasattr(config, 'model_dump'):
+        return config.model_dump(exclude_none=True)
+    return dict(config)
+
+
+class GenerationCache:
+    """Persistent cache of Gemini generate_content text responses
+
+    Entries are keyed on (model, prompt hash, generation config) and expire
+    after ttl_seconds. An in-memory LRU sits in front of a SQLite table so
+    the warm cache survives restarts
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, ttl_seconds: int = 7 * 24 * 3600,
+                 memory_size: int = 512):
+        """Initialize cache, create the SQLite table and drop expired entries"""
+        self.ttl_seconds = ttl_seconds
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_generation_cache_created ON generation_cache (created_at)')
+        self.conn.commit()
+
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, config: Any = None) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        payload = json.dumps([model, prompt_hash, _config_dict(config)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, cache_key: str, response: str, created_at: float):
+        """Put an entry in the memory tier (caller holds the lock)"""
+        self.memory[cache_key] = (response, created_at)
+        self.memory.move_to_end(cache_key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, cache_key: str) -> Optional[str]:
+        with self.lock:
+            oldest = time.time() - self.ttl_seconds
+
+            entry = self.memory.get(cache_key)
+            if entry is not None:
+                if entry[1] >= oldest:
+                    self.memory.move_to_end(cache_key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self.memory[cache_key]
+
+            row = self.conn.execute(
+                'SELECT response, created_at FROM generation_cache WHERE cache_key = ?', (cache_key,)
+            ).fetchone()
+            if row and row[1] >= oldest:
+                self.disk_hits += 1
+                self._remember(cache_key, row[0], row[1])
+                return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, cache_key: str, response: str, model: str):
+        with self.lock:
+            created_at = time.time()
+            self._remember(cache_key, response, created_at)
+            self.conn.execute(
+                'INSERT OR REPLACE INTO generation_cache (cache_key, response, model, created_at) VALUES (?, ?, ?, ?)',
+                (cache_key, response, model, created_at)
+            )
+            self.conn.commit()
+
+    def generate(self, client, api_key: Optional[str], model: str, prompt: str,
+                 config: Any = None, fresh: bool = False) -> Optional[str]:
+        """
+        Read-through generate_content returning the stripped response text
+        fresh=True skips the lookup (for new creative output) but still
+        stores the result so later non-fresh callers get the latest text
+        """
+        cache_key = self.make_key(model, prompt, config)
+
+        if fresh:
+            with self.lock:
+                self.bypassed += 1
+        else:
+            cached = self.get(cache_key)
+            if cached is not None:
+                return cached
+
+        kwargs = {'model': model, 'contents': prompt}
+        if config is not None:
+            kwargs['config'] = config
+
+        response = call_upstream('gemini', 'generate_content', lambda: client.models.generate_content(**kwargs),
+                                 model, api_key)
+
+        if not response or not response.text:
+            return None
+
+        text = response.text.strip()
+        self.set(cache_key, text, model)
+        return text
+
+    def purge_expired(self) -> int:
+        with self.lock:
+            cursor = self.conn.execute(
+                'DELETE FROM generation_cache WHERE created_at < ?', (time.time() - self.ttl_seconds,)
+            )
+            self.conn.commit()
+            return cursor.rowcount
+
+    def invalidate(self) -> int:
+        with self.lock:
+            cursor = self.conn.execute('DELETE FROM generation_cache')
+            self.conn.commit()
+            self.memory.clear()
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            entries = self.conn.execute('SELECT COUNT(*) FROM generation_cache').fetchone()[0]
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'entries': entries
+            }
+
+
+def create_generation_cache_from_env() -> GenerationCache:
+    """Build a generation cache from GENERATION_CACHE_DB / _TTL_SECONDS / _MEMORY_SIZE"""
+    return GenerationCache(
+        db_path=os.environ.get('GENERATION_CACHE_DB', DEFAULT_DB_PATH),
+        ttl_seconds=int(os.environ.get('GENERATION_CACHE_TTL_SECONDS', 7 * 24 * 3600)),
+        memory_size=int(os.environ.get('GENERATION_CACHE_MEMORY_SIZE', 512))
+    )
+
+
+shared_generation_cache = create_generation_cache_from_env()
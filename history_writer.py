@@ -0,0 +1,180 @@
+import os
+import math
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Optional, Dict, List, Tuple
+from models import db, UserHistory
+
+
+class HistoryWriterFull(Exception):
+    """Raised when the write buffer stays full past the enqueue timeout"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"History write buffer is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class HistoryWriter:
+    """Write-behind buffer that inserts UserHistory rows in batched transactions
+
+    A background thread group-commits: it takes every row already buffered
+    (up to batch_size) and commits as soon as the buffer is drained, so rows
+    arriving while a commit is in progress share the next one. A steady
+    stream of rows is cut into batches at most flush_interval_ms apart. The
+    buffer is drained on close(). Callers get a Future resolving to the saved
+    row's dict, so they can either wait for the commit or return early
+    """
+
+    def __init__(self, app, batch_size: int = 100, flush_interval_ms: int = 200,
+                 max_queue: int = 10000, enqueue_timeout: float = 0.5):
+        """Initialize writer for the Flask app whose database receives the rows"""
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout
+        self.queue: 'queue.Queue[Tuple[Dict, Future]]' = queue.Queue(maxsize=max_queue)
+
+        self.lock = threading.Lock()
+        # Serializes submit()'s closed check and put against close()
+        self.submit_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.rejected = 0
+        self.high_water = 0
+        self.last_flush_ms = None
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self.thread.start()
+
+    def retry_after(self) -> int:
+        """Estimate how long the current backlog takes to drain"""
+        batches_queued = self.queue.qsize() / self.batch_size
+        flush_seconds = max(self.flush_interval, (self.last_flush_ms or 0) / 1000.0)
+        return max(1, math.ceil(batches_queued * flush_seconds))
+
+    def submit(self, user_id: int, feature_type: str, feature_data=None) -> Future:
+        """
+        Buffer one history row
+        Returns: Future resolving to the saved row's to_dict()
+        Raises HistoryWriterFull when the buffer has no room within enqueue_timeout
+        """
+        self._ensure_started()
+
+        future = Future()
+        row = {'user_id': user_id, 'feature_type': feature_type, 'feature_data': feature_data}
+        try:
+            with self.submit_lock:
+                if self.closed:
+                    raise RuntimeError('History writer is closed')
+                self.queue.put((row, future), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            raise HistoryWriterFull(self.retry_after())
+
+        depth = self.queue.qsize()
+        if depth > self.high_water:
+            with self.lock:
+                self.high_water = max(self.high_water, depth)
+        return future
+
+    def _next_batch(self) -> List[Tuple[Dict, Future]]:
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        # Take what is already queued but never wait for more; an empty queue means commit now
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and time.monotonic() < deadline:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self.closed and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def _insert(self, batch: List[Tuple[Dict, Future]]) -> List[Dict]:
+        entries = [UserHistory(**row) for row, _ in batch]
+        db.session.add_all(entries)
+        # Flush first so ids/defaults are populated without re-selecting after commit
+        db.session.flush()
+        saved = [entry.to_dict() for entry in entries]
+        db.session.commit()
+        return saved
+
+    def _flush(self, batch: List[Tuple[Dict, Future]]):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                results = [(future, saved, None) for (_, future), saved in zip(batch, self._insert(batch))]
+            except Exception as e:
+                db.session.rollback()
+                print(f"History batch of {len(batch)} failed ({e}), retrying rows individually")
+                results = []
+                for item in batch:
+                    try:
+                        results.append((item[1], self._insert([item])[0], None))
+                    except Exception as row_error:
+                        db.session.rollback()
+                        results.append((item[1], None, row_error))
+
+        with self.lock:
+            self.batches += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            for _, saved, error in results:
+                if error is None:
+                    self.rows_written += 1
+                else:
+                    self.rows_failed += 1
+
+        for future, saved, error in results:
+            if error is None:
+                future.set_result(saved)
+            else:
+                future.set_exception(error)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Stop accepting rows and wait for the buffer to drain"""
+        with self.submit_lock:
+            self.closed = True
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'queued': self.queue.qsize(),
+                'max_queue': self.queue.maxsize,
+                'high_water': self.high_water,
+                'rejected': self.rejected,
+                'rows_written': self.rows_written,
+                'rows_failed': self.rows_failed,
+                'batches': self.batches,
+                'avg_batch_size': round(self.rows_written / self.batches, 1) if self.batches else 0.0,
+                'last_flush_ms': round(self.last_flush_ms, 1) if self.last_flush_ms is not None else None
+            }
+
+
+def create_history_writer_from_env(app) -> HistoryWriter:
+    """Build a history writer from HISTORY_BATCH_SIZE / HISTORY_FLUSH_MS / HISTORY_QUEUE_LIMIT"""
+    return HistoryWriter(
+        app,
+        batch_size=int(os.environ.get('HISTORY_BATCH_SIZE', 100)),
+        flush_interval_ms=int(os.environ.get('HISTORY_FLUSH_MS', 200)),
+        max_queue=int(os.environ.get('HISTORY_QUEUE_LIMIT', 10000))
+    )
@@ -0,0 +1,108 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Callable
+from tracing import start_trace
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another pending job"""
+    pass
+
+
+class JobQueue:
+    """Runs long pipelines on a bounded worker pool and tracks their progress"""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, result_ttl: int = 3600):
+        """Initialize job queue with a fixed number of workers"""
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, job_type: str, func: Callable, *args, **kwargs) -> str:
+        """
+        Queue a job for background execution
+        func is called with a progress_callback(stage, percentage) keyword argument
+        Returns: job_id
+        """
+        with self.lock:
+            self._prune_expired()
+
+            pending = sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Job queue is full ({pending} pending jobs)")
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'type': job_type,
+                'status': 'queued',
+                'stage': 'Queued',
+                'progress': 0,
+                'result': None,
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'trace': None
+            }
+
+        self.executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a snapshot of a job's state"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, func: Callable, args: tuple, kwargs: dict):
+        self._update(job_id, status='running', stage='Starting...', started_at=time.time())
+
+        def progress_callback(stage: str, percentage: int):
+            self._update(job_id, stage=stage, progress=percentage)
+
+        with self.lock:
+            job_type = self.jobs[job_id]['type']
+
+        try:
+            with start_trace(f'job {job_type}') as trace:
+                result = func(*args, progress_callback=progress_callback, **kwargs)
+            self._update(job_id, status='completed', stage='Complete!', progress=100,
+                         result=result, finished_at=time.time(), trace=trace.header_value())
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time(),
+                         trace=trace.header_value())
+
+    def _prune_expired(self):
+        """Drop finished jobs older than result_ttl (caller holds the lock)"""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['finished_at'] and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self.executor.shutdown(wait=wait)
+
+
+def create_job_queue_from_env() -> JobQueue:
+    """Build a job queue sized from JOB_WORKERS / JOB_QUEUE_LIMIT / JOB_RESULT_TTL"""
+    return JobQueue(
+        max_workers=int(os.environ.get('JOB_WORKERS', 4)),
+        max_pending=int(os.environ.get('JOB_QUEUE_LIMIT', 32)),
+        result_ttl=int(os.environ.get('JOB_RESULT_TTL', 3600))
+    )
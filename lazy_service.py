@@ -0,0 +1,40 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class LazyService:
+    """Builds a service on first use, exactly once, under a lock
+
+    The factory does its own heavy imports so a process only pays for a
+    feature's dependencies when that feature is first used. A factory may
+    return None when the service isn't configured (e.g. missing API key)
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        """Initialize with the factory that constructs the service"""
+        self.name = name
+        self.factory = factory
+        self.lock = threading.Lock()
+        self.initialized = False
+        self.instance = None
+        self.init_seconds = None
+
+    def get(self) -> Optional[Any]:
+        if self.initialized:
+            return self.instance
+
+        with self.lock:
+            if not self.initialized:
+                started = time.perf_counter()
+                self.instance = self.factory()
+                self.init_seconds = time.perf_counter() - started
+                self.initialized = True
+            return self.instance
+
+    def get_stats(self) -> Dict:
+        return {
+            'initialized': self.initialized,
+            'configured': self.instance is not None if self.initialized else None,
+            'init_ms': round(self.init_seconds * 1000, 1) if self.init_seconds is not None else None
+        }
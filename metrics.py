@@ -0,0 +1,260 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+
+# Upstream calls range from sub-second translations to multi-minute dubbing uploads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _samples(self) -> Iterator[str]:
+        with self.lock:
+            items = list(self.values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down per label set"""
+
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def _samples(self) -> Iterator[str]:
+        with self.lock:
+            items = [(key, list(e['buckets']), e['sum'], e['count']) for key, e in self.values.items()]
+        for key, buckets, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, buckets):
+                cumulative += n
+                le = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{le} {cumulative}'
+            labels = _format_labels(self.label_names, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    'anuvaad_http_request_duration_seconds',
+    'Time until response headers, per route',
+    ('method', 'route', 'status')
+)
+http_requests_in_flight = registry.gauge(
+    'anuvaad_http_requests_in_flight', 'Requests currently being handled', ('route',)
+)
+http_request_bytes = registry.counter(
+    'anuvaad_http_request_bytes_total', 'Request body bytes received', ('route',)
+)
+http_response_bytes = registry.counter(
+    'anuvaad_http_response_bytes_total', 'Response body bytes sent', ('route',)
+)
+upstream_call_duration = registry.histogram(
+    'anuvaad_upstream_call_duration_seconds',
+    'Upstream call latency, excluding time queued on the limiter',
+    ('provider', 'operation', 'model')
+)
+upstream_call_errors = registry.counter(
+    'anuvaad_upstream_call_errors_total', 'Failed upstream calls', ('provider', 'operation', 'model', 'error')
+)
+upstream_calls_abandoned = registry.counter(
+    'anuvaad_upstream_calls_abandoned_total', 'Upstream calls closed or cancelled by the caller before finishing',
+    ('provider', 'operation', 'model')
+)
+upstream_calls_in_flight = registry.gauge(
+    'anuvaad_upstream_calls_in_flight', 'Upstream calls currently running', ('provider', 'operation')
+)
+upstream_retries = registry.counter(
+    'anuvaad_upstream_retries_total', 'Upstream calls retried after a transient failure',
+    ('provider', 'operation', 'error')
+)
+upstream_hedges = registry.counter(
+    'anuvaad_upstream_hedges_total', 'Hedged duplicate upstream calls, by which copy answered first',
+    ('provider', 'operation', 'winner')
+)
+
+
+@contextmanager
+def track_upstream(provider: str, operation: str, model: Optional[str] = None):
+    """
+    Record latency, errors and in-flight count for the upstream call in the block
+    A stream closed by its consumer (GeneratorExit) or a cancelled coroutine is
+    counted as abandoned, not as an error, and its duration is left out
+    """
+    model = model or ''
+    upstream_calls_in_flight.inc(provider=provider, operation=operation)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_call_errors.inc(provider=provider, operation=operation, model=model, error=type(e).__name__)
+        upstream_call_duration.observe(time.perf_counter() - started,
+                                       provider=provider, operation=operation, model=model)
+        raise
+    except (GeneratorExit, asyncio.CancelledError):
+        upstream_calls_abandoned.inc(provider=provider, operation=operation, model=model)
+        raise
+    else:
+        upstream_call_duration.observe(time.perf_counter() - started,
+                                       provider=provider, operation=operation, model=model)
+    finally:
+        upstream_calls_in_flight.dec(provider=provider, operation=operation)
+
+
+def count_bytes(chunks: Iterable[bytes], route: str) -> Iterator[bytes]:
+    """Pass a streamed response body through, counting the bytes sent"""
+    try:
+        for chunk in chunks:
+            http_response_bytes.inc(len(chunk), route=route)
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def instrument_flask(app):
+    """Register request hooks recording per-route latency, in-flight and byte metrics"""
+    from flask import request, g
+
+    def route_label() -> str:
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_route = route_label()
+        g.metrics_started = time.perf_counter()
+        http_requests_in_flight.inc(route=g.metrics_route)
+        if request.content_length:
+            http_request_bytes.inc(request.content_length, route=g.metrics_route)
+
+    @app.after_request
+    def _metrics_response(response):
+        route = g.get('metrics_route')
+        if route is None:
+            return response
+        g.metrics_status = response.status_code
+
+        if response.is_streamed and response.content_length is None:
+            response.response = count_bytes(response.response, route)
+        elif response.content_length:
+            http_response_bytes.inc(response.content_length, route=route)
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(error=None):
+        route = g.pop('metrics_route', None)
+        if route is None:
+            return
+        http_requests_in_flight.dec(route=route)
+        http_request_duration.observe(time.perf_counter() - g.pop('metrics_started'),
+                                      method=request.method, route=route,
+                                      status=str(g.pop('metrics_status', 500)))
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from datetime import datetime
+from password_hasher import password_hasher
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -17,10 +18,13 @@ class User(db.Model):
     history = db.relationship('UserHistory', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -32,6 +36,9 @@ class User(db.Model):
 
 class UserHistory(db.Model):
     __tablename__ = 'user_history'
+    __table_args__ = (
+        db.Index('ix_user_history_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -46,3 +53,42 @@ class UserHistory(db.Model):
             'feature_data': self.feature_data,
             'created_at': self.created_at.isoformat()
         }
+    
+    def to_summary_dict(self):
+        """List view without the feature_data blob"""
+        return {
+            'id': self.id,
+            'feature_type': self.feature_type,
+            'created_at': self.created_at.isoformat()
+        }
+
+class DubbingProject(db.Model):
+    __tablename__ = 'dubbing_projects'
+    __table_args__ = (
+        db.Index('ix_dubbing_projects_user_created', 'user_id', 'created_at'),
+    )
+    
+    TERMINAL_STATUSES = ('dubbed', 'failed')
+    
+    dubbing_id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    source_lang = db.Column(db.String(10), nullable=False)
+    target_lang = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='dubbing')
+    result_location = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def is_terminal(self):
+        return self.status in self.TERMINAL_STATUSES
+    
+    def to_dict(self):
+        return {
+            'dubbing_id': self.dubbing_id,
+            'source_lang': self.source_lang,
+            'target_lang': self.target_lang,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,111 @@
+import os
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Callable, Any
+from flask_bcrypt import Bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashes are pending or one didn't finish in time"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Authentication is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a dedicated bounded thread pool
+
+    Keeps login/signup storms from tying up every request thread with
+    ~100 ms of CPU each; bcrypt releases the GIL, so max_workers hashes run
+    in parallel and up to max_pending wait behind them
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 2, max_pending: int = 64, timeout: float = 10.0):
+        """Initialize hasher with the bcrypt cost used for new hashes"""
+        self.rounds = rounds
+        self.bcrypt = Bcrypt()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+
+    def _done(self, _future):
+        with self.lock:
+            self.pending -= 1
+
+    def retry_after(self) -> int:
+        # Each cost step doubles the work; cost 12 is roughly 0.25s per hash
+        seconds_per_hash = 0.25 * 2 ** (self.rounds - 12)
+        return max(1, math.ceil(self.pending * seconds_per_hash / self.max_workers))
+
+    def _run(self, func: Callable, *args) -> Any:
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy(self.retry_after())
+            self.pending += 1
+
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                self.rejected += 1
+            raise PasswordHasherBusy(self.retry_after())
+
+    def hash(self, password: str) -> str:
+        with self.lock:
+            self.hashed += 1
+        return self._run(self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        with self.lock:
+            self.verified += 1
+        return self._run(self.bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when the hash was made with a different cost than the configured one"""
+        try:
+            # Format: $2b$<cost>$<salt+hash>
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def record_rehash(self):
+        with self.lock:
+            self.rehashed += 1
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'rounds': self.rounds,
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'rejected': self.rejected,
+                'hashed': self.hashed,
+                'verified': self.verified,
+                'rehashed': self.rehashed
+            }
+
+
+def create_password_hasher_from_env() -> PasswordHasher:
+    """Build a hasher from BCRYPT_ROUNDS / BCRYPT_WORKERS / BCRYPT_MAX_PENDING / BCRYPT_TIMEOUT"""
+    return PasswordHasher(
+        rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+        max_workers=int(os.environ.get('BCRYPT_WORKERS', min(4, os.cpu_count() or 1))),
+        max_pending=int(os.environ.get('BCRYPT_MAX_PENDING', 64)),
+        timeout=float(os.environ.get('BCRYPT_TIMEOUT', 10))
+    )
+
+
+password_hasher = create_password_hasher_from_env()
@@ -0,0 +1,406 @@
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Iterator,
+                    Optional, Tuple)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamCall:
+    def __init__(self):
+        self.cond = threading.Condition()
+        # Window of buffered chunks; base is the stream index of chunks[0]
+        self.chunks = deque()
+        self.base = 0
+        self.buffered_bytes = 0
+        self.followers = set()
+        self.done = False
+        self.error = None
+
+    def join(self) -> Optional['_StreamFollower']:
+        """Add a follower if the stream can still be replayed from its first chunk"""
+        with self.cond:
+            if self.done or self.base > 0:
+                return None
+            follower = _StreamFollower(self)
+            self.followers.add(follower)
+            return follower
+
+    def trim(self, limit: int, force: bool = False):
+        """
+        Drop chunks every follower has read while over limit bytes; with
+        force, keep dropping past lagging followers (caller holds cond)
+        """
+        floor = min((f.position for f in self.followers), default=self.base + len(self.chunks))
+        while self.buffered_bytes > limit and len(self.chunks) > 1 and (force or self.base < floor):
+            self.buffered_bytes -= len(self.chunks.popleft())
+            self.base += 1
+        if force:
+            # Dropped followers get an error on their next read
+            self.followers = {f for f in self.followers if f.position >= self.base}
+
+
+class _StreamFollower:
+    """Iterator replaying a _StreamCall's chunks; closing it detaches from the call"""
+
+    def __init__(self, call: _StreamCall):
+        self.call = call
+        self.position = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        call = self.call
+        with call.cond:
+            while not self.closed and self.position >= call.base + len(call.chunks) and not call.done:
+                call.cond.wait()
+            if self.closed:
+                raise StopIteration
+            if self.position < call.base:
+                self.close()
+                raise RuntimeError('Stream consumer fell too far behind and was dropped')
+            if self.position < call.base + len(call.chunks):
+                chunk = call.chunks[self.position - call.base]
+                self.position += 1
+                # Wake the pump if it is waiting for room in the window
+                call.cond.notify_all()
+                return chunk
+            self.close()
+            if call.error is not None:
+                raise call.error
+            raise StopIteration
+
+    def close(self):
+        with self.call.cond:
+            if not self.closed:
+                self.closed = True
+                self.call.followers.discard(self)
+                self.call.cond.notify_all()
+
+    def __del__(self):
+        self.close()
+
+
+class _AsyncStreamCall(_StreamCall):
+    """_StreamCall whose followers and pump are coroutines on one event loop"""
+
+    def __init__(self):
+        super().__init__()
+        self.cond = asyncio.Condition()
+        self.task = None
+
+    def join(self) -> Optional['_AsyncStreamFollower']:
+        # Everything runs on the event loop, so no lock is needed to add a follower
+        if self.done or self.base > 0:
+            return None
+        follower = _AsyncStreamFollower(self)
+        self.followers.add(follower)
+        return follower
+
+
+class _AsyncStreamFollower:
+    """Async iterator replaying an _AsyncStreamCall's chunks; aclose() detaches from the call"""
+
+    def __init__(self, call: _AsyncStreamCall):
+        self.call = call
+        self.position = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        call = self.call
+        async with call.cond:
+            while not self.closed and self.position >= call.base + len(call.chunks) and not call.done:
+                await call.cond.wait()
+            if self.closed:
+                raise StopAsyncIteration
+            if self.position < call.base:
+                self._detach()
+                raise RuntimeError('Stream consumer fell too far behind and was dropped')
+            if self.position < call.base + len(call.chunks):
+                chunk = call.chunks[self.position - call.base]
+                self.position += 1
+                call.cond.notify_all()
+                return chunk
+            self._detach()
+            if call.error is not None:
+                raise call.error
+            raise StopAsyncIteration
+
+    def _detach(self):
+        self.closed = True
+        self.call.followers.discard(self)
+
+    async def aclose(self):
+        if not self.closed:
+            self._detach()
+            async with self.call.cond:
+                self.call.cond.notify_all()
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution
+
+    Coalesced streams buffer about max_stream_buffer bytes: the upstream is
+    paused while the slowest follower catches up, and a follower stalled for
+    stall_timeout seconds is dropped. Once early chunks are discarded, new
+    callers run their own stream instead of joining
+    """
+
+    def __init__(self, max_stream_buffer: int = 8 * 1024 * 1024, stall_timeout: float = 30.0):
+        """Initialize with no calls in flight"""
+        self.max_stream_buffer = max_stream_buffer
+        self.stall_timeout = stall_timeout
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.streams = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key among concurrent callers
+        Returns: (result, shared) where shared is True if another caller ran fn
+        Exceptions raised by fn propagate to every waiting caller
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self.calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def stream(self, key: Hashable, make_iter: Callable[[], Iterable[bytes]]) -> Tuple[Iterator[bytes], bool]:
+        """
+        Streaming variant of do(): one background thread drains make_iter()
+        and every concurrent caller with the same key replays its chunks as
+        they arrive, so a disconnecting client never stalls the others.
+        The upstream is closed once every follower has left
+        Returns: (chunk iterator, shared); close() the iterator when abandoning it
+        """
+        with self.lock:
+            call = self.streams.get(key)
+            follower = call.join() if call is not None else None
+            if call is None:
+                call = _StreamCall()
+                follower = call.join()
+                self.streams[key] = call
+                self.executed += 1
+                leader = True
+            elif follower is not None:
+                self.shared += 1
+                leader = False
+            else:
+                # Too late to replay from the start; run an uncoalesced stream
+                self.executed += 1
+                return iter(make_iter()), False
+
+        if leader:
+            threading.Thread(
+                target=self._pump, args=(key, call, make_iter),
+                name='single-flight-stream', daemon=True
+            ).start()
+
+        return follower, not leader
+
+    def _pump(self, key: Hashable, call: _StreamCall, make_iter: Callable[[], Iterable[bytes]]):
+        iterator = None
+        try:
+            iterator = iter(make_iter())
+            for chunk in iterator:
+                with call.cond:
+                    call.chunks.append(chunk)
+                    call.buffered_bytes += len(chunk)
+                    call.cond.notify_all()
+
+                    stall_deadline = time.monotonic() + self.stall_timeout
+                    call.trim(self.max_stream_buffer)
+                    while call.followers and call.buffered_bytes > self.max_stream_buffer:
+                        remaining = stall_deadline - time.monotonic()
+                        if remaining <= 0:
+                            call.trim(self.max_stream_buffer, force=True)
+                            call.cond.notify_all()
+                            break
+                        call.cond.wait(remaining)
+                        call.trim(self.max_stream_buffer)
+
+                    if not call.followers:
+                        break
+        except Exception as e:
+            call.error = e
+        finally:
+            # Closing an abandoned upstream generator stops the download (and its cache write)
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            with self.lock:
+                del self.streams[key]
+            with call.cond:
+                call.done = True
+                call.cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            total = self.executed + self.shared
+            return {
+                'executed': self.executed,
+                'shared': self.shared,
+                'in_flight': len(self.calls) + len(self.streams),
+                'dedupe_ratio': self.shared / total if total else 0.0
+            }
+
+
+class AsyncSingleFlight:
+    """Event-loop counterpart of SingleFlight for coroutine functions and async streams"""
+
+    def __init__(self, max_stream_buffer: int = 8 * 1024 * 1024, stall_timeout: float = 30.0):
+        """Initialize with no calls in flight"""
+        self.max_stream_buffer = max_stream_buffer
+        self.stall_timeout = stall_timeout
+        self.calls = {}
+        self.streams = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn() once per key among concurrent callers
+        Returns: (result, shared) where shared is True if another caller ran fn
+        """
+        future = self.calls.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        self.executed += 1
+
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unshared failure doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self.calls[key]
+            if not future.done():
+                future.cancel()
+
+        return result, False
+
+    def stream(self, key: Hashable,
+               make_aiter: Callable[[], AsyncIterable[bytes]]) -> Tuple[AsyncIterator[bytes], bool]:
+        """
+        Async counterpart of SingleFlight.stream(): a pump task drains
+        make_aiter() and concurrent callers with the same key replay its chunks
+        Returns: (async chunk iterator, shared); aclose() the iterator when abandoning it
+        """
+        call = self.streams.get(key)
+        follower = call.join() if call is not None else None
+        if call is None:
+            call = _AsyncStreamCall()
+            follower = call.join()
+            self.streams[key] = call
+            self.executed += 1
+            # A fresh context keeps the shared upstream call out of the first caller's trace
+            call.task = asyncio.get_running_loop().create_task(self._pump(key, call, make_aiter),
+                                                               context=contextvars.Context())
+            return follower, False
+        if follower is None:
+            # Too late to replay from the start; run an uncoalesced stream
+            self.executed += 1
+            return aiter(make_aiter()), False
+        self.shared += 1
+        return follower, True
+
+    async def _pump(self, key: Hashable, call: _AsyncStreamCall, make_aiter: Callable[[], AsyncIterable[bytes]]):
+        iterator = None
+        loop = asyncio.get_running_loop()
+        try:
+            iterator = aiter(make_aiter())
+            async for chunk in iterator:
+                async with call.cond:
+                    call.chunks.append(chunk)
+                    call.buffered_bytes += len(chunk)
+                    call.cond.notify_all()
+
+                    stall_deadline = loop.time() + self.stall_timeout
+                    call.trim(self.max_stream_buffer)
+                    while call.followers and call.buffered_bytes > self.max_stream_buffer:
+                        remaining = stall_deadline - loop.time()
+                        if remaining <= 0:
+                            call.trim(self.max_stream_buffer, force=True)
+                            call.cond.notify_all()
+                            break
+                        try:
+                            await asyncio.wait_for(call.cond.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        call.trim(self.max_stream_buffer)
+
+                    if not call.followers:
+                        break
+        except Exception as e:
+            call.error = e
+        finally:
+            # Closing an abandoned upstream generator stops the download (and its cache write)
+            aclose = getattr(iterator, 'aclose', None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+            del self.streams[key]
+            async with call.cond:
+                call.done = True
+                call.cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        total = self.executed + self.shared
+        return {
+            'executed': self.executed,
+            'shared': self.shared,
+            'in_flight': len(self.calls) + len(self.streams),
+            'dedupe_ratio': self.shared / total if total else 0.0
+        }
@@ -1,17 +1,25 @@
 import os
 import tempfile
-from google import genai
-from elevenlabs import ElevenLabs
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Callable
+from upstream_limiter import UpstreamBusy
+from tts_cache import TTSCache, shared_tts_cache
+from generation_cache import GenerationCache, shared_generation_cache
+from tracing import traced
+from client_registry import shared_clients
 
 
 class StoryGenerator:
     """Handles story generation from words and emotional text-to-speech"""
     
-    def __init__(self, gemini_api_key: str, elevenlabs_api_key: str):
+    def __init__(self, gemini_api_key: str, elevenlabs_api_key: str, tts_cache: Optional[TTSCache] = None,
+                 generation_cache: Optional[GenerationCache] = None):
         """Initialize story generator with Gemini and ElevenLabs APIs"""
-        self.gemini_client = genai.Client(api_key=gemini_api_key)
-        self.elevenlabs_client = ElevenLabs(api_key=elevenlabs_api_key)
+        self.gemini_client = shared_clients.gemini(gemini_api_key)
+        self.elevenlabs_client = shared_clients.elevenlabs(elevenlabs_api_key)
+        self.gemini_api_key = gemini_api_key
+        self.elevenlabs_api_key = elevenlabs_api_key
+        self.tts_cache = tts_cache or shared_tts_cache
+        self.generation_cache = generation_cache or shared_generation_cache
         
         self.voice_mapping = {
             'english': {
@@ -24,9 +32,12 @@ class StoryGenerator:
             }
         }
     
-    def generate_story(self, words: List[str], theme: str, word_count: int, language: str) -> Optional[str]:
+    @traced()
+    def generate_story(self, words: List[str], theme: str, word_count: int, language: str,
+                       fresh: bool = False) -> Optional[str]:
         """
         Generate a story from input words with specified theme, word count, and language
+        fresh=True bypasses the generation cache for a new take on the same prompt
         """
         try:
             words_str = ', '.join(words)
@@ -57,20 +68,20 @@ class StoryGenerator:
             Write the complete story below:
             """
             
-            response = self.gemini_client.models.generate_content(
+            return self.generation_cache.generate(
+                self.gemini_client, self.gemini_api_key,
                 model="gemini-2.0-flash-exp",
-                contents=prompt
+                prompt=prompt,
+                fresh=fresh
             )
-            
-            if response and response.text:
-                return response.text.strip()
-            else:
-                return None
                 
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Story generation error: {e}")
             return None
     
+    @traced(result_bytes=True)
     def generate_emotional_audio(self, story_text: str, language: str) -> Optional[str]:
         """
         Convert story text to emotional speech using ElevenLabs
@@ -82,7 +93,10 @@ class StoryGenerator:
             
             from elevenlabs import VoiceSettings
             
-            audio_generator = self.elevenlabs_client.text_to_speech.convert(
+            audio_path = tempfile.mktemp(suffix='.mp3')
+            
+            self.tts_cache.synthesize_to_file(
+                self.elevenlabs_client, self.elevenlabs_api_key,
                 text=story_text,
                 voice_id=voice_id,
                 model_id="eleven_multilingual_v2",
@@ -92,31 +106,37 @@ class StoryGenerator:
                     similarity_boost=0.75,
                     style=0.6,
                     use_speaker_boost=True
-                )
+                ),
+                output_path=audio_path
             )
             
-            audio_bytes = b''.join(audio_generator)
-            
-            audio_path = tempfile.mktemp(suffix='.mp3')
-            with open(audio_path, 'wb') as f:
-                f.write(audio_bytes)
-            
             return audio_path
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Audio generation error: {e}")
             return None
     
-    def create_story_with_audio(self, words: List[str], theme: str, word_count: int, language: str) -> Optional[Dict]:
+    @traced()
+    def create_story_with_audio(self, words: List[str], theme: str, word_count: int, language: str,
+                                progress_callback: Optional[Callable] = None,
+                                fresh: bool = False) -> Optional[Dict]:
         """
         Complete pipeline: generate story and create emotional audio
         Returns: {'story': text, 'audio_path': path, 'audio_bytes': bytes}
         """
         try:
-            story = self.generate_story(words, theme, word_count, language)
+            if progress_callback:
+                progress_callback("Writing story...", 20)
+            
+            story = self.generate_story(words, theme, word_count, language, fresh=fresh)
             if not story:
                 return None
             
+            if progress_callback:
+                progress_callback("Generating narration...", 60)
+            
             audio_path = self.generate_emotional_audio(story, language)
             if not audio_path:
                 return {'story': story, 'audio_path': None, 'audio_bytes': None}
@@ -124,12 +144,17 @@ class StoryGenerator:
             with open(audio_path, 'rb') as f:
                 audio_bytes = f.read()
             
+            if progress_callback:
+                progress_callback("Complete!", 100)
+            
             return {
                 'story': story,
                 'audio_path': audio_path,
                 'audio_bytes': audio_bytes
             }
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error creating story with audio: {e}")
             return None
@@ -10,6 +10,7 @@ except ImportError:
     import numpy as np
     LIBROSA_AVAILABLE = False
 from typing import List, Dict, Optional
+from tracing import traced
 
 class SyncEngine:
     """Handles audio-video synchronization and timing alignment"""
@@ -18,6 +19,7 @@ class SyncEngine:
         """Initialize synchronization engine"""
         pass
     
+    @traced(result_bytes=True)
     def synchronize_audio(self, dubbed_audio_path: str, original_segments: List[Dict], 
                          original_audio_path: str) -> Optional[str]:
         """
@@ -121,6 +123,7 @@ class SyncEngine:
             print(f"Error adjusting segment timing: {e}")
             return audio_segment
     
+    @traced(result_bytes=True)
     def align_with_video_frames(self, audio_path: str, video_fps: float, 
                                video_duration: float) -> Optional[str]:
         """
@@ -159,6 +162,7 @@ class SyncEngine:
             print(f"Error aligning with video frames: {e}")
             return audio_path
     
+    @traced()
     def detect_speech_timing(self, audio_path: str) -> List[Dict]:
         """
         Detect precise speech timing in audio
@@ -239,6 +243,7 @@ class SyncEngine:
             print(f"Error detecting speech timing: {e}")
             return []
     
+    @traced()
     def create_timing_map(self, original_segments: List[Dict], 
                          dubbed_segments: List[Dict]) -> List[Dict]:
         """
@@ -266,6 +271,7 @@ class SyncEngine:
             print(f"Error creating timing map: {e}")
             return []
     
+    @traced(result_bytes=True)
     def apply_dynamic_time_warping(self, original_audio_path: str, 
                                   dubbed_audio_path: str) -> Optional[str]:
         """
@@ -329,6 +335,7 @@ class SyncEngine:
             print(f"Error in dynamic time warping: {e}")
             return dubbed_audio_path
     
+    @traced()
     def validate_synchronization(self, original_audio_path: str, 
                                 dubbed_audio_path: str) -> Dict:
         """
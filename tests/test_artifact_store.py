@@ -0,0 +1,95 @@
+import os
+import time
+
+from artifact_store import ArtifactStore
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+
+    first = store.put_bytes(b'audio', suffix='.mp3')
+    second = store.put_bytes(b'audio', suffix='.mp3')
+
+    assert first == second
+    assert first.endswith('.mp3')
+    assert store.get_stats()['artifacts'] == 1
+    with open(store.get_path(first), 'rb') as f:
+        assert f.read() == b'audio'
+
+
+def test_storing_again_restarts_the_ttl(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl_seconds=10)
+    artifact_id = store.put_bytes(b'audio')
+    entry = store.index[artifact_id]
+    entry['created_at'] = time.time() - 9
+    os.utime(entry['path'], (entry['created_at'], entry['created_at']))
+
+    store.put_bytes(b'audio')
+
+    assert time.time() - entry['created_at'] < 1
+    # The mtime is the TTL for other workers, so it moves too
+    assert time.time() - os.path.getmtime(entry['path']) < 1
+
+
+def test_expired_entry_is_replaced_on_commit(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl_seconds=10)
+    writer = store.open_writer('key.mp3')
+    writer.write(b'old')
+    writer.commit()
+    store.index['key.mp3']['created_at'] = time.time() - 60
+
+    writer = store.open_writer('key.mp3')
+    writer.write(b'new')
+    assert writer.commit() == 'key.mp3'
+
+    path = store.get_path('key.mp3')
+    assert path is not None
+    with open(path, 'rb') as f:
+        assert f.read() == b'new'
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.staging_')]
+
+
+def test_aborted_writer_leaves_nothing_behind(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    writer = store.open_writer('key.mp3')
+    writer.write(b'partial')
+    writer.abort()
+
+    assert store.get_path('key.mp3') is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_artifacts_are_evicted(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=10)
+    first = store.put_bytes(b'a' * 4)
+    second = store.put_bytes(b'b' * 4)
+    store.index[first]['last_access'] -= 10
+    store.index[second]['last_access'] -= 5
+    assert store.get_path(first)
+
+    third = store.put_bytes(b'c' * 4)
+
+    assert store.get_path(second) is None
+    assert store.get_path(first) and store.get_path(third)
+    assert store.get_stats()['total_bytes'] == 8
+
+
+def test_workers_sharing_a_directory_see_each_others_artifacts(tmp_path):
+    writer_store = ArtifactStore(str(tmp_path))
+    reader_store = ArtifactStore(str(tmp_path))
+
+    artifact_id = writer_store.put_bytes(b'audio')
+    assert reader_store.get_path(artifact_id) == os.path.join(str(tmp_path), artifact_id)
+
+    writer_store._remove(artifact_id)
+    assert reader_store.get_path(artifact_id) is None
+    assert reader_store.get_stats()['total_bytes'] == 0
+
+
+def test_lookups_outside_the_store_are_rejected(tmp_path):
+    root = tmp_path / 'store'
+    (tmp_path / 'secret').write_bytes(b'x')
+    store = ArtifactStore(str(root))
+
+    assert store.get_path('../secret') is None
+    assert store.get_path('') is None
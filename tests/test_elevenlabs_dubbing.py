@@ -0,0 +1,63 @@
+import time
+import types
+import uuid
+import threading
+
+from client_registry import shared_clients
+from elevenlabs_dubbing import ElevenLabsDubbing
+from upstream_limiter import upstream_limiters
+
+
+class FakeDubbingClient:
+    """Stands in for the ElevenLabs client: downloads stream until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.dubbing = types.SimpleNamespace(
+            get=lambda dubbing_id: types.SimpleNamespace(status='dubbed', name='project'),
+            audio=types.SimpleNamespace(get=self.download)
+        )
+
+    def download(self, dubbing_id, language_code):
+        yield b'first'
+        self.release.wait(10)
+        yield b'rest'
+
+
+def make_service(monkeypatch):
+    client = FakeDubbingClient()
+    monkeypatch.setattr(shared_clients, 'elevenlabs', lambda api_key: client)
+    # A fresh API key gets fresh limiters; keep the status queue short so starvation fails fast
+    monkeypatch.setitem(upstream_limiters.limits, 'elevenlabs',
+                        {'max_concurrent': 2, 'rate': 0, 'burst': 0, 'max_queue': 8, 'queue_timeout': 1.0})
+    return ElevenLabsDubbing(api_key=uuid.uuid4().hex), client
+
+
+def test_slow_downloads_do_not_block_status_polls(monkeypatch):
+    service, client = make_service(monkeypatch)
+
+    # More stalled downloads than the status pool has slots
+    downloads = [service.stream_dubbed_video(f'dub{i}', 'hi') for i in range(4)]
+    try:
+        assert [next(download) for download in downloads] == [b'first'] * 4
+
+        started = time.monotonic()
+        status = service.get_dubbing_status('dub0')
+        assert status['status'] == 'dubbed'
+        assert time.monotonic() - started < 0.5
+    finally:
+        client.release.set()
+        for download in downloads:
+            download.close()
+
+
+def test_closing_a_download_frees_its_slot(monkeypatch):
+    service, client = make_service(monkeypatch)
+    limiter = upstream_limiters.get('elevenlabs', 'dubbing-download', service.api_key)
+
+    download = service.stream_dubbed_video('dub', 'hi')
+    next(download)
+    assert limiter.get_stats()['in_flight'] == 1
+
+    download.close()
+    assert limiter.get_stats()['in_flight'] == 0
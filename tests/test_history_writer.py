@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from models import db, User, UserHistory
+from history_writer import HistoryWriter, HistoryWriterFull
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'history.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, name='Test', email='test@example.com', password_hash='x'))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def writer(app):
+    writer = HistoryWriter(app, flush_interval_ms=1000, enqueue_timeout=0.1)
+    yield writer
+    writer.close()
+
+
+def test_a_lone_row_commits_without_waiting_for_the_flush_interval(writer):
+    saved = writer.submit(1, 'text_to_speech', {'text': 'hi'}).result(timeout=0.5)
+
+    assert saved['feature_type'] == 'text_to_speech'
+    assert saved['feature_data'] == {'text': 'hi'}
+    assert saved['id']
+
+
+def test_rows_arriving_during_a_commit_share_the_next_one(writer):
+    gate = threading.Event()
+    flush = writer._flush
+    blocked = threading.Event()
+
+    def gated_flush(batch):
+        if not blocked.is_set():
+            blocked.set()
+            gate.wait(2)
+        flush(batch)
+
+    writer._flush = gated_flush
+    futures = [writer.submit(1, 'first')]
+    assert blocked.wait(2)
+    futures += [writer.submit(1, f'row{i}') for i in range(10)]
+    gate.set()
+
+    for future in futures:
+        future.result(timeout=2)
+    stats = writer.get_stats()
+    assert stats['rows_written'] == 11
+    assert stats['batches'] == 2
+
+
+def test_a_bad_row_fails_alone(app, writer):
+    good = writer.submit(1, 'good')
+    bad = writer.submit(None, 'bad')
+    other = writer.submit(1, 'other')
+
+    assert good.result(timeout=2)['feature_type'] == 'good'
+    assert other.result(timeout=2)['feature_type'] == 'other'
+    with pytest.raises(Exception):
+        bad.result(timeout=2)
+    assert writer.get_stats()['rows_failed'] == 1
+
+
+def test_close_drains_the_buffer_and_refuses_new_rows(app, writer):
+    futures = [writer.submit(1, f'row{i}') for i in range(20)]
+    writer.close()
+
+    assert all(future.done() for future in futures)
+    with app.app_context():
+        assert UserHistory.query.count() == 20
+    with pytest.raises(RuntimeError):
+        writer.submit(1, 'late')
+
+
+def test_full_buffer_rejects_with_a_retry_hint(app):
+    writer = HistoryWriter(app, max_queue=1, enqueue_timeout=0.01)
+    writer._ensure_started = lambda: None
+    writer.submit(1, 'queued')
+
+    with pytest.raises(HistoryWriterFull) as excinfo:
+        writer.submit(1, 'rejected')
+    assert excinfo.value.retry_after >= 1
+    assert writer.get_stats()['rejected'] == 1
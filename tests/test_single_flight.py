@@ -0,0 +1,200 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from single_flight import SingleFlight, AsyncSingleFlight
+
+
+def test_do_runs_once_for_concurrent_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fetch))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flight.get_stats()['shared'] < 3:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [('result', False)] + [('result', True)] * 3
+
+
+def test_do_raises_the_error_for_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        release.wait(2)
+        raise ValueError('upstream failed')
+
+    def call():
+        try:
+            flight.do('key', fetch)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flight.get_stats()['shared'] < 2:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(errors) == 3
+    assert flight.get_stats()['in_flight'] == 0
+
+
+class GatedStream:
+    """Upstream stand-in that yields nothing until started, and records when it is closed"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.started = threading.Event()
+        self.closed = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.generate()
+
+    def generate(self):
+        try:
+            self.started.wait(2)
+            for chunk in self.chunks:
+                yield chunk
+        finally:
+            self.closed.set()
+
+
+def test_stream_followers_share_one_upstream():
+    flight = SingleFlight()
+    upstream = GatedStream([b'a', b'b', b'c'])
+
+    first, first_shared = flight.stream('key', upstream)
+    second, second_shared = flight.stream('key', upstream)
+    upstream.started.set()
+
+    assert (first_shared, second_shared) == (False, True)
+    assert b''.join(first) == b'abc'
+    assert b''.join(second) == b'abc'
+    assert upstream.calls == 1
+
+
+def test_stream_closes_upstream_once_every_follower_leaves():
+    # A small window keeps the pump waiting on the followers instead of draining the upstream
+    flight = SingleFlight(max_stream_buffer=4)
+    upstream = GatedStream([b'x'] * 1000)
+
+    first, _ = flight.stream('key', upstream)
+    second, _ = flight.stream('key', upstream)
+    upstream.started.set()
+    next(first)
+    next(second)
+
+    first.close()
+    assert not upstream.closed.wait(0.1)
+    second.close()
+    assert upstream.closed.wait(2)
+
+
+def test_stalled_follower_is_dropped_without_stalling_the_others():
+    flight = SingleFlight(max_stream_buffer=4, stall_timeout=0.1)
+    upstream = GatedStream([b'xx'] * 10)
+
+    reader, _ = flight.stream('key', upstream)
+    stalled, _ = flight.stream('key', upstream)
+    upstream.started.set()
+
+    assert b''.join(reader) == b'xx' * 10
+    with pytest.raises(RuntimeError):
+        list(stalled)
+
+
+def test_late_caller_runs_its_own_stream_once_the_window_moved_on():
+    flight = SingleFlight(max_stream_buffer=2)
+    upstream = GatedStream([b'xx'] * 5)
+
+    first, _ = flight.stream('key', upstream)
+    upstream.started.set()
+    assert next(first) == b'xx'
+    assert next(first) == b'xx'
+    # Wait until the window no longer holds the first chunk
+    while flight.streams.get('key') is not None and flight.streams['key'].base == 0:
+        time.sleep(0.005)
+
+    late, shared = flight.stream('key', upstream)
+    assert not shared
+    assert b''.join(late) == b'xx' * 5
+    assert b''.join(first) == b'xx' * 3
+    assert upstream.calls == 2
+
+
+def test_async_do_and_stream_coalesce():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append('do')
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def generate():
+        calls.append('stream')
+        for chunk in (b'a', b'b'):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def read(chunks):
+        return b''.join([chunk async for chunk in chunks])
+
+    async def main():
+        results = await asyncio.gather(*[flight.do('key', fetch) for _ in range(3)])
+        assert [shared for _, shared in results] == [False, True, True]
+
+        streams = [flight.stream('key', generate) for _ in range(3)]
+        assert [shared for _, shared in streams] == [False, True, True]
+        return await asyncio.gather(*[read(chunks) for chunks, _ in streams])
+
+    assert asyncio.run(main()) == [b'ab'] * 3
+    assert calls == ['do', 'stream']
+
+
+def test_async_stream_closes_upstream_when_abandoned():
+    flight = AsyncSingleFlight()
+    closed = []
+
+    async def generate():
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield b'x'
+        finally:
+            closed.append(True)
+
+    async def main():
+        chunks, _ = flight.stream('key', generate)
+        assert await anext(chunks) == b'x'
+        await chunks.aclose()
+        for _ in range(100):
+            if closed:
+                break
+            await asyncio.sleep(0.01)
+        assert flight.get_stats()['in_flight'] == 0
+
+    asyncio.run(main())
+    assert closed == [True]
@@ -0,0 +1,122 @@
+import io
+import os
+import time
+import hashlib
+
+import pytest
+
+from upload_sessions import UploadSessionManager, UploadError
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return UploadSessionManager(str(tmp_path), max_size=1024, session_ttl=60)
+
+
+def upload(uploads, data, **kwargs):
+    upload_id = uploads.create(len(data), **kwargs)['upload_id']
+    uploads.append(upload_id, 0, io.BytesIO(data), len(data))
+    return upload_id
+
+
+def test_chunks_append_in_order(uploads):
+    upload_id = uploads.create(6, metadata={'target_lang': 'hi'})['upload_id']
+
+    assert uploads.append(upload_id, 0, io.BytesIO(b'abc'), 3, sha256=sha256(b'abc'))['offset'] == 3
+    assert uploads.append(upload_id, 3, io.BytesIO(b'def'), 3)['offset'] == 6
+    assert uploads.get_status(upload_id) == {'upload_id': upload_id, 'offset': 6, 'total_size': 6}
+
+
+def test_out_of_order_chunk_reports_the_current_offset(uploads):
+    upload_id = uploads.create(6)['upload_id']
+    uploads.append(upload_id, 0, io.BytesIO(b'abc'), 3)
+
+    with pytest.raises(UploadError) as excinfo:
+        uploads.append(upload_id, 0, io.BytesIO(b'abc'), 3)
+    assert (excinfo.value.status_code, excinfo.value.offset) == (409, 3)
+
+
+def test_corrupt_chunk_is_dropped(uploads):
+    upload_id = uploads.create(6)['upload_id']
+    uploads.append(upload_id, 0, io.BytesIO(b'abc'), 3)
+
+    with pytest.raises(UploadError) as excinfo:
+        uploads.append(upload_id, 3, io.BytesIO(b'dXf'), 3, sha256=sha256(b'def'))
+    assert (excinfo.value.status_code, excinfo.value.offset) == (422, 3)
+    assert uploads.get_status(upload_id)['offset'] == 3
+
+
+def test_concurrent_chunk_for_the_same_upload_is_refused(uploads):
+    upload_id = uploads.create(6)['upload_id']
+    lock = uploads._upload_lock(upload_id)
+    lock.acquire()
+    try:
+        with pytest.raises(UploadError) as excinfo:
+            uploads.append(upload_id, 0, io.BytesIO(b'abc'), 3)
+        assert excinfo.value.status_code == 409
+    finally:
+        lock.release()
+
+
+def test_unknown_or_malformed_ids_are_not_found(uploads):
+    for upload_id in ('0' * 32, '../etc/passwd'):
+        with pytest.raises(UploadError) as excinfo:
+            uploads.get_status(upload_id)
+        assert excinfo.value.status_code == 404
+
+
+def test_failed_finalize_keeps_the_upload_for_a_retry(uploads):
+    upload_id = upload(uploads, b'video', sha256=sha256(b'video'), metadata={'target_lang': 'hi'})
+
+    with pytest.raises(RuntimeError):
+        with uploads.finalizing(upload_id) as assembled:
+            raise RuntimeError('upstream busy')
+    assert not os.path.exists(assembled['path'])
+    assert uploads.get_status(upload_id)['offset'] == 5
+
+    with uploads.finalizing(upload_id) as assembled:
+        assert assembled['path'].endswith('.mp4')
+        assert assembled['metadata'] == {'target_lang': 'hi'}
+        with open(assembled['path'], 'rb') as f:
+            assert f.read() == b'video'
+
+    with pytest.raises(UploadError) as excinfo:
+        uploads.get_status(upload_id)
+    assert excinfo.value.status_code == 404
+    assert os.listdir(uploads.upload_dir) == []
+
+
+def test_finalize_rejects_incomplete_and_corrupt_uploads(uploads):
+    upload_id = uploads.create(6)['upload_id']
+    uploads.append(upload_id, 0, io.BytesIO(b'abc'), 3)
+    with pytest.raises(UploadError) as excinfo:
+        with uploads.finalizing(upload_id):
+            pass
+    assert (excinfo.value.status_code, excinfo.value.offset) == (409, 3)
+
+    upload_id = upload(uploads, b'video', sha256=sha256(b'other'))
+    with pytest.raises(UploadError) as excinfo:
+        with uploads.finalizing(upload_id):
+            pass
+    assert excinfo.value.status_code == 422
+    with pytest.raises(UploadError):
+        uploads.get_status(upload_id)
+
+
+def test_sessions_expire_by_inactivity(uploads):
+    active = uploads.create(6)['upload_id']
+    idle = uploads.create(6)['upload_id']
+    stale = time.time() - 120
+    for upload_id in (active, idle):
+        os.utime(uploads._meta_path(upload_id), (stale, stale))
+
+    uploads.append(active, 0, io.BytesIO(b'abc'), 3)
+    uploads.cleanup_expired()
+
+    assert uploads.get_status(active)['offset'] == 3
+    with pytest.raises(UploadError):
+        uploads.get_status(idle)
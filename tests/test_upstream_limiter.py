@@ -0,0 +1,148 @@
+import time
+import types
+import asyncio
+import threading
+
+import pytest
+
+from upstream_limiter import UpstreamLimiter, UpstreamBusy, LimiterRegistry
+
+
+def make_limiter(**overrides):
+    config = {'max_concurrent': 1, 'rate': 0, 'burst': 0, 'max_queue': 8, 'queue_timeout': 2.0}
+    config.update(overrides)
+    return UpstreamLimiter('test', **config)
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def test_freed_slots_go_to_waiters_in_arrival_order():
+    limiter = make_limiter()
+    held = limiter.acquire()
+    order = []
+
+    def worker(n):
+        started_at = limiter.acquire()
+        order.append(n)
+        limiter.release(started_at)
+
+    threads = []
+    for n in range(5):
+        thread = threading.Thread(target=worker, args=(n,))
+        thread.start()
+        threads.append(thread)
+        # Queue them one at a time so arrival order is known
+        wait_for(lambda: len(limiter.waiters) == n + 1)
+
+    limiter.release(held)
+    for thread in threads:
+        thread.join(2)
+
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.get_stats() == {'in_flight': 0, 'waiting': 0, 'rejected': 0, 'max_concurrent': 1}
+
+
+def test_full_queue_is_rejected_immediately():
+    limiter = make_limiter(max_queue=0)
+    held = limiter.acquire()
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamBusy) as excinfo:
+        limiter.acquire()
+    assert time.monotonic() - started < 0.5
+    assert excinfo.value.retry_after >= 1
+    assert limiter.get_stats()['rejected'] == 1
+
+    limiter.release(held)
+
+
+def test_queue_timeout_withdraws_the_waiter():
+    limiter = make_limiter(queue_timeout=0.05)
+    held = limiter.acquire()
+
+    with pytest.raises(UpstreamBusy):
+        limiter.acquire()
+    assert not limiter.waiters
+
+    # The timed-out waiter must not swallow the slot when it is released
+    limiter.release(held)
+    limiter.release(limiter.acquire())
+    assert limiter.available == 1
+
+
+def test_cancelled_async_waiter_does_not_leak_a_slot():
+    limiter = make_limiter()
+
+    async def main():
+        held = await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        assert len(limiter.waiters) == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release(held)
+
+    asyncio.run(main())
+    assert limiter.available == 1
+    assert not limiter.waiters
+
+
+def test_sync_and_async_callers_share_one_queue():
+    limiter = make_limiter()
+    held = limiter.acquire()
+    order = []
+
+    async def main():
+        async def async_worker():
+            started_at = await limiter.acquire_async()
+            order.append('async')
+            limiter.release(started_at)
+
+        task = asyncio.create_task(async_worker())
+        await asyncio.sleep(0.01)
+
+        def sync_worker():
+            started_at = limiter.acquire()
+            order.append('sync')
+            limiter.release(started_at)
+
+        thread = threading.Thread(target=sync_worker)
+        thread.start()
+        await asyncio.to_thread(wait_for, lambda: len(limiter.waiters) == 2)
+
+        limiter.release(held)
+        await task
+        await asyncio.to_thread(thread.join, 2)
+
+    asyncio.run(main())
+    assert order == ['async', 'sync']
+
+
+def test_provider_429_becomes_upstream_busy():
+    limiter = make_limiter()
+    error = Exception('rate limited')
+    error.status_code = 429
+    error.response = types.SimpleNamespace(headers={'retry-after': '7'})
+
+    with pytest.raises(UpstreamBusy) as excinfo:
+        with limiter.slot():
+            raise error
+    assert excinfo.value.retry_after == 7
+    assert limiter.available == 1
+
+
+def test_registry_merges_model_overrides_per_key():
+    registry = LimiterRegistry({'gemini:slow-model': {'max_concurrent': 1}})
+
+    slow = registry.get('gemini', 'slow-model', 'key-a')
+    assert slow.max_concurrent == 1
+    assert registry.get('gemini', 'other-model', 'key-a').max_concurrent == registry.limits['gemini']['max_concurrent']
+    assert registry.get('gemini', 'slow-model', 'key-a') is slow
+    assert registry.get('gemini', 'slow-model', 'key-b') is not slow
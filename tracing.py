@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Callable, Iterator
+
+
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'slow_traces.jsonl')
+
+
+class Span:
+    """One timed stage of a trace, with optional byte count and child spans"""
+
+    def __init__(self, name: str, attrs: Optional[Dict] = None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.children: List['Span'] = []
+        self.bytes = 0
+        self.error = None
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def add_bytes(self, count: Optional[int]):
+        if count:
+            self.bytes += count
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict:
+        data = {'name': self.name, 'duration_ms': round((self.duration or 0) * 1000, 1)}
+        if self.bytes:
+            data['bytes'] = self.bytes
+        if self.error:
+            data['error'] = self.error
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.children:
+            data['children'] = [child.to_dict() for child in self.children]
+        return data
+
+
+class _NoopSpan:
+    """Stand-in returned when no trace is active, so call sites needn't check"""
+
+    def add_bytes(self, count: Optional[int]):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+class Trace:
+    """Root span plus identity for one request or background job"""
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.root = Span(name)
+
+    @property
+    def duration(self) -> float:
+        return self.root.duration if self.root.duration is not None else time.perf_counter() - self.root.started
+
+    def header_value(self, max_length: int = 4000) -> str:
+        """Flat "stage=ms" breakdown for the X-Trace response header, one '>' per nesting level"""
+        parts = []
+
+        def walk(span: Span, depth: int):
+            for child in span.children:
+                part = f'{">" * depth}{child.name}={(child.duration or 0) * 1000:.1f}ms'
+                if child.bytes:
+                    part += f';bytes={child.bytes}'
+                parts.append(part)
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        value = f'total={self.duration * 1000:.1f}ms'
+        for part in parts:
+            if len(value) + len(part) + 2 > max_length:
+                return value + ', ...'
+            value += ', ' + part
+        return value
+
+    def to_dict(self) -> Dict:
+        return {
+            'trace_id': self.trace_id,
+            'started_at': self.started_at,
+            **self.root.to_dict()
+        }
+
+
+class SlowTraceLog:
+    """Appends traces slower than a threshold to a JSON-lines file"""
+
+    def __init__(self, path: str = DEFAULT_LOG_PATH, slow_ms: float = 5000):
+        self.path = path
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, trace: Trace) -> bool:
+        if trace.duration * 1000 < self.slow_ms:
+            return False
+        line = json.dumps(trace.to_dict())
+        try:
+            with self.lock, open(self.path, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"Error writing slow trace: {e}")
+            return False
+        return True
+
+
+slow_trace_log = SlowTraceLog(
+    path=os.environ.get('TRACE_LOG', DEFAULT_LOG_PATH),
+    slow_ms=float(os.environ.get('TRACE_SLOW_MS', 5000))
+)
+
+
+def current_span():
+    """The innermost active span, or a no-op span outside any trace"""
+    return _current_span.get() or _NOOP_SPAN
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """Run the block as the root of a new trace; slow traces are logged on exit"""
+    trace = Trace(name)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.root.finish()
+        slow_trace_log.record(trace)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the block as a child of the current span; does nothing outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def _result_size(result) -> int:
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    if isinstance(result, str) and os.path.isfile(result):
+        return os.path.getsize(result)
+    return 0
+
+
+def traced(name: Optional[str] = None, result_bytes: bool = False) -> Callable:
+    """
+    Decorator wrapping a pipeline stage in a span named after the method
+    result_bytes=True records the size of a bytes result or of the file at a returned path
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name) as s:
+                result = func(*args, **kwargs)
+                if result_bytes:
+                    s.add_bytes(_result_size(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_flask(app):
+    """
+    Trace every request; clients sending "X-Trace: 1" get the stage breakdown
+    back in an X-Trace response header
+    """
+    from flask import request, g
+
+    @app.before_request
+    def _trace_start():
+        name = f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+        g.trace_context = start_trace(name)
+        g.trace = g.trace_context.__enter__()
+
+    @app.after_request
+    def _trace_header(response):
+        trace = g.get('trace')
+        if trace is not None and request.headers.get('X-Trace'):
+            response.headers['X-Trace'] = trace.header_value()
+            response.headers['X-Trace-Id'] = trace.trace_id
+        if response.is_streamed:
+            # Close the trace when the view returns; SSE and large downloads
+            # would otherwise count the client's read time and always look slow
+            context = g.pop('trace_context', None)
+            g.pop('trace', None)
+            if context is not None:
+                trace.root.set(streamed=True)
+                context.__exit__(None, None, None)
+        return response
+
+    @app.teardown_request
+    def _trace_finish(error=None):
+        context = g.pop('trace_context', None)
+        g.pop('trace', None)
+        if context is not None:
+            if error is not None:
+                context.__exit__(type(error), error, error.__traceback__)
+            else:
+                context.__exit__(None, None, None)
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'translation_cache.db')
+
+
+class TranslationCache:
+    """Two-tier translation cache: in-memory LRU in front of a SQLite table
+
+    Entries are keyed on a hash of (prompt kind, prompt version, model,
+    languages, normalized text, context). Bumping a prompt's version makes
+    its old entries unreachable; purge_stale() deletes them
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, memory_size: int = 2048):
+        """Initialize cache and create the SQLite table if needed"""
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                cache_key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                prompt_version INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS ix_translation_cache_kind_version '
+            'ON translation_cache (kind, prompt_version)'
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(kind: str, prompt_version: int, model: str, source_lang: str,
+                 target_lang: str, text: str, context: str = '') -> str:
+        normalized = ' '.join(text.split())
+        payload = json.dumps([kind, prompt_version, model, source_lang.lower(), target_lang.lower(),
+                              normalized, ' '.join(context.split())])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, cache_key: str, translation: str):
+        """Put an entry in the memory tier (caller holds the lock)"""
+        self.memory[cache_key] = translation
+        self.memory.move_to_end(cache_key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, cache_key: str) -> Optional[str]:
+        with self.lock:
+            translation = self.memory.get(cache_key)
+            if translation is not None:
+                self.memory.move_to_end(cache_key)
+                self.memory_hits += 1
+                return translation
+
+            row = self.conn.execute(
+                'SELECT translation FROM translation_cache WHERE cache_key = ?', (cache_key,)
+            ).fetchone()
+            if row:
+                self.disk_hits += 1
+                self._remember(cache_key, row[0])
+                return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, cache_key: str, translation: str, kind: str, prompt_version: int, model: str):
+        with self.lock:
+            self._remember(cache_key, translation)
+            self.conn.execute(
+                'INSERT OR REPLACE INTO translation_cache '
+                '(cache_key, translation, kind, prompt_version, model, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (cache_key, translation, kind, prompt_version, model, time.time())
+            )
+            self.conn.commit()
+
+    def purge_stale(self, kind: str, current_version: int) -> int:
+        """Delete entries written by older versions of a prompt"""
+        with self.lock:
+            cursor = self.conn.execute(
+                'DELETE FROM translation_cache WHERE kind = ? AND prompt_version != ?',
+                (kind, current_version)
+            )
+            self.conn.commit()
+            if cursor.rowcount:
+                self.memory.clear()
+            return cursor.rowcount
+
+    def invalidate(self, kind: Optional[str] = None) -> int:
+        """Delete all entries, or all entries for one prompt kind"""
+        with self.lock:
+            if kind:
+                cursor = self.conn.execute('DELETE FROM translation_cache WHERE kind = ?', (kind,))
+            else:
+                cursor = self.conn.execute('DELETE FROM translation_cache')
+            self.conn.commit()
+            self.memory.clear()
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            entries = self.conn.execute('SELECT COUNT(*) FROM translation_cache').fetchone()[0]
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'entries': entries
+            }
@@ -1,14 +1,43 @@
 import os
-from google import genai
+import json
+from concurrent.futures import ThreadPoolExecutor
 from google.genai import types
-from typing import Optional
+from typing import Optional, Dict, List
+from upstream_limiter import UpstreamBusy
+from upstream_retry import call_upstream
+from translation_cache import TranslationCache
+from client_registry import shared_clients
 
 class TranslationService:
     """Handles text translation using Gemini AI"""
     
-    def __init__(self, api_key: str):
-        """Initialize translation service with Gemini API"""
-        self.client = genai.Client(api_key=api_key)
+    # Bump a version whenever its prompt changes so cached translations are not reused
+    PROMPT_VERSIONS = {
+        'translate_text': 1,
+        'translate_with_context': 1,
+        'translate_batch': 1
+    }
+    
+    def __init__(self, api_key: str, cache: Optional[TranslationCache] = None,
+                 batch_token_budget: int = 4000, batch_max_segments: int = 100,
+                 batch_max_rounds: int = 3, batch_concurrency: int = 4):
+        """
+        Initialize translation service with Gemini API and an optional translation cache
+        Batches are packed up to batch_token_budget estimated input tokens; ids
+        missing from a batch's response are re-requested for up to batch_max_rounds
+        """
+        self.client = shared_clients.gemini(api_key)
+        self.api_key = api_key
+        self.model = "gemini-2.5-flash"
+        self.cache = cache
+        self.batch_token_budget = batch_token_budget
+        self.batch_max_segments = batch_max_segments
+        self.batch_max_rounds = batch_max_rounds
+        self.batch_concurrency = batch_concurrency
+        
+        if self.cache:
+            for kind, version in self.PROMPT_VERSIONS.items():
+                self.cache.purge_stale(kind, version)
         
         # Language mappings
         self.language_names = {
@@ -16,6 +45,15 @@ class TranslationService:
             'hi': 'Hindi'
         }
     
+    def _generate(self, prompt: str, policy: Optional[str] = None, config=None):
+        """Call Gemini under the shared limiter, retrying transient failures"""
+        kwargs = {'model': self.model, 'contents': prompt}
+        if config is not None:
+            kwargs['config'] = config
+        return call_upstream('gemini', 'generate_content',
+                             lambda: self.client.models.generate_content(**kwargs),
+                             self.model, self.api_key, policy)
+    
     def translate_text(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
         """
         Translate text from source language to target language
@@ -25,6 +63,14 @@ class TranslationService:
             if source_lang == target_lang:
                 return text
             
+            cache_key = None
+            if self.cache:
+                cache_key = self.cache.make_key('translate_text', self.PROMPT_VERSIONS['translate_text'],
+                                                self.model, source_lang, target_lang, text)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
             source_name = self.language_names.get(source_lang, source_lang)
             target_name = self.language_names.get(target_lang, target_lang)
             
@@ -47,16 +93,19 @@ class TranslationService:
             Provide only the translation without any additional comments or explanations.
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            response = self._generate(prompt)
             
             if response and response.text:
-                return response.text.strip()
+                translation = response.text.strip()
+                if cache_key:
+                    self.cache.set(cache_key, translation, 'translate_text',
+                                   self.PROMPT_VERSIONS['translate_text'], self.model)
+                return translation
             else:
                 return None
                 
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Translation error: {e}")
             return None
@@ -67,6 +116,14 @@ class TranslationService:
         Translate text with additional context for better accuracy
         """
         try:
+            cache_key = None
+            if self.cache:
+                cache_key = self.cache.make_key('translate_with_context', self.PROMPT_VERSIONS['translate_with_context'],
+                                                self.model, source_lang, target_lang, text, context)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
             source_name = self.language_names.get(source_lang, source_lang)
             target_name = self.language_names.get(target_lang, target_lang)
             
@@ -88,24 +145,157 @@ class TranslationService:
             Translation:
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            response = self._generate(prompt)
+            
+            if not response or not response.text:
+                return None
             
-            return response.text.strip() if response and response.text else None
+            translation = response.text.strip()
+            if cache_key:
+                self.cache.set(cache_key, translation, 'translate_with_context',
+                               self.PROMPT_VERSIONS['translate_with_context'], self.model)
+            return translation
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Contextual translation error: {e}")
             return None
     
-    def translate_segments(self, segments: list, source_lang: str, target_lang: str) -> list:
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (~3 chars/token, conservative for Devanagari) plus JSON/id overhead"""
+        return len(text) // 3 + 8
+    
+    def _pack_batches(self, texts: Dict[str, str]) -> List[Dict[str, str]]:
+        """Split id -> text into batches that fit the token budget, keeping input order"""
+        batches = []
+        batch = {}
+        batch_tokens = 0
+        
+        for segment_id, text in texts.items():
+            tokens = self._estimate_tokens(text)
+            if batch and (batch_tokens + tokens > self.batch_token_budget or len(batch) >= self.batch_max_segments):
+                batches.append(batch)
+                batch = {}
+                batch_tokens = 0
+            batch[segment_id] = text
+            batch_tokens += tokens
+        
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def _translate_one_batch(self, batch: Dict[str, str], source_lang: str, target_lang: str) -> Dict[str, str]:
+        """One Gemini call for a batch; returns only the ids that came back with a translation"""
+        source_name = self.language_names.get(source_lang, source_lang)
+        target_name = self.language_names.get(target_lang, target_lang)
+        
+        prompt = f"""
+        You are a professional translator specializing in video dubbing translation.
+        
+        Translate every value in the JSON object below from {source_name} to {target_name}.
+        Return a JSON object with exactly the same keys, each mapped to its translation.
+        
+        Guidelines:
+        - Maintain the natural flow and timing suitable for dubbing
+        - Preserve emotional tone and context
+        - Keep sentence structure appropriate for spoken dialogue
+        - Ensure cultural appropriateness
+        - Maintain roughly similar length for timing synchronization
+        
+        Segments:
+        {json.dumps(batch, ensure_ascii=False)}
+        """
+        
+        config = types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=types.Schema(
+                type=types.Type.OBJECT,
+                properties={segment_id: types.Schema(type=types.Type.STRING) for segment_id in batch},
+                required=list(batch)
+            )
+        )
+        
+        try:
+            response = self._generate(prompt, config=config)
+            result = json.loads(response.text) if response and response.text else {}
+        except UpstreamBusy:
+            raise
+        except Exception as e:
+            print(f"Batch translation error ({len(batch)} segments): {e}")
+            return {}
+        
+        if not isinstance(result, dict):
+            return {}
+        
+        return {
+            segment_id: translation.strip()
+            for segment_id, translation in result.items()
+            if segment_id in batch and isinstance(translation, str) and translation.strip()
+        }
+    
+    def translate_batch(self, texts: Dict[str, str], source_lang: str, target_lang: str) -> Dict[str, str]:
+        """
+        Translate many texts keyed by segment id with as few Gemini calls as possible
+        Returns: id -> translation; ids still missing after batch_max_rounds are left out
+        """
+        if source_lang == target_lang:
+            return dict(texts)
+        
+        version = self.PROMPT_VERSIONS['translate_batch']
+        translations = {}
+        cache_keys = {}
+        pending = {}
+        
+        for segment_id, text in texts.items():
+            if self.cache:
+                cache_keys[segment_id] = self.cache.make_key('translate_batch', version, self.model,
+                                                             source_lang, target_lang, text)
+                cached = self.cache.get(cache_keys[segment_id])
+                if cached is not None:
+                    translations[segment_id] = cached
+                    continue
+            pending[segment_id] = text
+        
+        for _ in range(self.batch_max_rounds):
+            if not pending:
+                break
+            
+            batches = self._pack_batches(pending)
+            with ThreadPoolExecutor(max_workers=min(self.batch_concurrency, len(batches))) as executor:
+                results = list(executor.map(
+                    lambda batch: self._translate_one_batch(batch, source_lang, target_lang), batches
+                ))
+            
+            for result in results:
+                for segment_id, translation in result.items():
+                    translations[segment_id] = translation
+                    pending.pop(segment_id, None)
+                    if self.cache:
+                        self.cache.set(cache_keys[segment_id], translation, 'translate_batch', version, self.model)
+        
+        if pending:
+            print(f"Batch translation: {len(pending)} of {len(texts)} segments missing after "
+                  f"{self.batch_max_rounds} rounds")
+        
+        return translations
+    
+    def translate_segments(self, segments: list, source_lang: str, target_lang: str, batched: bool = True) -> list:
         """
         Translate multiple text segments while preserving timing information
+        batched=True packs the segments into a few multi-segment requests instead of one call each
         """
+        batch_translations = {}
+        if batched:
+            batch_translations = self.translate_batch(
+                {str(i): segment.get('text', '') for i, segment in enumerate(segments) if segment.get('text', '').strip()},
+                source_lang, target_lang
+            )
+        
         translated_segments = []
         
-        for segment in segments:
+        for i, segment in enumerate(segments):
             original_text = segment.get('text', '')
             
             if not original_text.strip():
@@ -113,7 +303,10 @@ class TranslationService:
                 translated_segments.append(segment.copy())
                 continue
             
-            translated_text = self.translate_text(original_text, source_lang, target_lang)
+            if batched:
+                translated_text = batch_translations.get(str(i))
+            else:
+                translated_text = self.translate_text(original_text, source_lang, target_lang)
             
             if translated_text:
                 translated_segment = segment.copy()
@@ -149,13 +342,12 @@ class TranslationService:
             Provide only the improved translation:
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            response = self._generate(prompt)
             
             return response.text.strip() if response and response.text else text
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Translation improvement error: {e}")
             return text
@@ -173,10 +365,7 @@ class TranslationService:
             Language code:
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            response = self._generate(prompt, policy='gemini:detect_language')
             
             if response and response.text:
                 detected = response.text.strip().lower()
@@ -184,6 +373,8 @@ class TranslationService:
             
             return None
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Language detection error: {e}")
             return None
@@ -203,10 +394,7 @@ class TranslationService:
             Respond with only a decimal number between 0 and 1:
             """
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
+            response = self._generate(prompt)
             
             if response and response.text:
                 try:
@@ -217,6 +405,8 @@ class TranslationService:
             
             return 0.7
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Quality scoring error: {e}")
             return 0.7
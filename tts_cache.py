@@ -0,0 +1,202 @@
+import os
+import json
+import asyncio
+import inspect
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Optional, Dict, Iterator, AsyncIterator, Any
+from artifact_store import ArtifactStore
+from single_flight import SingleFlight, AsyncSingleFlight
+from upstream_retry import retrying_iter, aretrying_iter
+
+
+def _voice_settings_dict(voice_settings: Any) -> Optional[Dict]:
+    if voice_settings is None:
+        return None
+    if hasattr(voice_settings, 'model_dump'):
+        return voice_settings.model_dump(exclude_none=True)
+    if hasattr(voice_settings, 'dict'):
+        return voice_settings.dict(exclude_none=True)
+    return {k: v for k, v in vars(voice_settings).items() if v is not None}
+
+
+class TTSCache:
+    """Disk cache of synthesized speech shared by every ElevenLabs TTS call site
+
+    Audio is keyed on (whitespace-normalized text, voice_id, model_id,
+    output_format, voice settings) and stored in an ArtifactStore, which
+    handles size-bounded LRU eviction
+    """
+
+    def __init__(self, store: ArtifactStore):
+        """Initialize TTS cache on top of an artifact store"""
+        self.store = store
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, output_format: str,
+                 voice_settings: Any = None) -> str:
+        # Whitespace-normalized like the routes' single-flight keys, so both agree on what is "the same text"
+        payload = json.dumps([' '.join(text.split()), voice_id, model_id, output_format,
+                              _voice_settings_dict(voice_settings)], sort_keys=True)
+        suffix = output_format.split('_')[0]
+        return f"{hashlib.sha256(payload.encode('utf-8')).hexdigest()}.{suffix}"
+
+    @staticmethod
+    def _convert_kwargs(text: str, voice_id: str, model_id: str, output_format: str,
+                        voice_settings: Any = None) -> Dict:
+        kwargs = {
+            'text': text,
+            'voice_id': voice_id,
+            'model_id': model_id,
+            'output_format': output_format
+        }
+        if voice_settings is not None:
+            kwargs['voice_settings'] = voice_settings
+        return kwargs
+
+    def _record(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, text: str, voice_id: str, model_id: str, output_format: str,
+               voice_settings: Any = None) -> Optional[str]:
+        """Get the cached audio path, or None on a miss"""
+        path = self.store.get_path(self.make_key(text, voice_id, model_id, output_format, voice_settings))
+        self._record(path is not None)
+        return path
+
+    def stream_and_store(self, client, api_key: Optional[str], text: str, voice_id: str, model_id: str,
+                         output_format: str, voice_settings: Any = None) -> Iterator[bytes]:
+        """
+        Call ElevenLabs and yield audio chunks while teeing them into the cache
+        Partial streams (errors, closed consumers) are not cached
+        """
+        cache_key = self.make_key(text, voice_id, model_id, output_format, voice_settings)
+
+        kwargs = self._convert_kwargs(text, voice_id, model_id, output_format, voice_settings)
+
+        writer = self.store.open_writer(cache_key)
+        try:
+            for chunk in retrying_iter('elevenlabs', model_id, api_key,
+                                       lambda: client.text_to_speech.convert(**kwargs),
+                                       'text_to_speech.convert'):
+                writer.write(chunk)
+                yield chunk
+        except BaseException:
+            writer.abort()
+            raise
+
+        writer.commit()
+
+    async def astream_and_store(self, async_client, api_key: Optional[str], text: str, voice_id: str,
+                                model_id: str, output_format: str, voice_settings: Any = None) -> AsyncIterator[bytes]:
+        """stream_and_store() for an AsyncElevenLabs client"""
+        cache_key = self.make_key(text, voice_id, model_id, output_format, voice_settings)
+
+        kwargs = self._convert_kwargs(text, voice_id, model_id, output_format, voice_settings)
+
+        async def open_stream():
+            response = async_client.text_to_speech.convert(**kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+            return response
+
+        # Disk work runs on worker threads so it never blocks the event loop
+        writer = await asyncio.to_thread(self.store.open_writer, cache_key)
+        try:
+            async for chunk in aretrying_iter('elevenlabs', model_id, api_key, open_stream, 'text_to_speech.convert'):
+                await asyncio.to_thread(writer.write, chunk)
+                yield chunk
+        except BaseException:
+            await asyncio.shield(asyncio.to_thread(writer.abort))
+            raise
+
+        await asyncio.to_thread(writer.commit)
+
+    async def asynthesize(self, async_client, api_key: Optional[str], text: str, voice_id: str, model_id: str,
+                          output_format: str, voice_settings: Any = None, record: bool = True) -> str:
+        """synthesize() for an AsyncElevenLabs client"""
+        cache_key = self.make_key(text, voice_id, model_id, output_format, voice_settings)
+        path = await asyncio.to_thread(self.store.get_path, cache_key)
+        if record:
+            self._record(path is not None)
+        if path:
+            return path
+
+        async def fetch():
+            async for _ in self.astream_and_store(async_client, api_key, text, voice_id, model_id,
+                                                  output_format, voice_settings):
+                pass
+            return await asyncio.to_thread(self.store.get_path, cache_key)
+
+        path, _ = await self.async_flight.do(cache_key, fetch)
+        if not path:
+            raise RuntimeError('Synthesized audio was evicted before it could be read')
+        return path
+
+    def synthesize(self, client, api_key: Optional[str], text: str, voice_id: str, model_id: str,
+                   output_format: str, voice_settings: Any = None, record: bool = True) -> str:
+        """
+        Read-through synthesis; concurrent misses for the same key share one call
+        Pass record=False when the caller already counted this request with lookup()
+        Returns: path of the cached audio file (owned by the cache, don't delete it)
+        """
+        cache_key = self.make_key(text, voice_id, model_id, output_format, voice_settings)
+        path = self.store.get_path(cache_key)
+        if record:
+            self._record(path is not None)
+        if path:
+            return path
+
+        def fetch():
+            for _ in self.stream_and_store(client, api_key, text, voice_id, model_id, output_format, voice_settings):
+                pass
+            return self.store.get_path(cache_key)
+
+        path, _ = self.flight.do(cache_key, fetch)
+        if not path:
+            raise RuntimeError('Synthesized audio was evicted before it could be read')
+        return path
+
+    def synthesize_to_file(self, client, api_key: Optional[str], text: str, voice_id: str, model_id: str,
+                           output_format: str, voice_settings: Any = None,
+                           output_path: Optional[str] = None) -> str:
+        """Like synthesize() but copies the audio to a caller-owned file"""
+        path = self.synthesize(client, api_key, text, voice_id, model_id, output_format, voice_settings)
+        if output_path is None:
+            output_path = tempfile.mktemp(suffix=os.path.splitext(path)[1])
+        shutil.copyfile(path, output_path)
+        return output_path
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+        stats.update(self.store.get_stats())
+        return stats
+
+
+def create_tts_cache_from_env() -> TTSCache:
+    """Build a TTS cache from TTS_CACHE_DIR / TTS_CACHE_MAX_MB / TTS_CACHE_TTL_SECONDS"""
+    return TTSCache(ArtifactStore(
+        root_dir=os.environ.get('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'anuvaad_tts_cache')),
+        max_bytes=int(os.environ.get('TTS_CACHE_MAX_MB', 1024)) * 1024 * 1024,
+        ttl_seconds=int(os.environ.get('TTS_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+    ))
+
+
+shared_tts_cache = create_tts_cache_from_env()
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, BinaryIO, Iterator
+
+
+class UploadError(Exception):
+    """Raised when an upload request doesn't match the session state"""
+
+    def __init__(self, message: str, status_code: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadSessionManager:
+    """Handles resumable chunked uploads staged on local disk
+
+    Each session is a <id>.part staging file plus a <id>.json sidecar, so a
+    session survives a restart. Appends are serialized per upload with
+    in-process locks only, so every chunk of an upload must reach the same process
+    """
+
+    def __init__(self, upload_dir: str, max_size: int = 2 * 1024 * 1024 * 1024,
+                 session_ttl: int = 24 * 3600):
+        """Initialize upload manager with a staging directory"""
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.session_ttl = session_ttl
+        self.lock = threading.Lock()
+        self.upload_locks = {}
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.upload_dir, f'{upload_id}.json')
+
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.upload_dir, f'{upload_id}.part')
+
+    def _load(self, upload_id: str) -> Dict:
+        # upload ids are uuid4 hex; reject anything else before touching the disk
+        if len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError('Upload not found', 404)
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError('Upload not found', 404)
+
+    def _upload_lock(self, upload_id: str) -> threading.Lock:
+        with self.lock:
+            return self.upload_locks.setdefault(upload_id, threading.Lock())
+
+    def create(self, total_size: int, sha256: Optional[str] = None, metadata: Optional[Dict] = None) -> Dict:
+        """
+        Start a new upload session
+        Returns: {'upload_id': id, 'offset': 0, 'total_size': total_size}
+        """
+        if total_size <= 0 or total_size > self.max_size:
+            raise UploadError(f'Upload size must be between 1 and {self.max_size} bytes')
+
+        self.cleanup_expired()
+
+        upload_id = uuid.uuid4().hex
+        session = {
+            'upload_id': upload_id,
+            'total_size': total_size,
+            'sha256': sha256.lower() if sha256 else None,
+            'metadata': metadata or {},
+            'created_at': time.time()
+        }
+
+        open(self._part_path(upload_id), 'wb').close()
+        with open(self._meta_path(upload_id), 'w') as f:
+            json.dump(session, f)
+
+        return {'upload_id': upload_id, 'offset': 0, 'total_size': total_size}
+
+    def get_status(self, upload_id: str) -> Dict:
+        """Get the number of bytes received so far"""
+        session = self._load(upload_id)
+        return {
+            'upload_id': upload_id,
+            'offset': os.path.getsize(self._part_path(upload_id)),
+            'total_size': session['total_size']
+        }
+
+    def append(self, upload_id: str, start: int, stream: BinaryIO, length: int,
+               sha256: Optional[str] = None) -> Dict:
+        """
+        Append a byte range read from stream to the staging file
+        start must equal the current offset; otherwise UploadError (409) reports it.
+        With sha256, a chunk whose bytes don't match is dropped (422)
+        """
+        session = self._load(upload_id)
+        part_path = self._part_path(upload_id)
+
+        # Only this upload's lock is held while the body streams in, so a slow
+        # client never stalls chunks for other uploads
+        upload_lock = self._upload_lock(upload_id)
+        if not upload_lock.acquire(blocking=False):
+            raise UploadError('Another chunk for this upload is in progress', 409,
+                              os.path.getsize(part_path))
+        try:
+            offset = os.path.getsize(part_path)
+            if start != offset:
+                raise UploadError(f'Expected range starting at byte {offset}', 409, offset)
+            if offset + length > session['total_size']:
+                raise UploadError('Range extends past the declared upload size', 416, offset)
+
+            remaining = length
+            hasher = hashlib.sha256()
+            with open(part_path, 'ab') as f:
+                while remaining > 0:
+                    block = stream.read(min(1024 * 1024, remaining))
+                    if not block:
+                        break
+                    f.write(block)
+                    hasher.update(block)
+                    remaining -= len(block)
+
+                if sha256 and remaining == 0 and hasher.hexdigest() != sha256.lower():
+                    f.truncate(offset)
+                    raise UploadError('Chunk checksum mismatch; resend it', 422, offset)
+
+            offset = os.path.getsize(part_path)
+            # cleanup_expired() goes by the sidecar's mtime, so activity keeps the session alive
+            os.utime(self._meta_path(upload_id))
+        finally:
+            upload_lock.release()
+
+        if remaining > 0:
+            # Client disconnected mid-chunk; what arrived is kept and they resume from offset
+            raise UploadError('Upload chunk was incomplete', 400, offset)
+
+        return {'upload_id': upload_id, 'offset': offset, 'total_size': session['total_size']}
+
+    @contextmanager
+    def finalizing(self, upload_id: str, suffix: str = '.mp4') -> Iterator[Dict]:
+        """
+        Verify size and checksum, then yield {'path': assembled file path, 'metadata': session metadata}
+        The session is removed only when the block completes; if it raises
+        (e.g. the upstream was busy), the upload is kept so finalize can be retried
+        """
+        session = self._load(upload_id)
+        part_path = self._part_path(upload_id)
+
+        upload_lock = self._upload_lock(upload_id)
+        if not upload_lock.acquire(blocking=False):
+            raise UploadError('This upload is busy with a chunk or another finalize', 409)
+        try:
+            self._verify(upload_id, session, part_path)
+
+            # A link with the right extension; the part file stays in place for retries
+            assembled_path = os.path.join(self.upload_dir, f'{upload_id}.assembled{suffix}')
+            try:
+                os.link(part_path, assembled_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                shutil.copyfile(part_path, assembled_path)
+
+            try:
+                yield {'path': assembled_path, 'metadata': session['metadata']}
+            finally:
+                try:
+                    os.unlink(assembled_path)
+                except OSError:
+                    pass
+
+            self.discard(upload_id)
+        finally:
+            upload_lock.release()
+
+    def _verify(self, upload_id: str, session: Dict, part_path: str):
+        size = os.path.getsize(part_path)
+        if size != session['total_size']:
+            raise UploadError(f"Upload incomplete: {size} of {session['total_size']} bytes", 409, size)
+
+        if session['sha256'] and not session.get('verified'):
+            hasher = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    hasher.update(block)
+            if hasher.hexdigest() != session['sha256']:
+                self.discard(upload_id)
+                raise UploadError('Checksum mismatch; upload discarded', 422)
+
+            # Retried finalizes skip re-hashing the whole file
+            session['verified'] = True
+            with open(self._meta_path(upload_id), 'w') as f:
+                json.dump(session, f)
+
+    def discard(self, upload_id: str):
+        with self.lock:
+            self.upload_locks.pop(upload_id, None)
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def cleanup_expired(self):
+        """Remove sessions with no activity for session_ttl"""
+        cutoff = time.time() - self.session_ttl
+        for name in os.listdir(self.upload_dir):
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-5]
+            try:
+                if os.path.getmtime(self._meta_path(upload_id)) < cutoff:
+                    self.discard(upload_id)
+            except OSError:
+                pass
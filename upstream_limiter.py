@@ -0,0 +1,340 @@
+import os
+import json
+import math
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, Dict, Callable, Iterable, Iterator
+from metrics import track_upstream
+
+
+DEFAULT_LIMITS = {
+    'default': {'max_concurrent': 4, 'rate': 5.0, 'burst': 5, 'max_queue': 16, 'queue_timeout': 30.0},
+    'gemini': {'max_concurrent': 8, 'rate': 10.0, 'burst': 10, 'max_queue': 32, 'queue_timeout': 30.0},
+    'elevenlabs': {'max_concurrent': 4, 'rate': 5.0, 'burst': 5, 'max_queue': 32, 'queue_timeout': 60.0},
+    # Dubbed video downloads hold a slot for the whole client transfer
+    'elevenlabs:dubbing-download': {'max_concurrent': 8, 'max_queue': 32, 'queue_timeout': 30.0}
+}
+
+
+class UpstreamBusy(Exception):
+    """Raised when an upstream's queue is full or the provider itself answered 429"""
+
+    def __init__(self, upstream: str, retry_after: int):
+        super().__init__(f"{upstream} is busy, retry in {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def _rate_limit_retry_after(error: Exception) -> Optional[int]:
+    """Return a Retry-After for provider 429 errors, None for anything else"""
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if status != 429:
+        return None
+
+    headers = getattr(error, 'headers', None) or getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(1, int(float(headers.get('retry-after') or headers.get('Retry-After'))))
+    except (TypeError, ValueError):
+        return 1
+
+
+class _Waiter:
+    """A queued acquire(); release() hands it a slot by setting granted and waking it"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self) -> bool:
+        """Wake the waiter (caller holds the limiter lock); False if its event loop is gone"""
+        if self.loop is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            return False
+        return True
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class UpstreamLimiter:
+    """Bounds concurrent calls (slot count) and call rate (token bucket) for one upstream
+
+    Threads and coroutines queue for slots in one FIFO, and release() hands
+    a freed slot straight to the oldest waiter
+    """
+
+    def __init__(self, name: str, max_concurrent: int, rate: float, burst: int,
+                 max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.lock = threading.Lock()
+        self.available = max_concurrent
+        self.waiters = deque()
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.in_flight = 0
+        self.rejected = 0
+        self.avg_hold = 1.0
+
+    def retry_after(self) -> int:
+        """Estimate when a slot frees up from the average call duration"""
+        return max(1, math.ceil(self.avg_hold * (len(self.waiters) + 1) / self.max_concurrent))
+
+    def _try_token(self, deadline: float) -> float:
+        """Take a token and return 0, or return how long to wait for the next one"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            wait = (1 - self.tokens) / self.rate
+
+        if time.monotonic() + wait > deadline:
+            raise UpstreamBusy(self.name, max(1, math.ceil(wait)))
+        return wait
+
+    def _take_token(self, deadline: float):
+        while True:
+            wait = self._try_token(deadline)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def _enqueue(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """Take a free slot and return None, or queue a waiter; raises UpstreamBusy when the queue is full"""
+        with self.lock:
+            if self.available > 0 and not self.waiters:
+                self.available -= 1
+                return None
+            if len(self.waiters) >= self.max_queue:
+                self.rejected += 1
+                raise UpstreamBusy(self.name, self.retry_after())
+            waiter = _Waiter(loop)
+            self.waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Withdraw a waiter that gave up; True if it was granted a slot in the meantime"""
+        with self.lock:
+            if waiter.granted:
+                return True
+            self.waiters.remove(waiter)
+            return False
+
+    def _release_slot(self):
+        with self.lock:
+            while self.waiters:
+                waiter = self.waiters.popleft()
+                waiter.granted = True
+                if waiter.wake():
+                    return
+            self.available += 1
+
+    def _reject(self):
+        with self.lock:
+            self.rejected += 1
+        raise UpstreamBusy(self.name, self.retry_after())
+
+    def _mark_in_flight(self) -> float:
+        with self.lock:
+            self.in_flight += 1
+        return time.monotonic()
+
+    def acquire(self):
+        """Wait for a slot; raises UpstreamBusy when the queue is full or the wait times out"""
+        deadline = time.monotonic() + self.queue_timeout
+
+        waiter = self._enqueue()
+        if waiter is not None and not waiter.event.wait(self.queue_timeout) and not self._abandon(waiter):
+            self._reject()
+
+        try:
+            if self.rate > 0:
+                self._take_token(deadline)
+        except UpstreamBusy:
+            self._release_slot()
+            with self.lock:
+                self.rejected += 1
+            raise
+
+        return self._mark_in_flight()
+
+    async def acquire_async(self):
+        """
+        Event-loop friendly acquire() sharing the same slots and token
+        bucket, so sync and async callers draw on one budget
+        """
+        deadline = time.monotonic() + self.queue_timeout
+
+        waiter = self._enqueue(asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    self._reject()
+            except BaseException:
+                # Cancelled while queued: hand on a slot we may have been given
+                if self._abandon(waiter):
+                    self._release_slot()
+                raise
+
+        try:
+            while self.rate > 0:
+                wait = self._try_token(deadline)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException as e:
+            self._release_slot()
+            if isinstance(e, UpstreamBusy):
+                with self.lock:
+                    self.rejected += 1
+            raise
+
+        return self._mark_in_flight()
+
+    def release(self, started_at: float):
+        with self.lock:
+            self.in_flight -= 1
+            self.avg_hold = 0.8 * self.avg_hold + 0.2 * (time.monotonic() - started_at)
+        self._release_slot()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of the block; provider 429s become UpstreamBusy"""
+        started_at = self.acquire()
+        try:
+            yield
+        except UpstreamBusy:
+            raise
+        except Exception as e:
+            retry_after = _rate_limit_retry_after(e)
+            if retry_after is not None:
+                raise UpstreamBusy(self.name, retry_after) from e
+            raise
+        finally:
+            self.release(started_at)
+
+    @asynccontextmanager
+    async def aslot(self):
+        """Async variant of slot()"""
+        started_at = await self.acquire_async()
+        try:
+            yield
+        except UpstreamBusy:
+            raise
+        except Exception as e:
+            retry_after = _rate_limit_retry_after(e)
+            if retry_after is not None:
+                raise UpstreamBusy(self.name, retry_after) from e
+            raise
+        finally:
+            self.release(started_at)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'waiting': len(self.waiters),
+                'rejected': self.rejected,
+                'max_concurrent': self.max_concurrent
+            }
+
+
+class LimiterRegistry:
+    """Hands out one UpstreamLimiter per (provider, model, API key)
+
+    Limit settings are merged from "default", "provider", "provider:model",
+    "provider@keyid" and "provider:model@keyid", later entries winning, where
+    keyid is the first 8 hex chars of the API key's sha256
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict]] = None):
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'LimiterRegistry':
+        """Build from the UPSTREAM_LIMITS JSON env var, e.g. {"gemini:gemini-2.5-flash": {"rate": 2}}"""
+        try:
+            limits = json.loads(os.environ.get('UPSTREAM_LIMITS', '{}'))
+        except ValueError:
+            print("Warning: UPSTREAM_LIMITS is not valid JSON, using defaults")
+            limits = {}
+        return cls(limits)
+
+    def _config_for(self, provider: str, model: Optional[str], key_id: str) -> Dict:
+        config = dict(self.limits['default'])
+        candidates = [provider, f'{provider}@{key_id}']
+        if model:
+            candidates = [provider, f'{provider}:{model}', f'{provider}@{key_id}', f'{provider}:{model}@{key_id}']
+        for name in candidates:
+            config.update(self.limits.get(name, {}))
+        return config
+
+    def get(self, provider: str, model: Optional[str] = None, api_key: Optional[str] = None) -> UpstreamLimiter:
+        key_id = hashlib.sha256(api_key.encode()).hexdigest()[:8] if api_key else 'default'
+        registry_key = (provider, model, key_id)
+
+        with self.lock:
+            limiter = self.limiters.get(registry_key)
+            if limiter is None:
+                name = f'{provider}:{model}' if model else provider
+                limiter = UpstreamLimiter(name, **self._config_for(provider, model, key_id))
+                self.limiters[registry_key] = limiter
+            return limiter
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {f'{p}:{m or "*"}@{k}': limiter.get_stats() for (p, m, k), limiter in self.limiters.items()}
+
+
+upstream_limiters = LimiterRegistry.from_env()
+
+
+@contextmanager
+def limit(provider: str, model: Optional[str] = None, api_key: Optional[str] = None, operation: str = 'call'):
+    """Hold a slot on the shared limiter for this upstream and record the call's metrics"""
+    with upstream_limiters.get(provider, model, api_key).slot(), track_upstream(provider, operation, model):
+        yield
+
+
+@asynccontextmanager
+async def alimit(provider: str, model: Optional[str] = None, api_key: Optional[str] = None, operation: str = 'call'):
+    """Async variant of limit()"""
+    async with upstream_limiters.get(provider, model, api_key).aslot():
+        with track_upstream(provider, operation, model):
+            yield
+
+
+def limited_iter(provider: str, model: Optional[str], api_key: Optional[str], make_iter: Callable[[], Iterable],
+                 operation: str = 'call') -> Iterator:
+    """
+    Wrap a lazily streamed upstream response so the slot is taken on the
+    first next() and held until the stream is exhausted or closed
+    """
+    with limit(provider, model, api_key, operation):
+        yield from make_iter()
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Callable, Iterable, Iterator, AsyncIterator, Awaitable, Any
+from upstream_limiter import UpstreamBusy, limit, alimit, limited_iter
+from metrics import upstream_retries, upstream_hedges
+
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = ('Timeout', 'ConnectError', 'ConnectionError', 'RemoteProtocolError', 'ReadError')
+
+DEFAULT_POLICIES = {
+    'default': {'max_attempts': 4, 'base_delay': 0.5, 'max_delay': 8.0, 'deadline': 60.0, 'hedge_after': None},
+    'elevenlabs:text_to_speech.convert': {'deadline': 120.0},
+    # Every upload creates a new (billed) dubbing project, so never repeat one
+    'elevenlabs:dubbing.create': {'max_attempts': 1},
+    # Only cheap, idempotent reads are hedged; a duplicate synthesis would be billed twice
+    'gemini:detect_language': {'max_attempts': 3, 'deadline': 10.0, 'hedge_after': 1.0}
+}
+
+hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('HEDGE_WORKERS', 16)),
+    thread_name_prefix='upstream-hedge'
+)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = (getattr(error, 'status_code', None) or getattr(error, 'code', None)
+              or getattr(getattr(error, 'response', None), 'status_code', None))
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, if it sent Retry-After"""
+    if isinstance(error, UpstreamBusy):
+        return float(error.retry_after)
+
+    headers = getattr(error, 'headers', None) or getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('retry-after') or headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient failures worth another attempt: 429/5xx/timeouts and dropped connections"""
+    if isinstance(error, UpstreamBusy):
+        # Provider 429s are chained from the SDK error; a full local queue is our own backpressure
+        return error.__cause__ is not None
+
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+
+    return (isinstance(error, (TimeoutError, ConnectionError))
+            or any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES))
+
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter, bounded by a per-call deadline
+
+    The deadline caps the total time spent across attempts and backoff sleeps;
+    a single attempt in flight is bounded by the client's own timeouts
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, deadline: float,
+                 hedge_after: Optional[float] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def next_delay(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to sleep before retrying after the given failed attempt, or None to give up"""
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+
+        delay = self.backoff(attempt)
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+class RetryPolicyRegistry:
+    """Resolves the RetryPolicy for an upstream call
+
+    Settings are merged from "default", "provider", "provider:operation" and
+    an optional named policy (e.g. "gemini:detect_language"), later entries winning
+    """
+
+    def __init__(self, policies: Optional[Dict[str, Dict]] = None):
+        self.policies = {name: dict(config) for name, config in DEFAULT_POLICIES.items()}
+        for name, config in (policies or {}).items():
+            self.policies.setdefault(name, {}).update(config)
+        self.resolved = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicyRegistry':
+        """Build from the RETRY_POLICIES JSON env var, e.g. {"gemini": {"max_attempts": 6}}"""
+        try:
+            policies = json.loads(os.environ.get('RETRY_POLICIES', '{}'))
+        except ValueError:
+            print("Warning: RETRY_POLICIES is not valid JSON, using defaults")
+            policies = {}
+        return cls(policies)
+
+    def get(self, provider: str, operation: str, name: Optional[str] = None) -> RetryPolicy:
+        key = (provider, operation, name)
+        with self.lock:
+            policy = self.resolved.get(key)
+            if policy is None:
+                config = dict(self.policies['default'])
+                for candidate in (provider, f'{provider}:{operation}', name):
+                    if candidate:
+                        config.update(self.policies.get(candidate, {}))
+                policy = self.resolved[key] = RetryPolicy(**config)
+            return policy
+
+
+retry_policies = RetryPolicyRegistry.from_env()
+
+
+def _hedged(attempt: Callable[[], Any], hedge_after: float, provider: str, operation: str) -> Any:
+    """
+    Run attempt() and, if it hasn't answered within hedge_after seconds,
+    start a duplicate; the first success wins and the loser's result is dropped
+    """
+    primary = hedge_executor.submit(contextvars.copy_context().run, attempt)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    hedge = hedge_executor.submit(contextvars.copy_context().run, attempt)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                upstream_hedges.inc(provider=provider, operation=operation,
+                                    winner='primary' if future is primary else 'hedge')
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _ahedged(attempt: Callable[[], Awaitable[Any]], hedge_after: float, provider: str, operation: str) -> Any:
+    """Async _hedged(); the losing call is cancelled"""
+    primary = asyncio.ensure_future(attempt())
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        tasks.append(asyncio.ensure_future(attempt()))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    upstream_hedges.inc(provider=provider, operation=operation,
+                                        winner='primary' if task is primary else 'hedge')
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def call_upstream(provider: str, operation: str, fn: Callable[[], Any], model: Optional[str] = None,
+                  api_key: Optional[str] = None, policy: Optional[str] = None) -> Any:
+    """
+    Call fn() under the upstream's limiter, retrying transient failures with
+    jittered exponential backoff (honoring Retry-After) until the policy's
+    attempts or deadline run out. Policies with hedge_after send a duplicate
+    request when the first is slow
+    """
+    retry_policy = retry_policies.get(provider, operation, policy)
+    deadline = time.monotonic() + retry_policy.deadline
+
+    def attempt():
+        with limit(provider, model, api_key, operation):
+            return fn()
+
+    attempt_number = 0
+    while True:
+        try:
+            if retry_policy.hedge_after is not None:
+                return _hedged(attempt, retry_policy.hedge_after, provider, operation)
+            return attempt()
+        except Exception as e:
+            delay = retry_policy.next_delay(e, attempt_number, deadline)
+            if delay is None:
+                raise
+            upstream_retries.inc(provider=provider, operation=operation, error=type(e).__name__)
+            time.sleep(delay)
+            attempt_number += 1
+
+
+async def acall_upstream(provider: str, operation: str, make_coro: Callable[[], Awaitable[Any]],
+                         model: Optional[str] = None, api_key: Optional[str] = None,
+                         policy: Optional[str] = None) -> Any:
+    """Async call_upstream(); make_coro is called once per attempt"""
+    retry_policy = retry_policies.get(provider, operation, policy)
+    deadline = time.monotonic() + retry_policy.deadline
+
+    async def attempt():
+        async with alimit(provider, model, api_key, operation):
+            return await make_coro()
+
+    attempt_number = 0
+    while True:
+        try:
+            if retry_policy.hedge_after is not None:
+                return await _ahedged(attempt, retry_policy.hedge_after, provider, operation)
+            return await attempt()
+        except Exception as e:
+            delay = retry_policy.next_delay(e, attempt_number, deadline)
+            if delay is None:
+                raise
+            upstream_retries.inc(provider=provider, operation=operation, error=type(e).__name__)
+            await asyncio.sleep(delay)
+            attempt_number += 1
+
+
+def retrying_iter(provider: str, model: Optional[str], api_key: Optional[str], make_iter: Callable[[], Iterable],
+                  operation: str = 'call', policy: Optional[str] = None) -> Iterator:
+    """
+    limited_iter() that retries a stream failing before its first chunk;
+    once data has been yielded a failure is passed through to the consumer
+    """
+    retry_policy = retry_policies.get(provider, operation, policy)
+    deadline = time.monotonic() + retry_policy.deadline
+
+    attempt_number = 0
+    while True:
+        started = False
+        try:
+            for chunk in limited_iter(provider, model, api_key, make_iter, operation):
+                started = True
+                yield chunk
+            return
+        except Exception as e:
+            delay = None if started else retry_policy.next_delay(e, attempt_number, deadline)
+            if delay is None:
+                raise
+            upstream_retries.inc(provider=provider, operation=operation, error=type(e).__name__)
+            time.sleep(delay)
+            attempt_number += 1
+
+
+async def aretrying_iter(provider: str, model: Optional[str], api_key: Optional[str],
+                         open_stream: Callable[[], Awaitable[AsyncIterator]], operation: str = 'call',
+                         policy: Optional[str] = None) -> AsyncIterator:
+    """Async retrying_iter(); open_stream is awaited once per attempt for a fresh async iterator"""
+    retry_policy = retry_policies.get(provider, operation, policy)
+    deadline = time.monotonic() + retry_policy.deadline
+
+    attempt_number = 0
+    while True:
+        started = False
+        try:
+            async with alimit(provider, model, api_key, operation):
+                async for chunk in await open_stream():
+                    started = True
+                    yield chunk
+            return
+        except Exception as e:
+            delay = None if started else retry_policy.next_delay(e, attempt_number, deadline)
+            if delay is None:
+                raise
+            upstream_retries.inc(provider=provider, operation=operation, error=type(e).__name__)
+            await asyncio.sleep(delay)
+            attempt_number += 1
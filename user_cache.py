@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Callable
+
+
+class UserCache:
+    """Short-TTL cache of JWT identity -> serialized user for authenticated routes
+
+    Holds to_dict() snapshots rather than ORM objects so entries are safe to
+    share across threads and sessions. watch() drops an entry whenever its
+    row is updated or deleted through the ORM; the TTL bounds staleness for
+    changes made by other processes
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 10000):
+        """Initialize an empty cache"""
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, loader: Callable[[int], Optional[Dict]]) -> Optional[Dict]:
+        """Return the cached user, calling loader(user_id) on a miss; missing users are not cached"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry and entry[1] > now:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user = loader(user_id)
+        if user is not None:
+            with self.lock:
+                self.entries[user_id] = (user, now + self.ttl_seconds)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int):
+        with self.lock:
+            if self.entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def watch(self, model):
+        """Invalidate entries when rows of the SQLAlchemy model are updated or deleted"""
+        from sqlalchemy import event
+
+        def on_change(mapper, connection, target):
+            self.invalidate(target.id)
+
+        event.listen(model, 'after_update', on_change)
+        event.listen(model, 'after_delete', on_change)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+def create_user_cache_from_env() -> UserCache:
+    """Build a user cache from USER_CACHE_TTL_SECONDS / USER_CACHE_SIZE"""
+    return UserCache(
+        ttl_seconds=float(os.environ.get('USER_CACHE_TTL_SECONDS', 30)),
+        max_entries=int(os.environ.get('USER_CACHE_SIZE', 10000))
+    )
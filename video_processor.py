@@ -6,6 +6,7 @@ except ImportError:
     from moviepy.editor import VideoFileClip, CompositeVideoClip, AudioFileClip
 import ffmpeg
 from typing import Optional, Dict
+from tracing import traced
 
 class VideoProcessor:
     """Handles video processing operations"""
@@ -14,6 +15,7 @@ class VideoProcessor:
         """Initialize video processor"""
         pass
     
+    @traced()
     def get_video_info(self, video_path: str) -> Optional[Dict]:
         """
         Get basic information about the video file
@@ -31,6 +33,7 @@ class VideoProcessor:
             print(f"Error getting video info: {e}")
             return None
     
+    @traced(result_bytes=True)
     def extract_audio(self, video_path: str) -> Optional[str]:
         """
         Extract audio track from video file
@@ -56,6 +59,7 @@ class VideoProcessor:
             print(f"Error extracting audio: {e}")
             return None
     
+    @traced(result_bytes=True)
     def create_dubbed_video(self, original_video_path: str, dubbed_audio_path: str) -> Optional[str]:
         """
         Create final dubbed video by combining original video with new audio
@@ -106,6 +110,7 @@ class VideoProcessor:
             print(f"Error creating dubbed video: {e}")
             return None
     
+    @traced(result_bytes=True)
     def create_side_by_side_comparison(self, original_path: str, dubbed_path: str) -> Optional[str]:
         """
         Create a side-by-side comparison video
@@ -142,6 +147,7 @@ class VideoProcessor:
             print(f"Error creating comparison video: {e}")
             return None
     
+    @traced()
     def extract_video_frames_at_timestamps(self, video_path: str, timestamps: list) -> list:
         """
         Extract video frames at specific timestamps for analysis
@@ -167,6 +173,7 @@ class VideoProcessor:
             print(f"Error extracting frames: {e}")
             return []
     
+    @traced(result_bytes=True)
     def optimize_video_for_web(self, video_path: str) -> Optional[str]:
         """
         Optimize video for web playback
@@ -207,6 +214,7 @@ class VideoProcessor:
         except:
             return False
     
+    @traced()
     def get_video_metadata(self, video_path: str) -> Dict:
         """
         Get comprehensive video metadata
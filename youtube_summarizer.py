@@ -3,19 +3,26 @@ import tempfile
 import yt_dlp
 import speech_recognition as sr
 from pydub import AudioSegment
-from google import genai
-from typing import Optional, Dict
+from typing import Optional, Dict, Callable
+from upstream_limiter import UpstreamBusy
+from metrics import track_upstream
+from tracing import traced, span
+from generation_cache import GenerationCache, shared_generation_cache
+from client_registry import shared_clients
 import time
 
 
 class YouTubeSummarizer:
     """Handles YouTube video downloading, transcription, and summarization"""
     
-    def __init__(self, gemini_api_key: str):
-        """Initialize YouTube summarizer with Gemini API"""
-        self.gemini_client = genai.Client(api_key=gemini_api_key)
+    def __init__(self, gemini_api_key: str, generation_cache: Optional[GenerationCache] = None):
+        """Initialize YouTube summarizer with Gemini API and the shared generation cache"""
+        self.gemini_client = shared_clients.gemini(gemini_api_key)
+        self.gemini_api_key = gemini_api_key
+        self.generation_cache = generation_cache or shared_generation_cache
         self.recognizer = sr.Recognizer()
     
+    @traced()
     def download_video(self, youtube_url: str) -> Optional[Dict[str, str]]:
         """
         Download YouTube video and extract audio
@@ -32,12 +39,16 @@ class YouTubeSummarizer:
                 'no_warnings': True,
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=True)
-                title = info.get('title', 'Unknown')
+            with span('yt_dlp.extract_info') as s:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl, track_upstream('youtube', 'yt_dlp.extract_info'):
+                    info = ydl.extract_info(youtube_url, download=True)
+                    title = info.get('title', 'Unknown')
+                s.add_bytes(os.path.getsize(video_path))
             
-            audio = AudioSegment.from_file(video_path)
-            audio.export(audio_path, format='wav')
+            with span('export_wav') as s:
+                audio = AudioSegment.from_file(video_path)
+                audio.export(audio_path, format='wav')
+                s.add_bytes(os.path.getsize(audio_path))
             
             return {
                 'video_path': video_path,
@@ -49,6 +60,7 @@ class YouTubeSummarizer:
             print(f"Error downloading YouTube video: {e}")
             return None
     
+    @traced()
     def transcribe_audio(self, audio_path: str) -> Optional[str]:
         """
         Transcribe audio to text using Google Speech Recognition
@@ -56,7 +68,8 @@ class YouTubeSummarizer:
         try:
             with sr.AudioFile(audio_path) as source:
                 audio_data = self.recognizer.record(source)
-                text = self.recognizer.recognize_google(audio_data)
+                with track_upstream('google', 'recognize_google'):
+                    text = self.recognizer.recognize_google(audio_data)
                 return text
         except sr.UnknownValueError:
             print("Could not understand audio")
@@ -65,6 +78,7 @@ class YouTubeSummarizer:
             print(f"Error transcribing audio: {e}")
             return None
     
+    @traced()
     def transcribe_audio_in_chunks(self, audio_path: str, chunk_duration_ms: int = 30000) -> Optional[str]:
         """
         Transcribe long audio by splitting into chunks
@@ -77,18 +91,22 @@ class YouTubeSummarizer:
                 chunk = audio[i:i + chunk_duration_ms]
                 
                 chunk_path = tempfile.mktemp(suffix='.wav')
-                chunk.export(chunk_path, format='wav')
                 
-                try:
-                    with sr.AudioFile(chunk_path) as source:
-                        audio_data = self.recognizer.record(source)
-                        text = self.recognizer.recognize_google(audio_data)
-                        chunks.append(text)
-                except:
-                    pass
-                finally:
-                    if os.path.exists(chunk_path):
-                        os.unlink(chunk_path)
+                with span('chunk', offset_ms=i) as s:
+                    chunk.export(chunk_path, format='wav')
+                    s.add_bytes(os.path.getsize(chunk_path))
+                    
+                    try:
+                        with sr.AudioFile(chunk_path) as source:
+                            audio_data = self.recognizer.record(source)
+                            with track_upstream('google', 'recognize_google'):
+                                text = self.recognizer.recognize_google(audio_data)
+                            chunks.append(text)
+                    except:
+                        pass
+                    finally:
+                        if os.path.exists(chunk_path):
+                            os.unlink(chunk_path)
             
             return ' '.join(chunks) if chunks else None
             
@@ -96,9 +114,11 @@ class YouTubeSummarizer:
             print(f"Error transcribing audio in chunks: {e}")
             return None
     
-    def summarize_text(self, text: str, word_count: int = 200) -> Optional[str]:
+    @traced()
+    def summarize_text(self, text: str, word_count: int = 200, fresh: bool = False) -> Optional[str]:
         """
         Summarize text using Gemini AI with specified word count
+        fresh=True bypasses the generation cache
         """
         try:
             prompt = f"""
@@ -112,26 +132,31 @@ class YouTubeSummarizer:
             Summary (approximately {word_count} words):
             """
             
-            response = self.gemini_client.models.generate_content(
+            return self.generation_cache.generate(
+                self.gemini_client, self.gemini_api_key,
                 model="gemini-2.0-flash-exp",
-                contents=prompt
+                prompt=prompt,
+                fresh=fresh
             )
-            
-            if response and response.text:
-                return response.text.strip()
-            else:
-                return None
                 
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Summarization error: {e}")
             return None
     
-    def process_youtube_video(self, youtube_url: str, word_count: int = 200) -> Optional[Dict]:
+    @traced()
+    def process_youtube_video(self, youtube_url: str, word_count: int = 200,
+                              progress_callback: Optional[Callable] = None,
+                              fresh: bool = False) -> Optional[Dict]:
         """
         Complete pipeline: download, transcribe, and summarize YouTube video
         Returns: {'title': title, 'summary': summary}
         """
         try:
+            if progress_callback:
+                progress_callback("Downloading video...", 10)
+            
             download_result = self.download_video(youtube_url)
             if not download_result:
                 return None
@@ -140,6 +165,9 @@ class YouTubeSummarizer:
             audio_path = download_result['audio_path']
             title = download_result['title']
             
+            if progress_callback:
+                progress_callback("Transcribing audio...", 40)
+            
             transcript = self.transcribe_audio_in_chunks(audio_path)
             
             if os.path.exists(video_path):
@@ -150,17 +178,25 @@ class YouTubeSummarizer:
             if not transcript:
                 return None
             
-            summary = self.summarize_text(transcript, word_count)
+            if progress_callback:
+                progress_callback("Summarizing transcript...", 80)
+            
+            summary = self.summarize_text(transcript, word_count, fresh=fresh)
             
             if not summary:
                 return None
             
+            if progress_callback:
+                progress_callback("Complete!", 100)
+            
             return {
                 'title': title,
                 'summary': summary,
                 'transcript': transcript
             }
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             print(f"Error processing YouTube video: {e}")
             return None